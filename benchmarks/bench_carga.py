@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import psutil
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+# Teste de carga com usuários simultâneos.
+# Sobe o dashboard (servidor.py) em um processo próprio, sobre dados sintéticos
+# (benchmarks/gerar_dados.py) na escala pedida, e simula N sessões ao mesmo tempo pelo
+# mesmo protocolo do navegador: um websocket por sessão em /_stcore/stream, com as
+# mensagens protobuf do Streamlit. Cada sessão navega pelas seis páginas do menu
+# (option_menu) em ordem aleatória e, opcionalmente, troca o filtro de filial.
+# Para cada nível de usuários, registra a latência de cada rerun (do pedido até o
+# script_finished) por página, a vazão e a CPU e a memória do servidor (com os processos
+# filhos).
+# Uso:
+#   python benchmarks/bench_carga.py --linhas 100000 --usuarios 1 5 10 25 --duracao 30
+#   python benchmarks/bench_carga.py --linhas 1000000 --usuarios 10 --filtros 0.5 --sem-aquecimento
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+
+PAGINAS = ["Home", "Vendas por Região", "Desempenho de Vendas por Filial", "Segmentação de Clientes",
+           "Análise de Dados de Clientes", "Previsão das vendas"]
+PERCENTIS = (50, 90, 99)
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(diretorio_dados, porta, aquecer):
+    temporario = tempfile.mkdtemp(prefix="carga-")
+    ambiente = dict(
+        os.environ,
+        DRIVATECH_DATA_DIR=diretorio_dados,
+        DRIVATECH_STORE_DIR=os.path.join(temporario, "parquet"),
+        DRIVATECH_ROLLUP_DIR=os.path.join(temporario, "agregados"),
+        DRIVATECH_MODEL_DIR=os.path.join(temporario, "modelos"),
+        DRIVATECH_ARTIFACT_DIR=os.path.join(temporario, "artefatos"),
+        DRIVATECH_SHARED_DIR=os.path.join(temporario, "compartilhado"),
+        DRIVATECH_AQUECIMENTO="1" if aquecer else "0",
+    )
+    servidor = subprocess.Popen(
+        [sys.executable, "servidor.py", "--server.headless", "true", "--server.port", str(porta),
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + 120
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1):
+                return servidor
+        except OSError:
+            if servidor.poll() is not None:
+                raise SystemExit("O servidor do dashboard terminou antes de ficar pronto.")
+            time.sleep(0.2)
+    servidor.kill()
+    raise SystemExit("O servidor do dashboard não ficou pronto em 120 s.")
+
+
+class Sessao:
+    """Uma sessão do navegador: reruns do script com o estado dos widgets escolhido."""
+
+    def __init__(self, porta):
+        self.url = f"ws://127.0.0.1:{porta}/_stcore/stream"
+        self.conexao = None
+        self.menu = None  # id do option_menu (componente)
+        self.filiais = None  # (id, nº de opções) do filtro de filial
+
+    async def conectar(self):
+        self.conexao = await websocket_connect(self.url, subprotocols=["streamlit"], max_message_size=2**30)
+
+    async def rerun(self, pagina=None, filial=None):
+        """Pede um rerun e espera o fim do script; devolve (segundos, houve erro)."""
+        mensagem = BackMsg()
+        estado = mensagem.rerun_script
+        estado.SetInParent()  # rerun com o estado padrão dos widgets, mesmo sem nenhum definido
+        if pagina is not None and self.menu is not None:
+            widget = estado.widget_states.widgets.add()
+            widget.id = self.menu
+            widget.json_value = json.dumps(pagina)
+        if filial is not None and self.filiais is not None:
+            widget = estado.widget_states.widgets.add()
+            widget.id = self.filiais[0]
+            widget.int_array_value.data.append(filial)
+        inicio = time.perf_counter()
+        await self.conexao.write_message(mensagem.SerializeToString(), binary=True)
+
+        erro = False
+        while True:
+            dados = await self.conexao.read_message()
+            if dados is None:
+                raise ConnectionError("websocket fechado pelo servidor")
+            msg = ForwardMsg()
+            msg.ParseFromString(dados)
+            tipo = msg.WhichOneof("type")
+            if tipo == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                elemento = msg.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                if tipo_elemento == "exception":
+                    erro = True
+                elif tipo_elemento == "component_instance" and self.menu is None:
+                    self.menu = elemento.component_instance.id
+                elif tipo_elemento == "multiselect" and self.filiais is None and elemento.multiselect.label == "Filiais":
+                    self.filiais = (elemento.multiselect.id, len(elemento.multiselect.options))
+            elif tipo == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - inicio, erro
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+
+
+async def _usuario(porta, fim, pausa, filtros, semente, medidas):
+    rng = random.Random(semente)
+    sessao = Sessao(porta)
+    await sessao.conectar()
+    try:
+        segundos, erro = await sessao.rerun()
+        medidas.append({"pagina": PAGINAS[0], "segundos": segundos, "erro": erro, "primeiro": True})
+        while time.monotonic() < fim:
+            ordem = rng.sample(PAGINAS, len(PAGINAS))
+            for pagina in ordem:
+                if time.monotonic() >= fim:
+                    break
+                filial = None
+                if sessao.filiais and rng.random() < filtros:
+                    filial = rng.randrange(sessao.filiais[1])
+                segundos, erro = await sessao.rerun(pagina, filial)
+                medidas.append({"pagina": pagina, "segundos": segundos, "erro": erro, "filtro": filial is not None})
+                if pausa:
+                    await asyncio.sleep(rng.expovariate(1 / pausa))
+    finally:
+        sessao.fechar()
+
+
+def _processos(servidor):
+    processo = psutil.Process(servidor.pid)
+    return [processo] + processo.children(recursive=True)
+
+
+def _cpu(servidor):
+    total = 0.0
+    for processo in _processos(servidor):
+        try:
+            tempos = processo.cpu_times()
+            total += tempos.user + tempos.system
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def _memoria(servidor, campo="rss"):
+    total = 0
+    for processo in _processos(servidor):
+        try:
+            info = processo.memory_full_info() if campo == "uss" else processo.memory_info()
+            total += getattr(info, campo)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total / 2**20
+
+
+async def _amostrar_memoria(servidor, fim, picos):
+    while time.monotonic() < fim:
+        picos.append(_memoria(servidor))
+        await asyncio.sleep(0.25)
+
+
+async def executar_nivel(servidor, porta, usuarios, duracao, pausa, filtros, semente):
+    medidas, picos = [], []
+    cpu_inicio, inicio = _cpu(servidor), time.monotonic()
+    fim = inicio + duracao
+    await asyncio.gather(
+        _amostrar_memoria(servidor, fim, picos),
+        *[_usuario(porta, fim, pausa, filtros, semente + i, medidas) for i in range(usuarios)],
+    )
+    decorrido = time.monotonic() - inicio
+    return {
+        "usuarios": usuarios,
+        "segundos": decorrido,
+        "reruns": len(medidas),
+        "vazao_rps": len(medidas) / decorrido,
+        "erros": sum(m["erro"] for m in medidas),
+        "cpu_nucleos": (_cpu(servidor) - cpu_inicio) / decorrido,
+        "rss_pico_mb": max(picos, default=_memoria(servidor)),
+        "uss_mb": _memoria(servidor, "uss"),
+        "paginas": _percentis(medidas),
+        "medidas": medidas,
+    }
+
+
+def _percentis(medidas):
+    por_pagina = {}
+    for pagina in PAGINAS + ["todas"]:
+        tempos = [m["segundos"] for m in medidas if pagina in ("todas", m["pagina"])]
+        if tempos:
+            valores = np.percentile(tempos, PERCENTIS)
+            por_pagina[pagina] = dict({"n": len(tempos), "max": max(tempos)},
+                                      **{f"p{p}": float(v) for p, v in zip(PERCENTIS, valores)})
+    return por_pagina
+
+
+def imprimir(nivel):
+    print(f"\n{nivel['usuarios']} usuário(s): {nivel['reruns']} reruns em {nivel['segundos']:.1f} s "
+          f"({nivel['vazao_rps']:.1f}/s), {nivel['erros']} erro(s), CPU {nivel['cpu_nucleos'] * 100:.0f}% "
+          f"de um núcleo, RSS pico {nivel['rss_pico_mb']:.0f} MB, USS {nivel['uss_mb']:.0f} MB")
+    print(f"  {'página':34} {'n':>6}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTIS) + f"{'max':>9}")
+    for pagina, e in nivel["paginas"].items():
+        print(f"  {pagina:34} {e['n']:>6}" + "".join(f"{e['p' + str(p)] * 1000:>7.0f}ms" for p in PERCENTIS)
+              + f"{e['max'] * 1000:>7.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simultâneas")
+    parser.add_argument("--linhas", type=int, default=100_000, help="escala dos dados sintéticos (vendas)")
+    parser.add_argument("--dados", default=os.path.join(DIRETORIO_BENCH, "dados"),
+                        help="diretório com um subdiretório de CSVs por escala (gerados se faltarem)")
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de carga por nível de usuários")
+    parser.add_argument("--pausa", type=float, default=0, help="pausa média entre cliques de um usuário (s)")
+    parser.add_argument("--filtros", type=float, default=0, help="fração dos cliques que também troca a filial")
+    parser.add_argument("--sem-aquecimento", action="store_true", help="sobe o servidor com DRIVATECH_AQUECIMENTO=0")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="padrão: benchmarks/resultados/carga-<data>.json")
+    args = parser.parse_args()
+
+    from gerar_dados import gerar
+
+    diretorio = os.path.join(args.dados, str(args.linhas))
+    if not os.path.exists(os.path.join(diretorio, "VENDAS.csv")):
+        print(f"Gerando {args.linhas:,} vendas em {diretorio}...", file=sys.stderr)
+        gerar(diretorio, args.linhas)
+
+    porta = _porta_livre()
+    servidor = iniciar_servidor(os.path.abspath(diretorio), porta, not args.sem_aquecimento)
+    niveis = []
+    try:
+        for usuarios in args.usuarios:
+            nivel = asyncio.run(executar_nivel(
+                servidor, porta, usuarios, args.duracao, args.pausa, args.filtros, args.semente
+            ))
+            imprimir(nivel)
+            niveis.append(nivel)
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+    relatorio = {
+        "meta": {
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "linhas": args.linhas,
+            "duracao": args.duracao,
+            "pausa": args.pausa,
+            "filtros": args.filtros,
+            "aquecimento": not args.sem_aquecimento,
+            "cpus": os.cpu_count(),
+        },
+        "niveis": niveis,
+    }
+    saida = args.saida or os.path.join(DIRETORIO_BENCH, "resultados", f"carga-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.moeda import brl_para_centavos, brl_para_float  # noqa: E402
+
+# Compara o conversor vetorizado com o encadeamento de str.replace usado antes nas páginas.
+# Uso: python benchmarks/bench_moeda.py --linhas 10000000
+
+
+def gerar_valores(linhas, semente=42):
+    rng = np.random.default_rng(semente)
+    centavos = rng.integers(1_000, 500_000, size=linhas)
+    reais, resto = np.divmod(centavos, 100)
+    texto = pd.Series(reais).map("{:,}".format).str.replace(",", ".")
+    return texto + "," + pd.Series(resto).map("{:02d}".format), centavos
+
+
+def encadeamento_antigo(serie):
+    return serie.astype(str).str.replace(".", "").str.replace(",", ".").astype(float)
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do conversor de moeda BRL")
+    parser.add_argument("--linhas", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    print(f"Gerando {args.linhas:,} valores...")
+    valores, esperado = gerar_valores(args.linhas)
+    valores_arrow = valores.astype("string[pyarrow]")
+
+    t_antigo, antigo = cronometrar(encadeamento_antigo, valores)
+    t_float, novo_float = cronometrar(brl_para_float, valores)
+    t_centavos, centavos = cronometrar(brl_para_centavos, valores)
+    t_arrow, centavos_arrow = cronometrar(brl_para_centavos, valores_arrow)
+
+    assert np.array_equal(centavos.to_numpy(), esperado)
+    assert np.array_equal(centavos_arrow.to_numpy(), esperado)
+    assert np.array_equal(novo_float.to_numpy(), antigo.to_numpy())
+
+    print(f"str.replace + astype(float):        {t_antigo:8.2f} s")
+    print(f"brl_para_float (object):            {t_float:8.2f} s  ({t_antigo / t_float:.1f}x)")
+    print(f"brl_para_centavos (object):         {t_centavos:8.2f} s  ({t_antigo / t_centavos:.1f}x)")
+    print(f"brl_para_centavos (string[pyarrow]): {t_arrow:7.2f} s  ({t_antigo / t_arrow:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Mede, sem navegador, cada etapa da lógica por trás dos run() de pages/nav/ sobre dados
+# sintéticos (benchmarks/gerar_dados.py) em várias escalas. Para cada etapa registra o
+# tempo, o pico de memória alocada (tracemalloc) e o RSS máximo do processo; os resultados
+# vão para JSON e podem ser comparados com uma execução de referência.
+# O tracemalloc deixa a leitura de CSV várias vezes mais lenta, então tempo e memória são
+# medidos em duas execuções separadas de cada escala.
+# Uso:
+#   python benchmarks/bench_paginas.py --linhas 10000 100000 1000000
+#   python benchmarks/bench_paginas.py --linhas 100000 --base benchmarks/resultados/base.json
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+
+# Uma etapa só é regressão se piorar além da tolerância relativa e deste mínimo absoluto
+MINIMO_SEGUNDOS = 0.025
+
+
+def medir(resultados, pagina, etapa, funcao, *args, **kwargs):
+    gc.collect()
+    memoria = tracemalloc.is_tracing()
+    if memoria:
+        tracemalloc.reset_peak()
+        antes = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    retorno = funcao(*args, **kwargs)
+    segundos = time.perf_counter() - inicio
+    resultados.append({
+        "pagina": pagina,
+        "etapa": etapa,
+        "segundos": segundos,
+        "pico_mb": (tracemalloc.get_traced_memory()[1] - antes) / 2**20 if memoria else None,
+        "rss_max_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return retorno
+
+
+def _json_figura(fig):
+    # Tamanho do que seria enviado ao navegador
+    return len(fig.to_json())
+
+
+def medir_figura(resultados, pagina, funcao):
+    # Como medir, registrando também os bytes de JSON das figuras
+    tamanho = medir(resultados, pagina, "figura", funcao)
+    resultados[-1]["bytes_json"] = tamanho
+
+
+def executar_escala(diretorio_dados, memoria=False):
+    """Roda todas as etapas sobre os CSVs de ``diretorio_dados`` (um processo por escala)."""
+    # A configuração da camada de dados é lida na importação dos módulos de core/
+    temporario = tempfile.mkdtemp(prefix="bench-")
+    os.environ.update(
+        DRIVATECH_DATA_DIR=diretorio_dados,
+        DRIVATECH_STORE_DIR=os.path.join(temporario, "parquet"),
+        DRIVATECH_ROLLUP_DIR=os.path.join(temporario, "agregados"),
+        DRIVATECH_MODEL_DIR=os.path.join(temporario, "modelos"),
+    )
+    sys.path.insert(0, RAIZ)
+    import plotly.express as px
+    import plotly.graph_objs as go
+
+    import numpy as np
+
+    from core import agregados, amostragem, dados, distribuicao, esquema, hierarquia, indice, previsao, segmentacao
+
+    r = []
+    if memoria:
+        tracemalloc.start()
+
+    # ---- Etapas comuns: carga, limpeza, deduplicação, agregados e índice ----
+    fonte = list(dados.versao_tabela("VENDAS"))
+    if dados.usar_fluxo("VENDAS"):
+        base = medir(r, "comum", "agregados (fluxo)", agregados.sincronizar_em_fluxo, agregados.agregados_vazios(),
+                     lambda: dados.sem_duplicatas(dados.ler_em_lotes("VENDAS", colunas=agregados.COLUNAS_VENDAS)), fonte)
+        idx = medir(r, "comum", "indice", lambda: indice.construir_indice(diario=base["diario"]))
+    else:
+        brutas = medir(r, "comum", "leitura", dados._ler_csv, "VENDAS")
+        limpas = medir(r, "comum", "limpeza", dados._preparar, "VENDAS", brutas, False)
+        del brutas
+        vendas = medir(r, "comum", "deduplicacao", lambda df: df.drop_duplicates(subset="ID_VENDA", ignore_index=True), limpas)
+        del limpas
+        base = medir(r, "comum", "agregados", agregados.sincronizar, agregados.agregados_vazios(), vendas, fonte)
+        idx = medir(r, "comum", "indice", indice.construir_indice, vendas)
+        del vendas
+    filiais = medir(r, "comum", "carga filiais", dados.carregar_filiais)
+    clientes = medir(r, "comum", "carga clientes", dados.carregar_clientes)
+    # Custo fixo da primeira figura do processo (templates e validadores do Plotly)
+    medir(r, "comum", "primeira figura", lambda: _json_figura(px.bar(filiais, x="ID_FILIAL", y="ID_FILIAL")))
+
+    inicio, fim = indice.periodo(idx)
+    filtro = {"inicio": inicio + (fim - inicio) / 2, "fim": fim, "filiais": None, "ufs": None}
+    medir(r, "comum", "filtro periodo", indice.serie_diaria, filtro, idx)
+
+    # ---- vendas_regiao ----
+    por_uf = medir(r, "vendas_regiao", "groupby uf", agregados.vendas_por_uf, base)
+    por_data_uf = medir(r, "vendas_regiao", "groupby data x uf", agregados.vendas_por_data_uf, base)
+    serie = medir(r, "vendas_regiao", "lttb", amostragem.reduzir_serie, por_data_uf, "DATA_VENDA", "VALOR_VENDA", "UF")
+    medir_figura(r, "vendas_regiao", lambda: (
+        _json_figura(px.bar(por_uf, x="UF", y="VALOR_VENDA"))
+        + _json_figura(px.line(serie, x="DATA_VENDA", y="VALOR_VENDA", color="UF", markers=True))
+    ))
+
+    # ---- desempenho_produtos ----
+    por_filial = medir(r, "desempenho_produtos", "groupby filial", agregados.vendas_por_filial, base)
+    por_filial = medir(r, "desempenho_produtos", "juncao filiais", esquema.com_atributos, por_filial, "FILIAIS", ["NOME_FILIAL"])
+    medir_figura(r, "desempenho_produtos", lambda: _json_figura(px.bar(por_filial, x="NOME_FILIAL", y="VALOR_VENDA")))
+
+    # ---- segmentacao_clientes ----
+    gasto = medir(r, "segmentacao_clientes", "groupby cliente", agregados.vendas_por_cliente, base)
+    ids, origem = clientes["ID_CLIENTE"].to_numpy(), gasto["ID_CLIENTE"].to_numpy()
+    completo = medir(r, "segmentacao_clientes", "juncao clientes", lambda: clientes.assign(
+        total_gasto=esquema.alinhar(ids, origem, gasto["VALOR_VENDA"].to_numpy(), 0.0),
+        N_VENDAS=esquema.alinhar(ids, origem, gasto["N_VENDAS"].to_numpy(), 0),
+        ULTIMA_COMPRA=esquema.alinhar(ids, origem, gasto["ULTIMA_COMPRA"].to_numpy(), np.datetime64("NaT")),
+    ))
+    for modo in segmentacao.MODOS:
+        modelo = medir(r, "segmentacao_clientes", f"ajuste {modo}", segmentacao.ajustar, completo, modo, 3)
+        completo["cluster"] = medir(r, "segmentacao_clientes", f"rotulos {modo}", segmentacao.atribuir, modelo, completo)
+    pontos, agrupado = medir(r, "segmentacao_clientes", "densidade", amostragem.reduzir_dispersao,
+                             completo, "ID_CLIENTE", "total_gasto", "cluster")
+    medir_figura(r, "segmentacao_clientes", lambda: _json_figura(px.scatter(
+        pontos, x="ID_CLIENTE", y="total_gasto", color="cluster",
+        size="N_PONTOS" if agrupado else None, render_mode="webgl" if agrupado else "auto",
+    )))
+
+    # ---- analise_dados ----
+    medir(r, "analise_dados", "distribuição", distribuicao.distribuir, [clientes], base["clientes"])
+    medir(r, "analise_dados", "distribuição aproximada", distribuicao.distribuir,
+          dados.ler_em_lotes("CLIENTES", colunas=distribuicao.COLUNAS_CLIENTES), base["clientes"],
+          contadores=distribuicao.CONTADORES_DISTRIBUICAO)
+
+    # ---- previsao ----
+    por_mes = medir(r, "previsao", "groupby mes", agregados.vendas_por_mes, base)
+    resultado = medir(r, "previsao", "ajuste ridge", previsao.treinar, por_mes[["MÊS", "ANO", "VALOR_VENDA"]])
+    uf_por_filial = dict(zip(filiais["ID_FILIAL"], filiais["UF"]))
+    for frequencia in hierarquia.FREQUENCIAS:
+        medir(r, "previsao", f"ajuste hierarquico {frequencia}", hierarquia.prever_hierarquia, base["diario"], uf_por_filial, frequencia)
+    medir_figura(r, "previsao", lambda: _json_figura(go.Figure(go.Scatter(
+        x=resultado["futuro"].index, y=resultado["futuro"]["VALOR_VENDA_PREVISTA"], mode="lines+markers"
+    ))))
+
+    if memoria:
+        tracemalloc.stop()
+    return r
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def _executar_filho(diretorio, *opcoes):
+    # Cada execução em um processo novo: caches e RSS máximo não passam de uma para outra
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--escala-unica", diretorio, *opcoes],
+        cwd=RAIZ, stdout=subprocess.PIPE, text=True, check=True,
+    ).stdout
+    return json.loads(saida.splitlines()[-1])
+
+
+def comparar(resultados, base, tolerancia):
+    """Etapas que ficaram mais lentas que na ``base`` além da tolerância relativa."""
+    referencia = {(e["linhas"], e["pagina"], e["etapa"]): e["segundos"] for e in base["etapas"]}
+    regressoes = []
+    for e in resultados:
+        anterior = referencia.get((e["linhas"], e["pagina"], e["etapa"]))
+        if anterior is None:
+            continue
+        if e["segundos"] > anterior * (1 + tolerancia) and e["segundos"] - anterior > MINIMO_SEGUNDOS:
+            regressoes.append(dict(e, base_segundos=anterior))
+    return regressoes
+
+
+def imprimir(resultados):
+    escalas = sorted({e["linhas"] for e in resultados})
+    etapas = list(dict.fromkeys((e["pagina"], e["etapa"]) for e in resultados))
+    tempos = {(e["linhas"], e["pagina"], e["etapa"]): e for e in resultados}
+    print(f"{'página':22} {'etapa':26}" + "".join(f"{n:>14,}" for n in escalas))
+    for pagina, etapa in etapas:
+        celulas = []
+        for n in escalas:
+            e = tempos.get((n, pagina, etapa))
+            if e is None:
+                celulas.append(f"{'-':>14}")
+            elif e["pico_mb"] is None:
+                celulas.append(f"{e['segundos']:>8.3f}s{'':>5}")
+            else:
+                celulas.append(f"{e['segundos']:>8.3f}s{e['pico_mb']:>5.0f}M")
+        print(f"{pagina:22} {etapa:26}" + "".join(celulas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapa das páginas com dados sintéticos")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dados", default=os.path.join(DIRETORIO_BENCH, "dados"),
+                        help="diretório com um subdiretório de CSVs por escala (gerados se faltarem)")
+    parser.add_argument("--saida", default=None, help="padrão: benchmarks/resultados/paginas-<data>.json")
+    parser.add_argument("--base", default=None, help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--sem-memoria", action="store_true", help="não faz a execução com tracemalloc")
+    parser.add_argument("--escala-unica", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--memoria", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.escala_unica:
+        # Processo filho: uma escala, resultados em JSON na saída padrão
+        print(json.dumps(executar_escala(args.escala_unica, args.memoria)))
+        return
+
+    from gerar_dados import gerar
+
+    resultados = []
+    for linhas in args.linhas:
+        diretorio = os.path.join(args.dados, str(linhas))
+        if not os.path.exists(os.path.join(diretorio, "VENDAS.csv")):
+            print(f"Gerando {linhas:,} vendas em {diretorio}...", file=sys.stderr)
+            gerar(diretorio, linhas)
+        print(f"Medindo {linhas:,} vendas...", file=sys.stderr)
+        etapas = _executar_filho(diretorio)
+        if not args.sem_memoria:
+            picos = [e["pico_mb"] for e in _executar_filho(diretorio, "--memoria")]
+            etapas = [dict(e, pico_mb=pico) for e, pico in zip(etapas, picos)]
+        resultados.extend(dict(e, linhas=linhas) for e in etapas)
+
+    imprimir(resultados)
+    relatorio = {
+        "meta": {
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "etapas": resultados,
+    }
+
+    saida = args.saida or os.path.join(DIRETORIO_BENCH, "resultados", f"paginas-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        for e in regressoes:
+            print(f"REGRESSÃO {e['linhas']:,} {e['pagina']}/{e['etapa']}: "
+                  f"{e['base_segundos']:.3f}s -> {e['segundos']:.3f}s")
+        if regressoes:
+            sys.exit(1)
+        print("Nenhuma regressão em relação à base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Mede a partida a frio do dashboard: cada página é aberta como primeiro pedido de um
+# processo novo (AppTest do Streamlit, sem navegador), em dois modos:
+#   - frio: sem aquecimento, o pedido chega junto com a partida do processo;
+#   - aquecido: o aquecimento de core/aquecimento.py roda antes (como em servidor.py, com o
+#     pod pronto só depois dele) e o pedido chega em seguida.
+# Cada processo usa diretórios temporários próprios para agregados, modelos, artefatos e o
+# segmento compartilhado, para não herdar nada das execuções anteriores.
+# O tempo até o primeiro render é comparado com a meta: do início do processo no modo frio,
+# e do pedido no modo aquecido. Se alguma página aquecida passar da meta, o comando termina
+# com erro (o modo frio mostra o que um pedido antes do aquecimento ainda paga).
+# Uso: python benchmarks/bench_partida.py [--dados data] [--meta 3]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+
+PAGINAS = ["Home", "Vendas por Região", "Desempenho de Vendas por Filial", "Segmentação de Clientes",
+           "Análise de Dados de Clientes", "Previsão das vendas"]
+
+
+def executar_pagina(indice_pagina, aquecido):
+    """Primeiro render de uma página em um processo novo (roda no processo filho)."""
+    import psutil
+
+    sys.path.insert(0, RAIZ)
+    inicio = time.perf_counter()
+    from core import aquecimento, atualizacao, filtros  # noqa: F401  (o que main.py importa)
+    from streamlit.testing.v1 import AppTest
+    importacao = time.perf_counter() - inicio
+
+    aquecimento_s = None
+    if aquecido:
+        inicio = time.perf_counter()
+        atualizacao.iniciar()
+        aquecimento.iniciar()
+        aquecimento.aguardar()
+        aquecimento_s = time.perf_counter() - inicio
+
+    with open(os.path.join(RAIZ, "main.py"), encoding="utf-8") as f:
+        fonte = f.read().replace("default_index=0", f"default_index={indice_pagina}")
+    app = AppTest.from_string(fonte, default_timeout=600)
+    inicio = time.perf_counter()
+    app.run()
+    render = time.perf_counter() - inicio
+    return {
+        "pagina": PAGINAS[indice_pagina],
+        "modo": "aquecido" if aquecido else "frio",
+        "importacao_s": importacao,
+        "aquecimento_s": aquecimento_s,
+        "render_s": render,
+        "desde_partida_s": time.time() - psutil.Process().create_time(),
+        "erro": str(app.exception[0].message) if app.exception else None,
+    }
+
+
+def _executar_filho(diretorio_dados, indice_pagina, aquecido):
+    temporario = tempfile.mkdtemp(prefix="partida-")
+    ambiente = dict(
+        os.environ,
+        DRIVATECH_DATA_DIR=diretorio_dados,
+        DRIVATECH_STORE_DIR=os.path.join(temporario, "parquet"),
+        DRIVATECH_ROLLUP_DIR=os.path.join(temporario, "agregados"),
+        DRIVATECH_MODEL_DIR=os.path.join(temporario, "modelos"),
+        DRIVATECH_ARTIFACT_DIR=os.path.join(temporario, "artefatos"),
+        DRIVATECH_SHARED_DIR=os.path.join(temporario, "compartilhado"),
+        DRIVATECH_AQUECIMENTO="1" if aquecido else "0",
+    )
+    opcoes = ["--pagina-unica", str(indice_pagina)] + (["--aquecido"] if aquecido else [])
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *opcoes],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True,
+    ).stdout
+    return json.loads(saida.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo até o primeiro render com o processo frio e aquecido")
+    parser.add_argument("--dados", default=os.path.join(RAIZ, "data"), help="diretório com os CSVs")
+    parser.add_argument("--meta", type=float, default=None,
+                        help="segundos até o primeiro render (padrão: DRIVATECH_META_PRIMEIRO_RENDER_S ou 3)")
+    parser.add_argument("--saida", default=None, help="padrão: benchmarks/resultados/partida-<data>.json")
+    parser.add_argument("--pagina-unica", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--aquecido", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pagina_unica is not None:
+        # Processo filho: uma página, resultado em JSON na saída padrão
+        print(json.dumps(executar_pagina(args.pagina_unica, args.aquecido)))
+        return
+
+    meta = args.meta or float(os.environ.get("DRIVATECH_META_PRIMEIRO_RENDER_S", "3"))
+    resultados = []
+    print(f"{'página':34} {'modo':9} {'imports':>9} {'aquec.':>9} {'render':>9} {'partida':>9}  meta ({meta:.1f} s)")
+    for indice_pagina in range(len(PAGINAS)):
+        for aquecido in (False, True):
+            r = _executar_filho(os.path.abspath(args.dados), indice_pagina, aquecido)
+            # Frio: o usuário espera a partida inteira; aquecido: só o próprio pedido
+            r["primeiro_render_s"] = r["render_s"] if aquecido else r["desde_partida_s"]
+            r["dentro_da_meta"] = r["erro"] is None and r["primeiro_render_s"] <= meta
+            resultados.append(r)
+            aquecimento_s = f"{r['aquecimento_s']:8.2f}s" if r["aquecimento_s"] is not None else f"{'-':>9}"
+            print(f"{r['pagina']:34} {r['modo']:9} {r['importacao_s']:8.2f}s {aquecimento_s} {r['render_s']:8.2f}s "
+                  f"{r['desde_partida_s']:8.2f}s  {'ok' if r['dentro_da_meta'] else 'EXCEDIDA'}")
+
+    saida = args.saida or os.path.join(DIRETORIO_BENCH, "resultados", f"partida-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump({"meta_s": meta, "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"), "paginas": resultados}, f, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+    excedidas = [r for r in resultados if r["modo"] == "aquecido" and not r["dentro_da_meta"]]
+    for r in excedidas:
+        print(f"META EXCEDIDA {r['pagina']} ({r['modo']}): {r['primeiro_render_s']:.2f}s > {meta:.2f}s")
+    if excedidas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
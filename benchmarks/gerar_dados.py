@@ -0,0 +1,150 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Gera VENDAS, CLIENTES, FILIAIS e PRODUTOS sintéticos no mesmo formato dos CSVs de data/
+# (separador ";", UTF-8 com BOM, datas dd/mm/aaaa e valores em reais "1.234,56"), em
+# qualquer escala. VENDAS é escrita em lotes, então 100M de linhas não precisam caber na
+# memória.
+# Uso: python benchmarks/gerar_dados.py --linhas 1000000 --destino benchmarks/dados/1000000
+
+TAMANHO_LOTE = 1_000_000
+
+# (cidade, UF, peso): a maioria dos clientes em Curitiba, como nos dados reais
+CIDADES = [
+    ("CURITIBA", "PR", 60), ("CAMPO LARGO", "PR", 3), ("SAO JOSE DOS PINHAIS", "PR", 3),
+    ("ARAUCARIA", "PR", 2), ("PONTA GROSSA", "PR", 2), ("LONDRINA", "PR", 2), ("MARINGA", "PR", 2),
+    ("JOINVILLE", "SC", 2), ("FLORIANOPOLIS", "SC", 2), ("BLUMENAU", "SC", 1),
+    ("SAO PAULO", "SP", 8), ("CAMPINAS", "SP", 2), ("RIO DE JANEIRO", "RJ", 4),
+    ("BELO HORIZONTE", "MG", 3), ("PORTO ALEGRE", "RS", 3), ("SALVADOR", "BA", 1),
+]
+NOMES = ["ANA", "BRUNO", "CARLA", "DIEGO", "EDUARDA", "FELIPE", "GABRIELA", "HUGO", "ISABELA",
+         "JOAO", "KARINA", "LUCAS", "MARIANA", "NICOLAS", "OLIVIA", "PEDRO", "RAFAELA", "SILVIA"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "PEREIRA", "COSTA", "RODRIGUES",
+              "ALMEIDA", "NASCIMENTO", "ARAUJO", "MATOS", "ALENCAR", "RIBEIRO", "CARVALHO"]
+
+
+def formatar_brl(centavos):
+    # 123456 -> "1.234,56"
+    reais, resto = np.divmod(np.asarray(centavos, dtype=np.int64), 100)
+    texto = pd.Series(reais).map("{:,}".format).str.replace(",", ".", regex=False)
+    return texto + "," + pd.Series(resto).map("{:02d}".format)
+
+
+def _escrever(caminho, lotes):
+    # O BOM do utf-8-sig é escrito uma vez, no início do arquivo
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as f:
+        for numero, lote in enumerate(lotes):
+            lote.to_csv(f, sep=";", index=False, header=numero == 0)
+
+
+def _cidades(rng, n):
+    pesos = np.array([c[2] for c in CIDADES], dtype=np.float64)
+    escolha = rng.choice(len(CIDADES), size=n, p=pesos / pesos.sum())
+    return np.array([c[0] for c in CIDADES])[escolha], np.array([c[1] for c in CIDADES])[escolha]
+
+
+def gerar_filiais(n, rng):
+    cidades, ufs = _cidades(rng, n)
+    return pd.DataFrame({
+        "ID_FILIAL": np.arange(1, n + 1),
+        "NOME_FILIAL": [f"FILIAL {i:03d}" for i in range(1, n + 1)],
+        "CIDADE": cidades,
+        "UF": ufs,
+    })
+
+
+def gerar_clientes(n, rng):
+    for inicio in range(0, n, TAMANHO_LOTE):
+        tamanho = min(TAMANHO_LOTE, n - inicio)
+        nomes = (pd.Series(np.array(NOMES)[rng.integers(0, len(NOMES), tamanho)]) + " "
+                 + np.array(SOBRENOMES)[rng.integers(0, len(SOBRENOMES), tamanho)])
+        cidades, ufs = _cidades(rng, tamanho)
+        yield pd.DataFrame({
+            "ID_CLIENTE": np.arange(inicio + 1, inicio + tamanho + 1),
+            "NOME_CLIENTE": nomes,
+            "CIDADE": cidades,
+            "UF": ufs,
+        })
+
+
+def gerar_produtos(n, rng):
+    return pd.DataFrame({
+        "ID_PRODUTO": np.arange(1, n + 1),
+        "NOME_PRODUTO": [f"PRODUTO {i:04d}" for i in range(1, n + 1)],
+        "PRECO_TABELA": formatar_brl(rng.integers(10, 500, n) * 1000),
+    })
+
+
+def _distribuicao_dias(inicio, dias):
+    # Intensidade diária com tendência, sazonalidade semanal e pico de fim de ano
+    datas = pd.date_range(inicio, periods=dias)
+    semana = np.array([0.9, 0.85, 0.9, 0.95, 1.1, 1.35, 0.6])[datas.dayofweek]
+    ano = 1 + 0.3 * np.exp(-((datas.dayofyear.to_numpy() - 350) / 20.0) ** 2)
+    tendencia = np.linspace(1.0, 1.4, dias)
+    peso = semana * ano * tendencia
+    return datas.strftime("%d/%m/%Y").to_numpy(), np.cumsum(peso) / peso.sum()
+
+
+def gerar_vendas(linhas, clientes, filiais, rng, inicio="2021-01-01", dias=1095, duplicatas=0.0):
+    """Lotes de VENDAS com IDs crescentes e datas em ordem (como no arquivo original).
+
+    Uma fração ``duplicatas`` das linhas é repetida com o mesmo ID_VENDA, para exercitar a
+    remoção de duplicatas.
+    """
+    textos_dias, acumulado = _distribuicao_dias(inicio, dias)
+    peso_filiais = rng.dirichlet(np.full(filiais, 2.0))
+    for primeiro in range(0, linhas, TAMANHO_LOTE):
+        tamanho = min(TAMANHO_LOTE, linhas - primeiro)
+        ids = np.arange(primeiro + 1, primeiro + tamanho + 1)
+        # Quantis crescentes pela inversa da distribuição: datas em ordem de ID_VENDA
+        dia = np.searchsorted(acumulado, (ids - 1 + rng.random(tamanho)) / linhas)
+        lote = pd.DataFrame({
+            "ID_VENDA": ids,
+            "DATA_VENDA": textos_dias[np.minimum(dia, dias - 1)],
+            "ID_FILIAL": rng.choice(filiais, size=tamanho, p=peso_filiais) + 1,
+            # Poucos clientes concentram muitas compras
+            "ID_CLIENTE": (clientes * rng.beta(0.7, 1.5, tamanho)).astype(np.int64) + 1,
+            "VALOR_VENDA": formatar_brl(np.maximum(rng.lognormal(np.log(30_000), 0.85, tamanho), 1_000).astype(np.int64)),
+        })
+        if duplicatas:
+            lote = pd.concat([lote, lote.sample(frac=duplicatas, random_state=int(rng.integers(1 << 31)))])
+        yield lote
+
+
+def gerar(destino, linhas, clientes=None, filiais=None, produtos=30, semente=42, duplicatas=0.0):
+    """Escreve os quatro CSVs em ``destino``; retorna o tempo gasto em segundos."""
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(semente)
+    clientes = clientes or max(3_000, linhas // 20)
+    filiais = filiais or max(5, linhas // 2_000_000)
+    os.makedirs(destino, exist_ok=True)
+
+    _escrever(os.path.join(destino, "FILIAIS.csv"), [gerar_filiais(filiais, rng)])
+    _escrever(os.path.join(destino, "PRODUTOS.csv"), [gerar_produtos(produtos, rng)])
+    _escrever(os.path.join(destino, "CLIENTES.csv"), gerar_clientes(clientes, rng))
+    _escrever(os.path.join(destino, "VENDAS.csv"), gerar_vendas(linhas, clientes, filiais, rng, duplicatas=duplicatas))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato dos CSVs de data/")
+    parser.add_argument("--linhas", type=int, default=100_000, help="linhas de VENDAS")
+    parser.add_argument("--destino", default=None, help="padrão: benchmarks/dados/<linhas>")
+    parser.add_argument("--clientes", type=int, default=None, help="padrão: linhas / 20 (mínimo 3000)")
+    parser.add_argument("--filiais", type=int, default=None, help="padrão: linhas / 2M (mínimo 5)")
+    parser.add_argument("--produtos", type=int, default=30)
+    parser.add_argument("--duplicatas", type=float, default=0.0, help="fração de linhas repetidas")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    destino = args.destino or os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", str(args.linhas))
+    segundos = gerar(destino, args.linhas, args.clientes, args.filiais, args.produtos, args.semente, args.duplicatas)
+    print(f"{args.linhas:,} vendas gravadas em {destino} ({segundos:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import dados, esquema, instrumentacao
+
+# Agregados persistidos (visões materializadas) usados pelas páginas.
+# Em vez de reagrupar todo o histórico a cada rerun, mantemos dois cubos pequenos:
+#   - diário por filial: (DATA_VENDA, ID_FILIAL) -> soma em centavos, nº de vendas
+#   - por cliente: ID_CLIENTE -> soma em centavos, nº de vendas, primeira/última compra
+# e os pares distintos (ID_FILIAL, ID_CLIENTE). Os agregados por UF, filial, mês e cliente
+# saem desses cubos em milissegundos.
+# Novas vendas entram apenas pelo delta: ID_VENDA funciona como marca d'água, e linhas com
+# ID_VENDA já processado são rejeitadas como duplicatas. Junto com a marca d'água fica uma
+# assinatura do conteúdo já processado (soma dos hashes das linhas), mantida a cada delta:
+# se uma venda antiga for editada ou removida, a assinatura muda e os agregados são refeitos
+# do zero. Conferir a assinatura exige hashear todo o histórico, então isso só é feito
+# quando a versão do arquivo não mostra que ele apenas cresceu (dados.so_acrescentou,
+# registrado pela atualização em segundo plano); a contagem de linhas é sempre conferida.
+# Quando VENDAS é grande demais para a memória (dados.usar_fluxo), o mesmo processo roda
+# em lotes: cada lote é limpo, agregado e somado aos cubos, e o pico de memória fica
+# limitado ao lote mais os agregados.
+
+COLUNAS_VENDAS = ["ID_VENDA", "DATA_VENDA", "ID_FILIAL", "ID_CLIENTE", "VALOR_VENDA_CENTAVOS"]
+
+DIRETORIO_AGREGADOS = os.environ.get("DRIVATECH_ROLLUP_DIR", os.path.join("data", "agregados"))
+ESTADO = "estado.json"
+
+# Em memória ficam a versão publicada e a que a atualização em segundo plano prepara
+# (core/atualizacao.py): preparar a próxima não tira a atual das páginas.
+VERSOES_EM_MEMORIA = 2
+
+_memoria = OrderedDict()  # versão de VENDAS -> agregados
+_trava = threading.Lock()
+_trava_calculo = threading.Lock()
+
+
+def agregados_vazios():
+    return {
+        "diario": pd.DataFrame({
+            "DATA_VENDA": pd.Series(dtype="datetime64[ns]"),
+            "ID_FILIAL": pd.Series(dtype="int32"),
+            "SOMA_CENTAVOS": pd.Series(dtype="int64"),
+            "N_VENDAS": pd.Series(dtype="int64"),
+        }),
+        "clientes": pd.DataFrame({
+            "ID_CLIENTE": pd.Series(dtype="int32"),
+            "SOMA_CENTAVOS": pd.Series(dtype="int64"),
+            "N_VENDAS": pd.Series(dtype="int64"),
+            "PRIMEIRA_COMPRA": pd.Series(dtype="datetime64[ns]"),
+            "ULTIMA_COMPRA": pd.Series(dtype="datetime64[ns]"),
+        }),
+        "pares": pd.DataFrame({
+            "ID_FILIAL": pd.Series(dtype="int32"),
+            "ID_CLIENTE": pd.Series(dtype="int32"),
+        }),
+        "marca_dagua": 0,
+        "linhas": 0,
+        "assinatura": 0,
+        "rejeitadas": 0,
+        "fonte": None,
+    }
+
+
+def agregar_diario(vendas):
+    return vendas.groupby(["DATA_VENDA", "ID_FILIAL"], as_index=False).agg(
+        SOMA_CENTAVOS=("VALOR_VENDA_CENTAVOS", "sum"),
+        N_VENDAS=("VALOR_VENDA_CENTAVOS", "size"),
+    )
+
+
+def agregar_clientes(vendas):
+    return vendas.groupby("ID_CLIENTE", as_index=False).agg(
+        SOMA_CENTAVOS=("VALOR_VENDA_CENTAVOS", "sum"),
+        N_VENDAS=("VALOR_VENDA_CENTAVOS", "size"),
+        PRIMEIRA_COMPRA=("DATA_VENDA", "min"),
+        ULTIMA_COMPRA=("DATA_VENDA", "max"),
+    )
+
+
+def assinatura(vendas):
+    """Soma (módulo 2**64) dos hashes das linhas em COLUNAS_VENDAS, independente da ordem.
+
+    Por ser uma soma, a assinatura de um conjunto de linhas é a soma das assinaturas das partes.
+    """
+    if not len(vendas):
+        return 0
+    # Inteiros em int64 (e datas em ns): o hash não depende do tipo escolhido por lote
+    colunas = pd.DataFrame({coluna: np.asarray(vendas[coluna]).astype("int64") for coluna in COLUNAS_VENDAS})
+    return int(pd.util.hash_pandas_object(colunas, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+def _somar_assinaturas(*assinaturas):
+    return sum(assinaturas) % 2**64
+
+
+def combinar(agregados, parcial):
+    # Soma dois conjuntos de agregados disjuntos (mesma estrutura de agregados_vazios)
+    diario = pd.concat([agregados["diario"], parcial["diario"]]).groupby(
+        ["DATA_VENDA", "ID_FILIAL"], as_index=False
+    ).agg(SOMA_CENTAVOS=("SOMA_CENTAVOS", "sum"), N_VENDAS=("N_VENDAS", "sum"))
+    clientes = pd.concat([agregados["clientes"], parcial["clientes"]]).groupby("ID_CLIENTE", as_index=False).agg(
+        SOMA_CENTAVOS=("SOMA_CENTAVOS", "sum"),
+        N_VENDAS=("N_VENDAS", "sum"),
+        PRIMEIRA_COMPRA=("PRIMEIRA_COMPRA", "min"),
+        ULTIMA_COMPRA=("ULTIMA_COMPRA", "max"),
+    )
+    pares = pd.concat([agregados["pares"], parcial["pares"]]).drop_duplicates(ignore_index=True)
+    return dict(
+        agregados,
+        diario=diario,
+        clientes=clientes,
+        pares=pares,
+        marca_dagua=max(agregados["marca_dagua"], parcial["marca_dagua"]),
+        linhas=agregados["linhas"] + parcial["linhas"],
+        assinatura=_somar_assinaturas(agregados["assinatura"], parcial["assinatura"]),
+        rejeitadas=agregados["rejeitadas"] + parcial["rejeitadas"],
+    )
+
+
+def _parcial(novas, rejeitadas):
+    parcial = agregados_vazios()
+    parcial["rejeitadas"] = rejeitadas
+    if novas.empty:
+        return parcial
+    parcial.update(
+        diario=agregar_diario(novas),
+        clientes=agregar_clientes(novas),
+        pares=novas[["ID_FILIAL", "ID_CLIENTE"]].drop_duplicates(ignore_index=True),
+        marca_dagua=int(novas["ID_VENDA"].max()),
+        linhas=len(novas),
+        assinatura=assinatura(novas),
+    )
+    return parcial
+
+
+def agregar(vendas, marca_dagua=0):
+    # Agrega apenas as vendas com ID_VENDA acima da marca d'água, uma vez cada
+    novas = vendas[vendas["ID_VENDA"] > marca_dagua].drop_duplicates(subset="ID_VENDA")
+    return _parcial(novas, len(vendas) - len(novas))
+
+
+def atualizar(agregados, novas_vendas):
+    """Incorpora um lote de vendas novas aos agregados, processando só o delta."""
+    return combinar(agregados, agregar(novas_vendas, agregados["marca_dagua"]))
+
+
+def salvar(agregados, diretorio=None):
+    diretorio = diretorio or DIRETORIO_AGREGADOS
+    temporario = f"{diretorio}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for nome in ("diario", "clientes", "pares"):
+        agregados[nome].to_parquet(os.path.join(temporario, f"{nome}.parquet"), index=False)
+    estado = {chave: agregados[chave] for chave in ("marca_dagua", "linhas", "assinatura", "rejeitadas", "fonte")}
+    with open(os.path.join(temporario, ESTADO), "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+
+    antigo = f"{diretorio}.old-{os.getpid()}"
+    if os.path.exists(diretorio):
+        os.rename(diretorio, antigo)
+    os.rename(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def carregar(diretorio=None):
+    diretorio = diretorio or DIRETORIO_AGREGADOS
+    try:
+        with open(os.path.join(diretorio, ESTADO), encoding="utf-8") as f:
+            estado = json.load(f)
+    except FileNotFoundError:
+        return None
+    agregados = agregados_vazios()
+    agregados.update(estado)
+    for nome in ("diario", "clientes", "pares"):
+        agregados[nome] = pd.read_parquet(os.path.join(diretorio, f"{nome}.parquet"))
+    return agregados
+
+
+def sincronizar(agregados, vendas, fonte, descartadas=0, acrescida=False):
+    # Se linhas já processadas sumiram, mudaram de quantidade ou de conteúdo, o arquivo foi
+    # reescrito (e não apenas acrescido): nesse caso os agregados são refeitos do zero.
+    # ``descartadas``: duplicatas de ID_VENDA já removidas de ``vendas`` na limpeza.
+    # ``acrescida``: ``fonte`` só acrescentou linhas à versão dos agregados, então o conteúdo
+    # das linhas antigas não é reconferido (só a quantidade).
+    antigas = (vendas["ID_VENDA"] <= agregados["marca_dagua"]).to_numpy()
+    if int(antigas.sum()) != agregados["linhas"] or (
+        not acrescida and assinatura(vendas[antigas]) != agregados["assinatura"]
+    ):
+        agregados = agregados_vazios()
+        antigas = np.zeros(len(vendas), dtype=bool)
+    agregados = atualizar(agregados, vendas[~antigas])
+    # Rejeitadas: todas as linhas com ID_VENDA repetido na fonte, como em sincronizar_em_fluxo
+    agregados["rejeitadas"] = descartadas + int(vendas["ID_VENDA"].duplicated().sum())
+    agregados["fonte"] = fonte
+    return agregados
+
+
+def _agregar_lotes(agregados, lotes, conferir=True):
+    # Devolve os agregados com as vendas acima da marca d'água e (nº, assinatura) das vendas
+    # abaixo dela, para conferir se a parte já processada continua igual (a assinatura só com
+    # ``conferir``); as duplicatas ficam em "rejeitadas"
+    marca = agregados["marca_dagua"]
+    vistos = np.zeros(0, dtype=np.uint8)
+    antigas, assinatura_antigas, duplicatas = 0, 0, 0
+    for lote in lotes:
+        # Bitmap de IDs: duplicatas entre lotes com 1 bit por ID (a primeira ocorrência fica)
+        vistos, novos = dados.marcar_ids(vistos, lote["ID_VENDA"].to_numpy())
+        acima = (lote["ID_VENDA"] > marca).to_numpy()
+        abaixo = lote[novos & ~acima]
+        antigas += len(abaixo)
+        if conferir:
+            assinatura_antigas = _somar_assinaturas(assinatura_antigas, assinatura(abaixo))
+        duplicatas += int((~novos).sum())
+        agregados = combinar(agregados, _parcial(lote[novos & acima], 0))
+    agregados["rejeitadas"] = duplicatas
+    return agregados, antigas, assinatura_antigas
+
+
+def sincronizar_em_fluxo(agregados, ler_lotes, fonte, acrescida=False):
+    """Versão de ``sincronizar`` que consome VENDAS em lotes com memória limitada.
+
+    ``ler_lotes`` é chamada sem argumentos e devolve um iterável novo de lotes limpos;
+    ela pode ser chamada duas vezes se o arquivo tiver sido reescrito.
+    """
+    atualizados, antigas, assinatura_antigas = _agregar_lotes(agregados, ler_lotes(), conferir=not acrescida)
+    if antigas != agregados["linhas"] or (not acrescida and assinatura_antigas != agregados["assinatura"]):
+        atualizados, _, _ = _agregar_lotes(agregados_vazios(), ler_lotes())
+    atualizados["fonte"] = fonte
+    return atualizados
+
+
+def obter_agregados():
+    # Agregados em dia com a versão atual de VENDAS, atualizados pelo delta quando necessário
+    fonte = list(dados.versao_tabela("VENDAS"))
+    with _trava:
+        if tuple(fonte) in _memoria:
+            return _memoria[tuple(fonte)]
+
+    # Um cálculo por vez; as páginas de versões já em memória não esperam por ele
+    with _trava_calculo:
+        with _trava:
+            if tuple(fonte) in _memoria:
+                return _memoria[tuple(fonte)]
+
+        agregados = carregar() or agregados_vazios()
+        if agregados["fonte"] != fonte:
+            acrescida = dados.so_acrescentou("VENDAS", agregados["fonte"], fonte)
+            if dados.usar_fluxo("VENDAS"):
+                agregados = sincronizar_em_fluxo(
+                    agregados, lambda: dados.ler_em_lotes("VENDAS", colunas=COLUNAS_VENDAS), fonte, acrescida
+                )
+            else:
+                agregados = sincronizar(agregados, dados.carregar_vendas(colunas=COLUNAS_VENDAS), fonte,
+                                        dados.duplicatas_descartadas("VENDAS"), acrescida)
+            salvar(agregados)
+
+        with _trava:
+            _memoria[tuple(fonte)] = agregados
+            while len(_memoria) > VERSOES_EM_MEMORIA:
+                _memoria.popitem(last=False)
+        return agregados
+
+
+def _em_reais(df):
+    return df.assign(VALOR_VENDA=df["SOMA_CENTAVOS"] / 100).drop(columns="SOMA_CENTAVOS")
+
+
+def _diario_com_uf(agregados):
+    # UF buscada pelo ID_FILIAL em um array (esquema estrela), sem merge
+    return esquema.com_atributos(agregados["diario"], "FILIAIS", ["UF"])
+
+
+def _resumir(df, chaves):
+    # observed=True: só as UFs presentes, e não todas as categorias do dicionário
+    return _em_reais(df.groupby(chaves, as_index=False, observed=True)[["SOMA_CENTAVOS", "N_VENDAS"]].sum())
+
+
+@instrumentacao.medido("groupby UF")
+def vendas_por_uf(agregados=None):
+    agregados = agregados or obter_agregados()
+    resumo = _resumir(_diario_com_uf(agregados), "UF")
+    if agregados["pares"] is None:
+        return resumo
+    pares = esquema.com_atributos(agregados["pares"], "FILIAIS", ["UF"])
+    clientes = pares.groupby("UF", observed=True)["ID_CLIENTE"].nunique()
+    return resumo.assign(N_CLIENTES=resumo["UF"].map(clientes).astype("int64"))
+
+
+@instrumentacao.medido("groupby data e UF")
+def vendas_por_data_uf(agregados=None):
+    agregados = agregados or obter_agregados()
+    return _resumir(_diario_com_uf(agregados), ["DATA_VENDA", "UF"])
+
+
+@instrumentacao.medido("groupby filial")
+def vendas_por_filial(agregados=None):
+    agregados = agregados or obter_agregados()
+    resumo = _resumir(agregados["diario"], "ID_FILIAL")
+    if agregados["pares"] is None:
+        return resumo
+    clientes = agregados["pares"].groupby("ID_FILIAL")["ID_CLIENTE"].nunique()
+    return resumo.assign(N_CLIENTES=resumo["ID_FILIAL"].map(clientes).astype("int64"))
+
+
+@instrumentacao.medido("groupby cliente")
+def vendas_por_cliente(agregados=None):
+    agregados = agregados or obter_agregados()
+    return _em_reais(agregados["clientes"])
+
+
+@instrumentacao.medido("groupby mês")
+def vendas_por_mes(agregados=None):
+    agregados = agregados or obter_agregados()
+    diario = _diario_com_uf(agregados)
+    diario = diario.assign(MÊS=diario["DATA_VENDA"].dt.month, ANO=diario["DATA_VENDA"].dt.year)
+    return _resumir(diario, ["MÊS", "ANO"])
@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Redução de pontos entre os DataFrames agregados e as figuras Plotly.
+# O navegador recebe no máximo PONTOS_GRAFICO pontos por figura:
+#   - séries temporais: LTTB (Largest-Triangle-Three-Buckets), que preserva picos e vales;
+#   - dispersões: acima do limite, os pontos são agrupados em uma grade 2-D e cada célula
+#     vira um marcador com o tamanho proporcional à quantidade de pontos (traço WebGL).
+# Abaixo do limite os dados seguem intactos: restringir o período ou o intervalo exibido
+# (o "zoom" das páginas) volta à resolução completa.
+
+PONTOS_GRAFICO = int(os.environ.get("DRIVATECH_PONTOS_GRAFICO", "5000"))
+CELULAS_DENSIDADE = (160, 100)
+
+
+def _numerico(valores):
+    valores = np.asarray(valores)
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return valores.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return valores.astype(np.float64)
+
+
+def lttb(x, y, pontos):
+    """Índices dos ``pontos`` escolhidos pelo LTTB, com ``x`` em ordem crescente.
+
+    O primeiro e o último ponto são sempre mantidos; de cada balde intermediário fica o
+    ponto que forma o maior triângulo com o ponto anterior escolhido e a média do balde
+    seguinte.
+    """
+    x, y = _numerico(x), _numerico(y)
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    # Limites dos pontos-2 baldes que dividem os pontos internos [1, n-1)
+    passo = (n - 2) / (pontos - 2)
+    limites = np.floor(np.arange(pontos - 1) * passo).astype(np.int64) + 1
+    limites[-1] = n - 1
+    inicios, fins = limites[:-1], limites[1:]
+    medias_x = np.add.reduceat(x[: n - 1], inicios) / (fins - inicios)
+    medias_y = np.add.reduceat(y[: n - 1], inicios) / (fins - inicios)
+    # O "balde seguinte" do último balde é o último ponto
+    medias_x = np.r_[medias_x[1:], x[-1]]
+    medias_y = np.r_[medias_y[1:], y[-1]]
+
+    escolhidos = np.empty(pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for balde, (a, b) in enumerate(zip(inicios, fins)):
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - medias_x[balde]) * (y[a:b] - ay) - (ax - x[a:b]) * (medias_y[balde] - ay))
+        anterior = a + int(np.argmax(areas))
+        escolhidos[balde + 1] = anterior
+    return escolhidos
+
+
+def reduzir_serie(df, x, y, grupo=None, pontos=None):
+    """Reduz uma série (ou uma série por ``grupo``) ao orçamento de ``pontos`` com LTTB.
+
+    O orçamento é dividido entre os grupos na proporção do tamanho de cada um.
+    """
+    pontos = pontos or PONTOS_GRAFICO
+    if len(df) <= pontos:
+        return df
+    df = df.sort_values([grupo, x] if grupo else x, kind="stable")
+    if grupo is None:
+        return df.iloc[lttb(df[x].to_numpy(), df[y].to_numpy(), pontos)]
+
+    partes = []
+    # observed=True: em categóricos (UF), só os grupos presentes, e não todo o dicionário
+    for _, parte in df.groupby(grupo, sort=False, observed=True):
+        cota = max(3, int(pontos * len(parte) / len(df)))
+        partes.append(parte.iloc[lttb(parte[x].to_numpy(), parte[y].to_numpy(), cota)])
+    return pd.concat(partes)
+
+
+def densidade(df, x, y, grupo=None, celulas=None):
+    """Agrupa uma dispersão em uma grade 2-D (por ``grupo``, se houver).
+
+    Cada célula ocupada vira uma linha com a posição média dos seus pontos e a contagem
+    em ``N_PONTOS``.
+    """
+    colunas_x, colunas_y = celulas or CELULAS_DENSIDADE
+    vx, vy = _numerico(df[x]), _numerico(df[y])
+
+    def celula(valores, quantidade):
+        menor, maior = valores.min(), valores.max()
+        escala = quantidade / (maior - menor) if maior > menor else 0.0
+        return np.minimum(((valores - menor) * escala).astype(np.int64), quantidade - 1)
+
+    chaves = {"_CX": celula(vx, colunas_x), "_CY": celula(vy, colunas_y)}
+    if grupo is not None:
+        chaves[grupo] = df[grupo].to_numpy()
+    grade = pd.DataFrame(dict(chaves, **{x: vx, y: vy}))
+    resumo = grade.groupby(list(chaves), as_index=False, sort=False).agg(
+        **{x: (x, "mean"), y: (y, "mean"), "N_PONTOS": (x, "size")}
+    )
+    for coluna in (x, y):
+        if pd.api.types.is_datetime64_any_dtype(df[coluna]):
+            resumo[coluna] = pd.to_datetime(resumo[coluna].round().astype(np.int64))
+    return resumo.drop(columns=["_CX", "_CY"])
+
+
+def reduzir_dispersao(df, x, y, grupo=None, pontos=None):
+    """Dispersão pronta para o gráfico e se ela foi agrupada.
+
+    Até ``pontos`` linhas os dados seguem intactos; acima disso vem a grade de ``densidade``.
+    """
+    pontos = pontos or PONTOS_GRAFICO
+    if len(df) <= pontos or df.empty:
+        return df, False
+    return densidade(df, x, y, grupo), True
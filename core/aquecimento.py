@@ -0,0 +1,128 @@
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+from core import agregados, dados, indice, instrumentacao, paineis
+
+# Aquecimento do processo, para o primeiro usuário de um pod novo não pagar a partida a frio.
+# Uma thread (iniciada por servidor.py antes do Streamlit subir, ou pelo primeiro rerun de
+# main.py) importa as bibliotecas pesadas, lê os arquivos estáticos e as tabelas e monta
+# agregados, índice, modelos e as visões sem filtros no cache de resultados. Um pedido que
+# chega no meio do aquecimento espera pela mesma leitura (travas e single-flight dos caches)
+# em vez de repeti-la.
+# O tempo até o primeiro render (do início do processo ao fim do primeiro rerun) é medido e
+# comparado com a meta DRIVATECH_META_PRIMEIRO_RENDER_S; os dois saem nas métricas.
+# DRIVATECH_AQUECIMENTO=0 desliga o aquecimento.
+
+ATIVO = os.environ.get("DRIVATECH_AQUECIMENTO", "1") != "0"
+META_PRIMEIRO_RENDER_S = float(os.environ.get("DRIVATECH_META_PRIMEIRO_RENDER_S", "3"))
+
+# Bibliotecas importadas só pelas funções que as usam (modelos e figuras)
+BIBLIOTECAS = ["plotly.express", "sklearn.linear_model", "sklearn.model_selection", "sklearn.cluster", "joblib"]
+ESTATICOS = ["static/styles.css", "assets/pagina_inicial1.json", "assets/animation1.json"]
+TABELAS = ["VENDAS", "FILIAIS", "CLIENTES"]
+
+logger = logging.getLogger(__name__)
+
+_processo = psutil.Process()
+_estado = {"aquecimento_s": None, "primeiro_render_s": None, "erro": None}
+_estaticos = {}  # (caminho, formato) -> (mtime, conteúdo)
+_pronto = threading.Event()
+_trava = threading.Lock()
+_thread = None
+
+
+def estatico(caminho, formato="texto"):
+    """Conteúdo de um arquivo estático (texto ou JSON já interpretado), relido só se mudar."""
+    mtime = os.stat(caminho).st_mtime_ns
+    chave = (caminho, formato)
+    with _trava:
+        if chave in _estaticos and _estaticos[chave][0] == mtime:
+            return _estaticos[chave][1]
+    with open(caminho, encoding="utf-8") as f:
+        conteudo = json.load(f) if formato == "json" else f.read()
+    with _trava:
+        _estaticos[chave] = (mtime, conteudo)
+    return conteudo
+
+
+def aquecer():
+    inicio = time.perf_counter()
+    with instrumentacao.execucao("aquecimento"):
+        with instrumentacao.etapa("bibliotecas"):
+            for biblioteca in BIBLIOTECAS:
+                importlib.import_module(biblioteca)
+        with instrumentacao.etapa("arquivos estáticos"):
+            for caminho in ESTATICOS:
+                estatico(caminho, "json" if caminho.endswith(".json") else "texto")
+        for tabela in TABELAS:
+            # Tabelas em fluxo (grandes demais para a memória) não são carregadas inteiras;
+            # agregados e índice abaixo as leem em lotes
+            if not dados.usar_fluxo(tabela):
+                dados.carregar_tabela(tabela)
+        with instrumentacao.etapa("agregados"):
+            agregados.obter_agregados()
+        with instrumentacao.etapa("índice"):
+            indice.obter_indice()
+        with instrumentacao.etapa("visões sem filtros"):
+            paineis.aquecer()
+    _estado["aquecimento_s"] = time.perf_counter() - inicio
+    logger.info("Aquecimento concluído em %.2f s", _estado["aquecimento_s"])
+
+
+def _executar():
+    try:
+        aquecer()
+    except Exception as erro:
+        # Sem aquecimento, as páginas só voltam a calcular sob demanda
+        logger.exception("Falha no aquecimento")
+        _estado["erro"] = f"{type(erro).__name__}: {erro}"
+    finally:
+        _pronto.set()
+
+
+def iniciar():
+    """Inicia o aquecimento em segundo plano, uma vez por processo."""
+    global _thread
+    with _trava:
+        if _thread is not None or not ATIVO:
+            return
+        _thread = threading.Thread(target=_executar, name="drivatech-aquecimento", daemon=True)
+        _thread.start()
+
+
+def aguardar(timeout=None):
+    # True quando o aquecimento terminou (ou nunca foi iniciado)
+    return _thread is None or _pronto.wait(timeout)
+
+
+def registrar_render():
+    """Mede, no primeiro rerun concluído do processo, o tempo desde a partida."""
+    with _trava:
+        if _estado["primeiro_render_s"] is not None:
+            return
+        _estado["primeiro_render_s"] = segundos = time.time() - _processo.create_time()
+    if segundos > META_PRIMEIRO_RENDER_S:
+        logger.warning("Primeiro render em %.2f s, acima da meta de %.2f s", segundos, META_PRIMEIRO_RENDER_S)
+    else:
+        logger.info("Primeiro render em %.2f s (meta: %.2f s)", segundos, META_PRIMEIRO_RENDER_S)
+
+
+def estado():
+    with _trava:
+        return dict(_estado, meta_primeiro_render_s=META_PRIMEIRO_RENDER_S)
+
+
+for _nome, _ajuda in [
+    ("primeiro_render_s", "Segundos do início do processo ao fim do primeiro rerun."),
+    ("meta_primeiro_render_s", "Meta de segundos até o primeiro render."),
+    ("aquecimento_s", "Segundos gastos no aquecimento do processo."),
+]:
+    instrumentacao.registrar_metrica(
+        f"drivatech_{_nome[:-2]}_segundos", "gauge", _ajuda, lambda nome=_nome: estado()[nome]
+    )
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Armazenamento colunar (Parquet + zstd) gerado a partir dos CSVs de data/.
+# VENDAS é particionada por mês (ANO_MES = AAAAMM) e por ID_FILIAL, o que permite ler
+# apenas as colunas e as partições que cada página precisa.
+# Gerar/atualizar o armazém: python -m core.armazenamento
+
+DIRETORIO_ARMAZEM = os.environ.get("DRIVATECH_STORE_DIR", os.path.join("data", "parquet"))
+MANIFESTO = "manifesto.json"
+COMPRESSAO = "zstd"
+
+PARTICOES_VENDAS = ds.partitioning(
+    pa.schema([("ANO_MES", pa.int32()), ("ID_FILIAL", pa.int32())]),
+    flavor="hive",
+)
+
+# Colunas monetárias são guardadas só em centavos; a versão em reais é derivada na leitura
+COLUNAS_DERIVADAS = {
+    "VALOR_VENDA": "VALOR_VENDA_CENTAVOS",
+    "PRECO_TABELA": "PRECO_TABELA_CENTAVOS",
+}
+
+_manifesto_cache = {}
+
+
+def ler_manifesto(diretorio=None):
+    # Retorna o manifesto do armazém, ou None se ele ainda não foi gerado
+    caminho = os.path.join(diretorio or DIRETORIO_ARMAZEM, MANIFESTO)
+    try:
+        mtime = os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifesto_cache.get("chave") != (caminho, mtime):
+        with open(caminho, encoding="utf-8") as f:
+            _manifesto_cache.update(chave=(caminho, mtime), manifesto=json.load(f))
+    return _manifesto_cache["manifesto"]
+
+
+def ano_mes(data):
+    data = pd.Timestamp(data)
+    return data.year * 100 + data.month
+
+
+def _para_arrow(df):
+    df = df.drop(columns=[c for c in COLUNAS_DERIVADAS if c in df.columns and COLUNAS_DERIVADAS[c] in df.columns])
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _esquema_vendas():
+    return pa.schema([
+        ("ID_VENDA", pa.int64()),
+        ("DATA_VENDA", pa.timestamp("ns")),
+        ("ID_FILIAL", pa.int32()),
+        ("ID_CLIENTE", pa.int32()),
+        ("VALOR_VENDA_CENTAVOS", pa.int64()),
+        ("ANO_MES", pa.int32()),
+    ])
+
+
+def _lote_vendas(df):
+    # Ordenar por data dentro de cada partição deixa as estatísticas dos row groups úteis
+    df = df.assign(ANO_MES=(df["DATA_VENDA"].dt.year * 100 + df["DATA_VENDA"].dt.month).astype("int32"))
+    df = df.sort_values(["ANO_MES", "ID_FILIAL", "DATA_VENDA"], kind="stable")
+    return pa.RecordBatch.from_pandas(df[_esquema_vendas().names], schema=_esquema_vendas(), preserve_index=False)
+
+
+def gravar_armazem(tabelas, fontes, destino=None):
+    """Grava as tabelas já limpas no armazém colunar.
+
+    ``tabelas`` mapeia o nome da tabela para o DataFrame preparado (para VENDAS, um
+    DataFrame ou um iterável de lotes) e ``fontes`` para a versão do CSV de origem.
+    A gravação é feita em um diretório temporário e trocada de uma vez, para que
+    leitores nunca vejam um armazém pela metade.
+    """
+    destino = destino or DIRETORIO_ARMAZEM
+    temporario = f"{destino}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    opcoes = ds.ParquetFileFormat().make_write_options(compression=COMPRESSAO)
+    for tabela, df in tabelas.items():
+        if tabela == "VENDAS":
+            lotes = [df] if isinstance(df, pd.DataFrame) else df
+            ds.write_dataset(
+                (_lote_vendas(lote) for lote in lotes),
+                os.path.join(temporario, tabela),
+                schema=_esquema_vendas(),
+                format="parquet",
+                partitioning=PARTICOES_VENDAS,
+                file_options=opcoes,
+                existing_data_behavior="overwrite_or_ignore",
+            )
+        else:
+            pq.write_table(_para_arrow(df), os.path.join(temporario, f"{tabela}.parquet"), compression=COMPRESSAO)
+
+    versao = hashlib.sha1(json.dumps(fontes, sort_keys=True).encode()).hexdigest()[:16]
+    manifesto = {
+        "versao": versao,
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fontes": fontes,
+        "tabelas": sorted(tabelas),
+    }
+    with open(os.path.join(temporario, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2)
+
+    antigo = f"{destino}.old-{os.getpid()}"
+    if os.path.exists(destino):
+        os.rename(destino, antigo)
+    os.rename(temporario, destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+    return manifesto
+
+
+def _filtro_vendas(inicio=None, fim=None, filiais=None):
+    filtro = None
+
+    def e(condicao):
+        return condicao if filtro is None else filtro & condicao
+
+    # As condições sobre ANO_MES e ID_FILIAL eliminam partições inteiras sem abrir os arquivos
+    if inicio is not None:
+        filtro = e((ds.field("ANO_MES") >= ano_mes(inicio)) & (ds.field("DATA_VENDA") >= pd.Timestamp(inicio)))
+    if fim is not None:
+        filtro = e((ds.field("ANO_MES") <= ano_mes(fim)) & (ds.field("DATA_VENDA") <= pd.Timestamp(fim)))
+    if filiais is not None:
+        filtro = e(ds.field("ID_FILIAL").isin([int(f) for f in filiais]))
+    return filtro
+
+
+def ler_tabela(tabela, colunas=None, inicio=None, fim=None, filiais=None, diretorio=None):
+    diretorio = diretorio or DIRETORIO_ARMAZEM
+    colunas_lidas = None
+    if colunas is not None:
+        colunas_lidas = list(dict.fromkeys(COLUNAS_DERIVADAS.get(c, c) for c in colunas))
+
+    if tabela == "VENDAS":
+        dataset = ds.dataset(os.path.join(diretorio, tabela), format="parquet", partitioning=PARTICOES_VENDAS)
+        df = dataset.to_table(columns=colunas_lidas, filter=_filtro_vendas(inicio, fim, filiais)).to_pandas()
+        df = df.drop(columns="ANO_MES", errors="ignore")
+    else:
+        df = pq.read_table(os.path.join(diretorio, f"{tabela}.parquet"), columns=colunas_lidas).to_pandas()
+
+    for derivada, origem in COLUNAS_DERIVADAS.items():
+        if origem in df.columns and (colunas is None or derivada in colunas):
+            df[derivada] = df[origem] / 100
+    if colunas is not None:
+        df = df[list(colunas)]
+    return df
+
+
+def ler_em_lotes(tabela, colunas=None, tamanho_lote=1_000_000, diretorio=None):
+    # Varre a tabela em lotes Arrow, sem materializar todas as linhas de uma vez
+    diretorio = diretorio or DIRETORIO_ARMAZEM
+    colunas_lidas = None
+    if colunas is not None:
+        colunas_lidas = list(dict.fromkeys(COLUNAS_DERIVADAS.get(c, c) for c in colunas))
+
+    if tabela == "VENDAS":
+        dataset = ds.dataset(os.path.join(diretorio, tabela), format="parquet", partitioning=PARTICOES_VENDAS)
+    else:
+        dataset = ds.dataset(os.path.join(diretorio, f"{tabela}.parquet"), format="parquet")
+
+    for lote in dataset.to_batches(columns=colunas_lidas, batch_size=tamanho_lote):
+        df = lote.to_pandas().drop(columns="ANO_MES", errors="ignore")
+        for derivada, origem in COLUNAS_DERIVADAS.items():
+            if origem in df.columns and (colunas is None or derivada in colunas):
+                df[derivada] = df[origem] / 100
+        yield df if colunas is None else df[list(colunas)]
+
+
+def tamanho_tabela(tabela, diretorio=None):
+    diretorio = diretorio or DIRETORIO_ARMAZEM
+    caminho = os.path.join(diretorio, tabela)
+    if not os.path.isdir(caminho):
+        return os.path.getsize(f"{caminho}.parquet")
+    return sum(
+        os.path.getsize(os.path.join(raiz, arquivo))
+        for raiz, _, arquivos in os.walk(caminho)
+        for arquivo in arquivos
+    )
+
+
+def main():
+    from core import dados
+
+    parser = argparse.ArgumentParser(description="Converte os CSVs de data/ para o armazém Parquet")
+    parser.add_argument("--destino", default=DIRETORIO_ARMAZEM)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    tabelas = {}
+    fontes = {}
+    for tabela in dados.TABELAS:
+        fontes[tabela] = list(dados.versao_csv(tabela))
+        if tabela == "VENDAS":
+            # VENDAS é convertida em lotes, sem precisar caber inteira na memória
+            tabelas[tabela] = dados.sem_duplicatas(dados.ler_em_lotes(tabela, origem="csv"))
+        else:
+            tabelas[tabela] = dados.carregar_csv(tabela)
+    manifesto = gravar_armazem(tabelas, fontes, args.destino)
+    print(f"Armazém {manifesto['versao']} gravado em {args.destino} ({time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+import plotly.io as pio
+
+from core import dados
+
+# Artefatos pré-calculados das páginas (tabelas em Parquet, figuras Plotly em JSON e valores
+# soltos em JSON), gerados em lote por precomputar.py.
+# Cada artefato vale para a versão dos dados registrada no manifesto: se os CSVs (ou o
+# armazém Parquet) mudarem, as páginas voltam a calcular ao vivo até o próximo lote.
+
+DIRETORIO_ARTEFATOS = os.environ.get("DRIVATECH_ARTIFACT_DIR", os.path.join("data", "artefatos"))
+MANIFESTO = "manifesto.json"
+
+_memoria = {}
+_trava = threading.Lock()
+
+
+def nome_artefato(pagina, opcoes):
+    # "pagina" ou "pagina-chave=valor-..." com as opções em ordem
+    return "-".join([pagina] + [f"{chave}={opcoes[chave]}" for chave in sorted(opcoes)])
+
+
+def _normalizar(valor):
+    # Mesma forma com que a versão volta do JSON (tuplas viram listas)
+    return json.loads(json.dumps(valor))
+
+
+def gravar_artefato(diretorio, nome, resultado):
+    caminho = os.path.join(diretorio, nome)
+    os.makedirs(caminho)
+    for tabela, df in resultado.get("tabelas", {}).items():
+        df.to_parquet(os.path.join(caminho, f"{tabela}.parquet"))
+    figuras = {figura: fig.to_json() for figura, fig in resultado.get("figuras", {}).items()}
+    with open(os.path.join(caminho, "artefato.json"), "w", encoding="utf-8") as f:
+        json.dump({"valores": resultado.get("valores", {}), "figuras": figuras}, f)
+
+
+def publicar(temporario, manifesto, destino=None):
+    """Grava o manifesto e troca o diretório de artefatos de uma vez."""
+    destino = destino or DIRETORIO_ARTEFATOS
+    with open(os.path.join(temporario, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2)
+    antigo = f"{destino}.old-{os.getpid()}"
+    if os.path.exists(destino):
+        os.rename(destino, antigo)
+    os.rename(temporario, destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def ler_manifesto(diretorio=None):
+    caminho = os.path.join(diretorio or DIRETORIO_ARTEFATOS, MANIFESTO)
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def carregar_artefato(nome, diretorio=None):
+    """Artefato pré-calculado, ou None se não existir ou for de outra versão dos dados."""
+    diretorio = diretorio or DIRETORIO_ARTEFATOS
+    try:
+        mtime = os.stat(os.path.join(diretorio, MANIFESTO)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    chave = (diretorio, mtime, nome)
+    with _trava:
+        if chave in _memoria:
+            resultado = _memoria[chave]
+            return resultado if resultado is not None and _em_dia(resultado) else None
+
+    manifesto = ler_manifesto(diretorio)
+    caminho = os.path.join(diretorio, nome)
+    resultado = None
+    if manifesto is not None and nome in manifesto["artefatos"]:
+        with open(os.path.join(caminho, "artefato.json"), encoding="utf-8") as f:
+            conteudo = json.load(f)
+        resultado = {
+            "tabelas": {
+                arquivo[:-len(".parquet")]: pd.read_parquet(os.path.join(caminho, arquivo))
+                for arquivo in os.listdir(caminho) if arquivo.endswith(".parquet")
+            },
+            "figuras": {figura: pio.from_json(texto) for figura, texto in conteudo["figuras"].items()},
+            "valores": conteudo["valores"],
+            "versao_dados": manifesto["versao_dados"],
+        }
+    with _trava:
+        # Artefatos de manifestos anteriores não serão mais lidos
+        for antiga in [c for c in _memoria if c[0] == diretorio and c[1] != mtime]:
+            del _memoria[antiga]
+        _memoria[chave] = resultado
+    return resultado if resultado is not None and _em_dia(resultado) else None
+
+
+def _em_dia(resultado):
+    return resultado["versao_dados"] == _normalizar(dados.versao_dados())
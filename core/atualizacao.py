@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from core import agregados, dados, indice, instrumentacao, paineis
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # sem watchdog, a pasta é só consultada a cada intervalo
+    Observer = None
+
+# Atualização dos dados em segundo plano, fora das requisições.
+# Uma thread por processo (iniciada por main.py) observa data/ (eventos do watchdog, com
+# uma consulta a cada DRIVATECH_ATUALIZACAO_S segundos como garantia). Quando uma tabela
+# muda e o arquivo fica estável por um intervalo, a versão nova é preparada inteira:
+#   - CSV que só cresceu (linhas acrescentadas no fim): só os bytes novos são analisados e
+#     anexados à tabela já em memória. "Só cresceu" é conferido pelo sha1 de todo o arquivo
+#     da versão anterior, guardado quando ela foi publicada: o começo da versão nova precisa
+#     ter o mesmo hash, então qualquer edição antes do fim leva à releitura completa. Os
+#     hashes são calculados nesta thread, em blocos, fora das requisições;
+#   - outras mudanças: a tabela é relida por completo;
+#   - agregados, índice e as visões sem filtros (cache de resultados) são refeitos.
+# Enquanto isso, as páginas continuam usando a versão publicada (dados.versao_tabela). No
+# fim, as versões de todas as tabelas são trocadas de uma vez (dados.publicar_versoes) e as
+# sessões abertas recebem um aviso para atualizar a página (``aviso``).
+# O aviso é conferido por cada sessão aberta a cada DRIVATECH_AVISO_S segundos (padrão: 60),
+# um intervalo próprio e mais longo que o da verificação do disco: com muitas sessões, um
+# rerun parcial de cada uma a cada 2 s seria uma carga constante no servidor.
+# DRIVATECH_ATUALIZACAO=0 desliga a thread: cada rerun volta a conferir o disco.
+
+ATIVA = os.environ.get("DRIVATECH_ATUALIZACAO", "1") != "0"
+INTERVALO_S = float(os.environ.get("DRIVATECH_ATUALIZACAO_S", "2"))
+AVISO_S = float(os.environ.get("DRIVATECH_AVISO_S", "60"))
+# Tamanho dos blocos lidos para calcular o hash de um CSV
+BLOCO_ASSINATURA = 4 * 2**20
+
+logger = logging.getLogger(__name__)
+
+_estado = {"geracao": 0, "atualizado_em": None, "segundos": None, "anexadas": {}, "erro": None}
+_assinaturas = {}  # tabela -> (versão CSV, sha1 do arquivo nessa versão)
+_acordar = threading.Event()
+_trava = threading.Lock()
+_thread = None
+_fragmento = None
+
+
+def _versoes_disco():
+    return {tabela: dados.versao_disco(tabela) for tabela in dados.TABELAS}
+
+
+def _assinaturas_prefixo(tabela, *tamanhos):
+    """sha1 dos primeiros bytes do CSV para cada um dos ``tamanhos`` (crescentes), em uma leitura.
+
+    None para os tamanhos além do fim do arquivo.
+    """
+    hash_, lidos, resultado = hashlib.sha1(), 0, []
+    with open(dados.caminho_tabela(tabela), "rb") as f:
+        for tamanho in tamanhos:
+            while lidos < tamanho:
+                bloco = f.read(min(BLOCO_ASSINATURA, tamanho - lidos))
+                if not bloco:
+                    break
+                hash_.update(bloco)
+                lidos += len(bloco)
+            resultado.append(hash_.hexdigest() if lidos == tamanho else None)
+    return resultado
+
+
+def _lembrar(tabela, versao, assinatura=None):
+    _assinaturas.pop(tabela, None)
+    if versao[0] != "csv":
+        return
+    if assinatura is None:
+        [assinatura] = _assinaturas_prefixo(tabela, versao[2])
+    # Um arquivo que mudou durante a leitura não tem hash confiável: a próxima mudança relê tudo
+    if assinatura is not None and dados.versao_disco(tabela) == versao:
+        _assinaturas[tabela] = (versao, assinatura)
+
+
+def _so_cresceu(tabela, anterior, nova):
+    """sha1 da versão ``nova`` se ela só acrescentou bytes à ``anterior``; None caso contrário.
+
+    O começo do arquivo, até o tamanho anterior, precisa ter o hash guardado para a versão
+    anterior; o hash da nova sai da mesma leitura.
+    """
+    if anterior is None or anterior[0] != "csv" or nova[0] != "csv" or nova[2] <= anterior[2]:
+        return None
+    versao, assinatura = _assinaturas.get(tabela, (None, None))
+    if versao != anterior:
+        return None
+    prefixo, completa = _assinaturas_prefixo(tabela, anterior[2], nova[2])
+    return completa if prefixo == assinatura else None
+
+
+def _preparar_tabela(tabela, anterior, nova):
+    # Devolve o hash da versão nova quando ela só cresceu (a mesma leitura que o _lembrar faria)
+    assinatura = _so_cresceu(tabela, anterior, nova)
+    if assinatura is not None:
+        # Os agregados usam isso para não reconferir as vendas já processadas
+        dados.registrar_acrescimo(tabela, anterior, nova)
+    # Só as tabelas já em uso (no cache) são preparadas; as outras carregam quando pedidas
+    base = dados.tabela_em_cache(tabela, anterior)
+    if base is None or dados.usar_fluxo(tabela):
+        return assinatura
+    if assinatura is not None:
+        with instrumentacao.etapa(f"bytes novos {tabela}") as registro:
+            novas = dados.ler_intervalo(tabela, anterior[2], nova[2])
+            registro["linhas_saida"] = len(novas)
+        _estado["anexadas"][tabela] = len(novas)
+        dados.instalar_tabela(tabela, nova, lambda: dados.anexar(base, novas))
+    else:
+        dados.instalar_tabela(tabela, nova)
+    return assinatura
+
+
+def atualizar(novas):
+    """Prepara a versão ``novas`` (tabela -> versão) e a publica; False se o disco mudou no meio."""
+    anteriores = dados.versoes_publicadas()
+    inicio = time.perf_counter()
+    _estado["anexadas"] = {}
+    assinaturas = {}
+    with instrumentacao.execucao("atualização de dados"), dados.fixar_versoes(novas):
+        for tabela, versao in novas.items():
+            if versao != anteriores.get(tabela):
+                with instrumentacao.etapa(f"tabela {tabela}"):
+                    assinaturas[tabela] = _preparar_tabela(tabela, anteriores.get(tabela), versao)
+        with instrumentacao.etapa("agregados"):
+            agregados.obter_agregados()
+        with instrumentacao.etapa("índice"):
+            indice.obter_indice()
+        with instrumentacao.etapa("visões sem filtros"):
+            paineis.aquecer()
+
+    if _versoes_disco() != novas:
+        # Uma tabela relida por completo pode já conter linhas de depois da versão medida
+        return False
+    dados.publicar_versoes(novas)
+    for tabela, versao in novas.items():
+        if versao != anteriores.get(tabela):
+            _lembrar(tabela, versao, assinaturas.get(tabela))
+    with _trava:
+        _estado.update(
+            geracao=_estado["geracao"] + 1,
+            atualizado_em=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            segundos=time.perf_counter() - inicio,
+            erro=None,
+        )
+    logger.info("Dados atualizados em %.2f s: %s", _estado["segundos"], novas)
+    return True
+
+
+def _laco(iniciais):
+    # Os hashes das versões publicadas no início são calculados aqui, e não em ``iniciar``,
+    # que roda na primeira requisição
+    for tabela, versao in iniciais.items():
+        _lembrar(tabela, versao)
+    pendentes, desde = None, None
+    while True:
+        _acordar.wait(INTERVALO_S)
+        _acordar.clear()
+        try:
+            disco = _versoes_disco()
+            if disco == dados.versoes_publicadas():
+                pendentes = None
+            elif disco != pendentes:
+                # Espera o arquivo ficar estável por um intervalo (gravação em andamento)
+                pendentes, desde = disco, time.monotonic()
+            elif time.monotonic() - desde >= INTERVALO_S and atualizar(disco):
+                pendentes = None
+        except Exception as erro:
+            # Um CSV em meio a uma reescrita, por exemplo: tenta de novo no próximo intervalo
+            logger.exception("Falha na atualização dos dados")
+            with _trava:
+                _estado["erro"] = f"{type(erro).__name__}: {erro}"
+
+
+class _Evento(FileSystemEventHandler if Observer else object):
+    def on_any_event(self, event):
+        _acordar.set()
+
+
+def iniciar():
+    """Inicia, uma vez por processo, a thread que mantém os dados em dia."""
+    global _thread
+    with _trava:
+        if _thread is not None or not ATIVA:
+            return
+        # A partir daqui as páginas usam a versão publicada, e não a do disco
+        versoes = _versoes_disco()
+        dados.publicar_versoes(versoes)
+        _thread = threading.Thread(target=_laco, args=(versoes,), name="drivatech-atualizacao", daemon=True)
+        _thread.start()
+        if Observer is not None:
+            observador = Observer()
+            observador.daemon = True
+            observador.schedule(_Evento(), dados.DIRETORIO_DADOS, recursive=False)
+            observador.start()
+
+
+def estado():
+    with _trava:
+        return dict(_estado)
+
+
+def aviso():
+    """Avisa a sessão quando uma versão nova dos dados foi publicada depois do último rerun."""
+    global _fragmento
+    if _thread is None:
+        return
+    import streamlit as st
+
+    # Um rerun completo já desenha a versão publicada
+    st.session_state["geracao_dados"] = _estado["geracao"]
+    if _fragmento is None:
+        @st.fragment(run_every=AVISO_S)
+        def _conferir():
+            atual = estado()
+            if atual["geracao"] != st.session_state.get("geracao_dados"):
+                st.info(f"Novos dados disponíveis (atualizados em {atual['atualizado_em']}).")
+                if st.button("Atualizar a página"):
+                    st.rerun()
+
+        _fragmento = _conferir
+    _fragmento()
+
+
+instrumentacao.registrar_metrica(
+    "drivatech_atualizacao_geracao", "gauge", "Versões de dados publicadas pela atualização em segundo plano.",
+    lambda: estado()["geracao"],
+)
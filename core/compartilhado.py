@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, o compartilhamento fica desligado
+    fcntl = None
+
+# Tabelas limpas publicadas uma única vez por host, em Arrow IPC sem compressão, e mapeadas
+# em memória (mmap, somente leitura) por todos os processos do Streamlit.
+# Cada processo já compartilha as tabelas entre as suas sessões (cache de core/dados.py);
+# com várias réplicas no mesmo host, cada uma também analisava os CSVs e guardava a sua
+# cópia. Com o segmento compartilhado, a primeira réplica a precisar da tabela faz a
+# limpeza e grava o arquivo; as outras (e ela mesma) só mapeiam as páginas do arquivo, que
+# ficam uma única vez no page cache (ou na RAM, em /dev/shm).
+# O nome do arquivo inclui a versão dos dados: quando os CSVs mudam, o próximo acesso
+# publica e mapeia um arquivo novo (trocado por rename, de forma atômica), e os arquivos
+# de versões antigas são removidos. Leitores que ainda os mapeiam continuam válidos até
+# soltá-los (semântica de unlink do POSIX).
+# Colunas numéricas e de datas saem sem cópia; o DataFrame resultante é somente leitura.
+# DRIVATECH_SHARED_DIR vazio desliga o compartilhamento.
+
+DIRETORIO_COMPARTILHADO = os.environ.get(
+    "DRIVATECH_SHARED_DIR",
+    os.path.join("/dev/shm", "drivatech") if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "drivatech"),
+)
+
+# Muda quando a limpeza ou os tipos das tabelas mudam, invalidando os segmentos publicados
+FORMATO = 2
+# Chave dos metadados do esquema Arrow com os attrs do DataFrame (ex.: duplicatas descartadas)
+METADADOS_ATTRS = b"drivatech.attrs"
+
+# Strings Arrow voltam como string[pyarrow], sem virar objetos Python
+_TIPOS = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+
+def ativo():
+    return bool(DIRETORIO_COMPARTILHADO) and fcntl is not None
+
+
+def _prefixo(diretorio_dados, tabela):
+    # Vários diretórios de dados (ou checkouts) podem dividir o mesmo /dev/shm
+    origem = hashlib.sha1(os.path.abspath(diretorio_dados).encode()).hexdigest()[:8]
+    return f"{origem}-{tabela}-"
+
+
+def caminho(diretorio_dados, tabela, versao):
+    chave = hashlib.sha1(json.dumps([FORMATO, versao], default=str).encode()).hexdigest()[:16]
+    return os.path.join(DIRETORIO_COMPARTILHADO, f"{_prefixo(diretorio_dados, tabela)}{chave}.arrow")
+
+
+def _mapear(arquivo):
+    try:
+        fonte = pa.memory_map(arquivo, "r")
+    except FileNotFoundError:
+        return None
+    tabela = pa.ipc.open_file(fonte).read_all()
+    # split_blocks evita consolidar colunas do mesmo tipo (o que exigiria copiar)
+    df = tabela.to_pandas(split_blocks=True, types_mapper=_TIPOS.get)
+    df.attrs.update(json.loads((tabela.schema.metadata or {}).get(METADADOS_ATTRS, b"{}")))
+    return df
+
+
+def _publicar(arquivo, df):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), METADADOS_ATTRS: json.dumps(df.attrs)})
+    temporario = f"{arquivo}.tmp-{os.getpid()}"
+    with pa.OSFile(temporario, "wb") as destino:
+        with pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, arquivo)
+
+
+def _remover_antigas(diretorio_dados, tabela, atual):
+    prefixo = _prefixo(diretorio_dados, tabela)
+    for nome in os.listdir(DIRETORIO_COMPARTILHADO):
+        if nome.startswith(prefixo) and nome.endswith(".arrow") and os.path.join(DIRETORIO_COMPARTILHADO, nome) != atual:
+            try:
+                os.remove(os.path.join(DIRETORIO_COMPARTILHADO, nome))
+            except FileNotFoundError:
+                pass
+
+
+def obter(diretorio_dados, tabela, versao, carregar):
+    """DataFrame somente leitura da tabela mapeado do segmento compartilhado.
+
+    Se ninguém publicou esta versão ainda, ``carregar()`` produz a tabela limpa, que é
+    publicada antes de ser mapeada. Uma trava de arquivo garante que, entre processos,
+    só um deles carrega cada versão; os outros esperam e mapeiam o resultado.
+    """
+    arquivo = caminho(diretorio_dados, tabela, versao)
+    df = _mapear(arquivo)
+    if df is not None:
+        return df
+
+    os.makedirs(DIRETORIO_COMPARTILHADO, exist_ok=True)
+    with open(os.path.join(DIRETORIO_COMPARTILHADO, f"{_prefixo(diretorio_dados, tabela)}trava"), "w") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            df = _mapear(arquivo)
+            if df is None:
+                _publicar(arquivo, carregar())
+                _remover_antigas(diretorio_dados, tabela, arquivo)
+                df = _mapear(arquivo)
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+    return df
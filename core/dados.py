@@ -0,0 +1,529 @@
+import contextlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import armazenamento, compartilhado, instrumentacao
+from core.moeda import brl_para_centavos, centavos_para_float
+
+# Camada única de acesso aos dados das páginas.
+# Cada tabela é lida do disco uma única vez por versão dos dados e mantida em um cache LRU
+# limitado por memória, compartilhado por todas as sessões.
+# A leitura usa o armazém Parquet (core/armazenamento.py) quando ele existe e está em dia
+# com os CSVs; caso contrário, cai para os CSVs de data/.
+# Os DataFrames retornados são compartilhados: as páginas não devem modificá-los.
+# Tabelas completas (e as seleções de colunas delas) vêm do segmento compartilhado entre os
+# processos do host (core/compartilhado.py): limpas uma vez e mapeadas em memória, somente
+# leitura. Leituras do armazém com filtros de linha continuam indo direto ao Parquet.
+# As tabelas ficam compactas (esquema estrela, veja core/esquema.py): textos das dimensões
+# como categóricos e IDs no menor inteiro que os comporta.
+# Com a atualização em segundo plano ligada (core/atualizacao.py), as páginas usam a versão
+# publicada por ela, e não a do disco: a versão nova só aparece depois de pronta.
+
+DIRETORIO_DADOS = os.environ.get("DRIVATECH_DATA_DIR", "data")
+LIMITE_CACHE_BYTES = int(os.environ.get("DRIVATECH_CACHE_MB", "512")) * 1024 * 1024
+
+# Fontes maiores que este limite são processadas em lotes (fluxo), sem carregar a tabela inteira
+LIMITE_FLUXO_BYTES = int(os.environ.get("DRIVATECH_FLUXO_MB", "1024")) * 1024 * 1024
+TAMANHO_LOTE = int(os.environ.get("DRIVATECH_LOTE_LINHAS", "1000000"))
+
+TABELAS = {
+    "VENDAS": {
+        "arquivo": "VENDAS.csv",
+        "dtype": {
+            "ID_VENDA": "int64",
+            "DATA_VENDA": "object",
+            "ID_FILIAL": "int32",
+            "ID_CLIENTE": "int32",
+            "VALOR_VENDA": "string[pyarrow]",
+        },
+    },
+    "FILIAIS": {
+        "arquivo": "FILIAIS.csv",
+        "dtype": {
+            "ID_FILIAL": "int32",
+            "NOME_FILIAL": "category",
+            "CIDADE": "category",
+            "UF": "category",
+        },
+    },
+    "CLIENTES": {
+        "arquivo": "CLIENTES.csv",
+        "dtype": {
+            "ID_CLIENTE": "int32",
+            "NOME_CLIENTE": "string[pyarrow]",
+            "CIDADE": "category",
+            "UF": "category",
+        },
+    },
+    "PRODUTOS": {
+        "arquivo": "PRODUTOS.csv",
+        "dtype": {
+            "ID_PRODUTO": "int32",
+            "NOME_PRODUTO": "string[pyarrow]",
+            "PRECO_TABELA": "string[pyarrow]",
+        },
+    },
+}
+
+_cache = OrderedDict()
+_bytes_em_cache = 0
+_trava = threading.RLock()
+
+# Versões publicadas pela atualização em segundo plano (tabela -> versão), trocadas de uma vez
+_publicadas = {}
+# Versões fixadas só na thread atual, enquanto a atualização prepara a versão nova
+_local = threading.local()
+# Versões de CSV que só acrescentaram linhas ao fim da anterior (tabela, nova) -> anterior,
+# conferidas pela atualização pelo hash do arquivo; uma entrada por atualização
+_acrescimos = OrderedDict()
+ACRESCIMOS_LEMBRADOS = 16
+
+
+def caminho_tabela(tabela):
+    return os.path.join(DIRETORIO_DADOS, TABELAS[tabela]["arquivo"])
+
+
+def versao_csv(tabela):
+    # Identifica a versão do arquivo pelo mtime e pelo tamanho em bytes
+    info = os.stat(caminho_tabela(tabela))
+    return (info.st_mtime_ns, info.st_size)
+
+
+def versao_disco(tabela):
+    # ("parquet", versão do armazém) ou ("csv", mtime, tamanho)
+    manifesto = armazenamento.ler_manifesto()
+    if manifesto and tabela in manifesto["tabelas"]:
+        if not os.path.exists(caminho_tabela(tabela)) or list(versao_csv(tabela)) == manifesto["fontes"][tabela]:
+            return ("parquet", manifesto["versao"])
+    return ("csv",) + versao_csv(tabela)
+
+
+def versao_tabela(tabela):
+    # Versão fixada nesta thread, a publicada ou, sem atualização em segundo plano, a do disco
+    versoes = getattr(_local, "versoes", None) or _publicadas
+    if tabela in versoes:
+        return versoes[tabela]
+    return versao_disco(tabela)
+
+
+def versao_dados(*tabelas):
+    tabelas = tabelas or tuple(TABELAS)
+    return tuple((tabela,) + versao_tabela(tabela) for tabela in tabelas)
+
+
+def versoes_publicadas():
+    return dict(_publicadas)
+
+
+def versao_dados_publicada():
+    # Como versao_dados(), mas ignorando versões fixadas na thread (None sem publicação)
+    if not _publicadas:
+        return None
+    return tuple((tabela,) + _publicadas[tabela] for tabela in TABELAS)
+
+
+def publicar_versoes(versoes):
+    """Troca, de uma vez para todas as sessões, as versões das tabelas que as páginas usam."""
+    global _publicadas
+    _publicadas = dict(versoes)
+
+
+@contextlib.contextmanager
+def fixar_versoes(versoes):
+    """Faz a thread atual enxergar ``versoes`` (para preparar caches de uma versão nova)."""
+    anteriores = getattr(_local, "versoes", None)
+    _local.versoes = dict(versoes)
+    try:
+        yield
+    finally:
+        _local.versoes = anteriores
+
+
+def registrar_acrescimo(tabela, anterior, nova):
+    """Registra que a versão ``nova`` da tabela só acrescentou linhas ao fim da ``anterior``."""
+    with _trava:
+        _acrescimos[(tabela, tuple(nova))] = tuple(anterior)
+        while len(_acrescimos) > ACRESCIMOS_LEMBRADOS:
+            _acrescimos.popitem(last=False)
+
+
+def so_acrescentou(tabela, anterior, nova):
+    """True se, da versão ``anterior`` à ``nova``, a tabela só ganhou linhas no fim.
+
+    Segue a cadeia de acréscimos registrados; False quando não há como saber.
+    """
+    if anterior is None:
+        return False
+    anterior, versao = tuple(anterior), tuple(nova)
+    with _trava:
+        while versao != anterior:
+            versao = _acrescimos.get((tabela, versao))
+            if versao is None:
+                return False
+    return True
+
+
+def _ler_csv(tabela, **kwargs):
+    return pd.read_csv(
+        caminho_tabela(tabela),
+        delimiter=";",
+        encoding="utf-8-sig",
+        dtype=TABELAS[tabela]["dtype"],
+        **kwargs,
+    )
+
+
+def _compactar(df):
+    # Textos repetidos (CIDADE, UF) como categóricos (códigos + dicionário), textos quase
+    # únicos (nomes) como strings Arrow e IDs no menor inteiro que os comporta.
+    # ID_VENDA fica em int64: é a marca d'água dos agregados e a chave do bitmap de duplicatas.
+    # As colunas novas entram por assign: ``df`` pode ser o resultado de um drop_duplicates
+    # ou de uma seleção, e a atribuição direta geraria um SettingWithCopyWarning
+    compactas = {}
+    for coluna in df.columns:
+        if df[coluna].dtype == object:
+            repetidos = df[coluna].nunique() * 2 <= len(df)
+            compactas[coluna] = df[coluna].astype("category" if repetidos else "string[pyarrow]")
+        elif coluna.startswith("ID_") and coluna != "ID_VENDA" and np.issubdtype(df[coluna].dtype, np.integer):
+            compactas[coluna] = pd.to_numeric(df[coluna], downcast="integer")
+    return df.assign(**compactas) if compactas else df
+
+
+def _preparar(tabela, df, deduplicar=True):
+    # Limpeza feita uma única vez no carregamento, e não a cada rerun das páginas.
+    # Valores monetários ficam em centavos exatos (int64) e em reais (float64) para os gráficos.
+    if tabela == "VENDAS":
+        if "VALOR_VENDA" in df.columns:
+            df["VALOR_VENDA_CENTAVOS"] = brl_para_centavos(df["VALOR_VENDA"])
+            df["VALOR_VENDA"] = centavos_para_float(df["VALOR_VENDA_CENTAVOS"])
+        if "DATA_VENDA" in df.columns:
+            df["DATA_VENDA"] = pd.to_datetime(df["DATA_VENDA"], format="%d/%m/%Y")
+        # ID_VENDA é a chave primária: duplicatas são descartadas por ela, não pela linha inteira.
+        # Quando os IDs já vêm estritamente crescentes (o caso normal), não há o que remover.
+        # O nº descartado fica em attrs["duplicatas"] (veja ``duplicatas_descartadas``).
+        ids = df["ID_VENDA"].to_numpy()
+        if deduplicar:
+            if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+                df = df.drop_duplicates(subset="ID_VENDA", ignore_index=True)
+            df.attrs["duplicatas"] = len(ids) - len(df)
+    elif tabela == "PRODUTOS":
+        df["PRECO_TABELA_CENTAVOS"] = brl_para_centavos(df["PRECO_TABELA"])
+        df["PRECO_TABELA"] = centavos_para_float(df["PRECO_TABELA_CENTAVOS"])
+    return _compactar(df)
+
+
+def tamanho_fonte(tabela):
+    # Tamanho em disco da fonte atual da tabela (CSV ou arquivos Parquet)
+    if versao_tabela(tabela)[0] == "parquet":
+        return armazenamento.tamanho_tabela(tabela)
+    return versao_csv(tabela)[1]
+
+
+def usar_fluxo(tabela):
+    return tamanho_fonte(tabela) > LIMITE_FLUXO_BYTES
+
+
+def ler_em_lotes(tabela, colunas=None, tamanho_lote=None, origem=None):
+    """Lê uma tabela limpa em lotes de ``tamanho_lote`` linhas, com memória limitada.
+
+    Diferente de ``carregar_tabela``, os lotes não passam pelo cache e as duplicatas de
+    ID_VENDA entre lotes não são removidas (veja ``sem_duplicatas``). ``origem="csv"``
+    ignora o armazém Parquet.
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE
+    if origem != "csv" and versao_tabela(tabela)[0] == "parquet":
+        yield from armazenamento.ler_em_lotes(tabela, colunas, tamanho_lote)
+        return
+
+    lidas = None
+    if colunas is not None:
+        # As colunas em centavos são derivadas das colunas de texto originais
+        lidas = [c.replace("_CENTAVOS", "") for c in colunas]
+    with _ler_csv(tabela, usecols=lidas, chunksize=tamanho_lote) as leitor:
+        for lote in leitor:
+            lote = _preparar(tabela, lote, deduplicar=False)
+            yield lote if colunas is None else lote[list(colunas)]
+
+
+def marcar_ids(vistos, ids, base=0):
+    """Marca ``ids`` em um bitmap (1 bit por ID a partir de ``base``).
+
+    Retorna o bitmap, possivelmente ampliado, e a máscara dos IDs que ainda não tinham
+    sido vistos, considerando também repetições dentro do próprio ``ids``.
+    """
+    posicoes = np.asarray(ids, dtype=np.int64) - base
+    if len(posicoes) and posicoes.min() < 0:
+        raise ValueError("ID abaixo da base do bitmap de duplicatas")
+    palavras = posicoes >> 3
+    bits = np.left_shift(1, posicoes & 7).astype(np.uint8)
+    if len(palavras) and palavras.max() >= len(vistos):
+        vistos = np.concatenate([vistos, np.zeros(max(int(palavras.max()) + 1, 2 * len(vistos)) - len(vistos), dtype=np.uint8)])
+
+    novos = (vistos[palavras] & bits) == 0
+    novos &= ~pd.Series(posicoes).duplicated().to_numpy()
+    np.bitwise_or.at(vistos, palavras[novos], bits[novos])
+    return vistos, novos
+
+
+def sem_duplicatas(lotes):
+    # Remove duplicatas de ID_VENDA entre lotes, mantendo a primeira ocorrência
+    vistos = np.zeros(0, dtype=np.uint8)
+    for lote in lotes:
+        vistos, novos = marcar_ids(vistos, lote["ID_VENDA"].to_numpy())
+        yield lote if novos.all() else lote[novos]
+
+
+def ler_intervalo(tabela, inicio, fim):
+    """Linhas limpas contidas nos bytes ``[inicio, fim)`` do CSV da tabela.
+
+    ``inicio`` deve cair em um começo de linha (por exemplo, o tamanho anterior de um
+    arquivo que só recebeu linhas no final). O cabeçalho é lido do começo do arquivo.
+    """
+    caminho = caminho_tabela(tabela)
+    colunas = pd.read_csv(caminho, delimiter=";", encoding="utf-8-sig", nrows=0).columns
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        bloco = f.read(fim - inicio)
+    df = pd.read_csv(
+        io.BytesIO(bloco),
+        delimiter=";",
+        encoding="utf-8",
+        header=None,
+        names=list(colunas),
+        dtype=TABELAS[tabela]["dtype"],
+    )
+    return _preparar(tabela, df)
+
+
+def anexar(base, novas):
+    """``base`` seguida das linhas de ``novas``, nos tipos compactos de ``base``.
+
+    Em VENDAS, linhas de ``novas`` com ID_VENDA já presente em ``base`` são descartadas,
+    como as duplicatas de uma leitura completa.
+    """
+    duplicatas = base.attrs.get("duplicatas", 0) + novas.attrs.get("duplicatas", 0)
+    if "ID_VENDA" in base.columns and len(base) and len(novas):
+        ids = novas["ID_VENDA"].to_numpy()
+        if ids.min() <= base["ID_VENDA"].max():
+            novas = novas[~np.isin(ids, base["ID_VENDA"].to_numpy())]
+            duplicatas += len(ids) - len(novas)
+    colunas = {}
+    for coluna in base.columns:
+        antiga, nova = base[coluna], novas[coluna]
+        if isinstance(antiga.dtype, pd.CategoricalDtype):
+            # Categorias novas (uma cidade nova, por exemplo) entram no fim do dicionário
+            valores = nova.cat.categories if isinstance(nova.dtype, pd.CategoricalDtype) else pd.Index(nova.dropna().unique())
+            tipo = pd.CategoricalDtype(antiga.cat.categories.append(valores.difference(antiga.cat.categories)))
+            antiga, nova = antiga.astype(tipo), nova.astype(tipo)
+        elif isinstance(antiga.dtype, pd.StringDtype):
+            nova = nova.astype(antiga.dtype)
+        colunas[coluna] = pd.concat([antiga, nova], ignore_index=True)
+    df = pd.DataFrame(colunas, copy=False)
+    if "ID_VENDA" in base.columns:
+        df.attrs["duplicatas"] = duplicatas
+    return df
+
+
+def duplicatas_descartadas(tabela):
+    """Linhas com ID_VENDA repetido descartadas na limpeza da versão atual da tabela.
+
+    Com o armazém Parquet como fonte, as duplicatas já foram removidas na gravação e a
+    contagem é 0, como nos lotes lidos dele.
+    """
+    if versao_tabela(tabela)[0] == "parquet":
+        return 0
+    return carregar_tabela(tabela).attrs.get("duplicatas", 0)
+
+
+def _tamanho(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _remover(chave):
+    global _bytes_em_cache
+    df = _cache.pop(chave)
+    _bytes_em_cache -= _tamanho(df)
+
+
+def carregar_csv(tabela):
+    with instrumentacao.etapa(f"leitura CSV {tabela}") as registro:
+        df = _ler_csv(tabela)
+        registro["linhas_saida"] = len(df)
+    with instrumentacao.etapa(f"limpeza {tabela}", linhas_entrada=len(df)) as registro:
+        df = _preparar(tabela, df)
+        registro["linhas_saida"] = len(df)
+    return df
+
+
+def _tabela_completa(tabela, fonte, carregar=None):
+    def ler():
+        if fonte[0] == "parquet":
+            return _compactar(armazenamento.ler_tabela(tabela))
+        return carregar_csv(tabela)
+
+    carregar = carregar or ler
+
+    if not compartilhado.ativo():
+        return carregar()
+
+    def conferido():
+        # ``fonte`` foi lida antes do arquivo: se ele mudou durante a leitura, o conteúdo é
+        # de outra versão e não pode ser publicado para os outros processos sob ``fonte``
+        df = carregar()
+        if versao_disco(tabela) != fonte:
+            raise _VersaoMudou(df)
+        return df
+
+    with instrumentacao.etapa(f"segmento compartilhado {tabela}") as registro:
+        try:
+            df = compartilhado.obter(DIRETORIO_DADOS, tabela, fonte, conferido)
+        except _VersaoMudou as mudou:
+            # Só este processo usa a leitura; a próxima atualização publica a versão nova
+            df = mudou.df
+        registro["linhas_saida"] = len(df)
+    return df
+
+
+class _VersaoMudou(Exception):
+    def __init__(self, df):
+        super().__init__("arquivo mudou durante a leitura")
+        self.df = df
+
+
+def _guardar(chave, df):
+    global _bytes_em_cache
+    # Entradas de versões antigas da mesma tabela não serão mais usadas (a versão publicada
+    # continua servindo as páginas enquanto a atualização prepara a próxima)
+    vigentes = (chave[1], _publicadas.get(chave[0]))
+    for antiga in [c for c in _cache if c[0] == chave[0] and c[1] not in vigentes]:
+        _remover(antiga)
+
+    _cache[chave] = df
+    _bytes_em_cache += _tamanho(df)
+
+    # Evicção LRU até caber no limite (a entrada recém-carregada é sempre mantida)
+    while _bytes_em_cache > LIMITE_CACHE_BYTES and len(_cache) > 1:
+        _remover(next(iter(_cache)))
+
+
+def tabela_em_cache(tabela, fonte):
+    # Tabela completa da versão ``fonte``, se já estiver no cache (None caso contrário)
+    with _trava:
+        return _cache.get((tabela, fonte, (None, None, None, None)))
+
+
+def instalar_tabela(tabela, fonte, carregar=None):
+    """Prepara a tabela completa da versão ``fonte`` no cache (e no segmento compartilhado).
+
+    ``carregar()`` pode montá-la sem reler a fonte inteira (veja ``anexar``). A leitura é
+    feita fora da trava do cache: as páginas continuam sendo servidas enquanto isso.
+    """
+    df = _tabela_completa(tabela, fonte, carregar)
+    with _trava:
+        _guardar((tabela, fonte, (None, None, None, None)), df)
+    return df
+
+
+def _filtrar(df, colunas, inicio, fim, filiais):
+    mascara = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mascara &= df["DATA_VENDA"] >= pd.Timestamp(inicio)
+    if fim is not None:
+        mascara &= df["DATA_VENDA"] <= pd.Timestamp(fim)
+    if filiais is not None:
+        mascara &= df["ID_FILIAL"].isin(list(filiais))
+    if not mascara.all():
+        df = df[mascara]
+    return df if colunas is None else _projetar(df, colunas)
+
+
+def _projetar(df, colunas):
+    # Seleção de colunas sem copiar (df[colunas] copiaria, inclusive as mapeadas em memória)
+    return pd.DataFrame({coluna: df[coluna] for coluna in colunas}, copy=False)
+
+
+def carregar_tabela(tabela, colunas=None, inicio=None, fim=None, filiais=None):
+    """Carrega uma tabela limpa, opcionalmente só com algumas colunas e linhas.
+
+    Os filtros ``inicio``/``fim`` (datas, inclusivas) e ``filiais`` valem para VENDAS.
+    """
+    fonte = versao_tabela(tabela)
+    colunas = tuple(colunas) if colunas is not None else None
+    filiais = tuple(sorted(filiais)) if filiais is not None else None
+    filtros = (colunas, inicio, fim, filiais)
+    chave = (tabela, fonte, filtros)
+
+    with _trava:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+        if fonte[0] == "parquet" and not (filtros[1:] == (None, None, None) and compartilhado.ativo()):
+            # Projeção e filtros são empurrados para a leitura do Parquet
+            with instrumentacao.etapa(f"leitura Parquet {tabela}") as registro:
+                df = _compactar(armazenamento.ler_tabela(tabela, colunas, inicio, fim, filiais))
+                registro["linhas_saida"] = len(df)
+        else:
+            # A tabela completa é lida uma vez (ou mapeada do segmento compartilhado) e as
+            # seleções saem dela
+            chave_completa = (tabela, fonte, (None, None, None, None))
+            if chave_completa not in _cache:
+                _guardar(chave_completa, _tabela_completa(tabela, fonte))
+            _cache.move_to_end(chave_completa)
+            df = _cache[chave_completa]
+            if filtros == (None, None, None, None):
+                return df
+            with instrumentacao.etapa(f"filtro {tabela}", linhas_entrada=len(df)) as registro:
+                df = _filtrar(df, colunas, inicio, fim, filiais)
+                registro["linhas_saida"] = len(df)
+
+        _guardar(chave, df)
+        return df
+
+
+def filtrar_em_lotes(tabela, colunas, inicio=None, fim=None, filiais=None):
+    """Linhas de ``tabela`` dentro dos filtros, lidas do CSV em lotes e sem passar pelo cache.
+
+    Para fontes grandes demais para a memória: só as linhas que passam nos filtros ficam
+    (mais um lote por vez). Duplicatas de ID_VENDA são removidas como na leitura completa.
+    """
+    lidas = list(dict.fromkeys([*colunas, "ID_VENDA"]))
+    for lote in sem_duplicatas(ler_em_lotes(tabela, colunas=lidas, origem="csv")):
+        yield _filtrar(lote, list(colunas), inicio, fim, filiais)
+
+
+def carregar_vendas(colunas=None, inicio=None, fim=None, filiais=None):
+    return carregar_tabela("VENDAS", colunas, inicio, fim, filiais)
+
+
+def carregar_filiais(colunas=None):
+    return carregar_tabela("FILIAIS", colunas)
+
+
+def carregar_clientes(colunas=None):
+    return carregar_tabela("CLIENTES", colunas)
+
+
+def carregar_produtos(colunas=None):
+    return carregar_tabela("PRODUTOS", colunas)
+
+
+def limpar_cache():
+    global _bytes_em_cache
+    with _trava:
+        _cache.clear()
+        _bytes_em_cache = 0
+
+
+def estatisticas_cache():
+    with _trava:
+        return {
+            "tabelas": [chave[0] for chave in _cache],
+            "bytes": _bytes_em_cache,
+            "limite_bytes": LIMITE_CACHE_BYTES,
+        }
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from core import dados, esquema
+
+# Distribuição geográfica dos clientes (cidade e UF) para a página de análise de dados.
+# Uma única passada agrupada por (CIDADE, UF) conta, para cada par, os clientes, os que têm
+# vendas e a receita (dos agregados por cliente, buscados pelo ID em um array); as visões
+# por cidade e por UF saem desse resultado pequeno, sem reagrupar os clientes.
+# Os gráficos recebem só as TOPO_DISTRIBUICAO maiores cidades e UFs e um balde "Outros"
+# com o restante: com listas de clientes de todo o país, milhares de barras não se leem e
+# pesam para montar e desenhar.
+# Quando CLIENTES é grande demais para a memória (dados.usar_fluxo), a tabela é lida em
+# lotes e as cidades passam por um resumo space-saving com CONTADORES_DISTRIBUICAO
+# contadores: a memória fica limitada e as cidades frequentes aparecem com contagem
+# aproximada. Os totais e as UFs continuam exatos; as cidades e o balde "Outros (aprox.)"
+# trazem o intervalo em que está o nº real de clientes (N_MINIMO a N_MAXIMO). Clientes com
+# vendas e receita de uma cidade só somam enquanto ela está no resumo (valores mínimos), e
+# os do balde "Outros", que recebe a diferença para o total, são máximos.
+# DRIVATECH_DISTRIBUICAO_APROXIMADA: "auto" (padrão, só em fluxo), "1" (sempre) ou "0" (nunca).
+
+TOPO_DISTRIBUICAO = int(os.environ.get("DRIVATECH_TOPO_DISTRIBUICAO", "20"))
+CONTADORES_DISTRIBUICAO = int(os.environ.get("DRIVATECH_CONTADORES_DISTRIBUICAO", "1000"))
+MODO_APROXIMADO = os.environ.get("DRIVATECH_DISTRIBUICAO_APROXIMADA", "auto")
+
+OUTROS = "Outros"
+OUTROS_APROXIMADO = "Outros (aprox.)"
+COLUNAS_CLIENTES = ["ID_CLIENTE", "NOME_CLIENTE", "CIDADE", "UF"]
+METRICAS = ["N_CLIENTES", "COM_VENDAS", "RECEITA_CENTAVOS"]
+
+
+def aproximar():
+    if MODO_APROXIMADO == "auto":
+        return dados.usar_fluxo("CLIENTES")
+    return MODO_APROXIMADO != "0"
+
+
+def _por_cliente(por_venda):
+    # (array posicao[id] = linha, receita em centavos, nº de vendas) dos agregados por cliente
+    if por_venda is None or not len(por_venda):
+        # Nenhum ID encontrado; os arrays de uma posição só evitam indexar arrays vazios
+        return np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    return (esquema.posicoes(por_venda["ID_CLIENTE"].to_numpy()), por_venda["SOMA_CENTAVOS"].to_numpy(),
+            por_venda["N_VENDAS"].to_numpy())
+
+
+def agrupar(clientes, por_cliente):
+    """Clientes, clientes com vendas e receita por (CIDADE, UF), em uma passada."""
+    posicao, receita, vendas = por_cliente
+    ids = clientes["ID_CLIENTE"].to_numpy().astype(np.int64)
+    dentro = (ids >= 0) & (ids < len(posicao))
+    linhas = np.full(len(ids), -1, dtype=np.int64)
+    linhas[dentro] = posicao[ids[dentro]]
+    achado = linhas >= 0
+    linhas = np.maximum(linhas, 0)
+    # dropna=False: clientes sem UF ainda contam para a cidade (e vice-versa)
+    return pd.DataFrame({
+        "CIDADE": clientes["CIDADE"].to_numpy(),
+        "UF": clientes["UF"].to_numpy(),
+        "N_CLIENTES": np.ones(len(ids), dtype=np.int64),
+        "COM_VENDAS": (achado & (vendas[linhas] > 0)).astype(np.int64),
+        "RECEITA_CENTAVOS": np.where(achado, receita[linhas], 0).astype(np.int64),
+    }).groupby(["CIDADE", "UF"], observed=True, dropna=False)[METRICAS].sum()
+
+
+def _somar(df, nivel):
+    # Visão por um nível do par, com rótulos em texto (categorias diferem entre lotes)
+    resumo = df.groupby(level=nivel, observed=True).sum()
+    resumo.index = pd.Index(resumo.index.astype(str), name=nivel)
+    return resumo
+
+
+def _space_saving(resumo, parcial, descartado, contadores):
+    """Soma ``parcial`` ao resumo de no máximo ``contadores`` chaves.
+
+    ``descartado`` é a maior contagem já removida do resumo: é um limite para a contagem real
+    de qualquer chave fora dele, então uma chave que (re)entra começa nesse valor, registrado
+    em ERRO. Assim N_CLIENTES nunca fica abaixo do real e N_CLIENTES - ERRO nunca acima.
+    """
+    parcial = parcial.assign(ERRO=np.int64(0))
+    novas = ~parcial.index.isin(resumo.index)
+    parcial.loc[novas, "N_CLIENTES"] += descartado
+    parcial.loc[novas, "ERRO"] = descartado
+    combinado = resumo.add(parcial, fill_value=0).astype(np.int64)
+    if len(combinado) > contadores:
+        combinado = combinado.sort_values("N_CLIENTES", ascending=False, kind="stable")
+        descartado = max(descartado, int(combinado["N_CLIENTES"].iloc[contadores:].max()))
+        combinado = combinado.iloc[:contadores]
+    return combinado, descartado
+
+
+def topo(resumo, total, n=None, aproximado=False):
+    """As ``n`` maiores linhas por N_CLIENTES e o balde "Outros" com a diferença para ``total``.
+
+    Com ``aproximado`` (resumo space-saving com ERRO), N_MINIMO e N_MAXIMO delimitam o nº
+    real de clientes de cada linha. No balde "Outros (aprox.)", N_CLIENTES é o mínimo: o
+    total menos as contagens das maiores, que podem estar acima das reais.
+    """
+    n = TOPO_DISTRIBUICAO if n is None else n
+    resumo = resumo.sort_values("N_CLIENTES", ascending=False, kind="stable")
+    if aproximado:
+        resumo = resumo.assign(N_MINIMO=resumo["N_CLIENTES"] - resumo["ERRO"], N_MAXIMO=resumo["N_CLIENTES"])
+    resumo = resumo.drop(columns="ERRO", errors="ignore")
+    if len(resumo) <= n:
+        return resumo
+    maiores = resumo.iloc[:n]
+    outros = {coluna: max(int(total[coluna]) - int(maiores[coluna].sum()), 0) for coluna in METRICAS}
+    rotulo = OUTROS
+    if aproximado:
+        rotulo = OUTROS_APROXIMADO
+        outros.update(N_MINIMO=outros["N_CLIENTES"],
+                      N_MAXIMO=max(int(total["N_CLIENTES"]) - int(maiores["N_MINIMO"].sum()), 0))
+    return pd.concat([maiores, pd.DataFrame(outros, index=pd.Index([rotulo], name=resumo.index.name))])
+
+
+def distribuir(lotes, por_venda=None, n=None, contadores=None):
+    """Distribuição dos clientes de ``lotes`` (DataFrames de CLIENTES) por cidade e por UF.
+
+    ``por_venda`` são os agregados por cliente (ID_CLIENTE, SOMA_CENTAVOS, N_VENDAS). Com
+    ``contadores``, as cidades passam pelo resumo space-saving; sem, a contagem é exata.
+    Devolve as tabelas ``cidade`` e ``uf`` (topo e "Outros", veja ``topo``), os totais e uma
+    amostra.
+    """
+    por_cliente = _por_cliente(por_venda)
+    cidades = pd.DataFrame(columns=METRICAS + (["ERRO"] if contadores else []), dtype=np.int64)
+    ufs = pd.DataFrame(columns=METRICAS, dtype=np.int64)
+    totais = {"CIDADE": pd.Series(0, index=METRICAS), "UF": pd.Series(0, index=METRICAS)}
+    descartado, amostra, n_clientes = 0, None, 0
+    for lote in lotes:
+        if not len(lote):
+            continue
+        if amostra is None:
+            amostra = lote.head()
+        n_clientes += len(lote)
+        pares = agrupar(lote, por_cliente)
+        por_cidade, por_uf = _somar(pares, "CIDADE"), _somar(pares, "UF")
+        totais["CIDADE"] += por_cidade.sum()
+        totais["UF"] += por_uf.sum()
+        ufs = ufs.add(por_uf, fill_value=0).astype(np.int64)
+        if contadores:
+            cidades, descartado = _space_saving(cidades, por_cidade, descartado, contadores)
+        else:
+            cidades = cidades.add(por_cidade, fill_value=0).astype(np.int64)
+    cidades.index.name, ufs.index.name = "CIDADE", "UF"
+    return {
+        # Sem nenhuma cidade descartada do resumo, as contagens ainda são exatas
+        "cidade": topo(cidades, totais["CIDADE"], n, aproximado=bool(descartado)),
+        "uf": topo(ufs, totais["UF"], n),
+        "amostra": amostra,
+        "n_clientes": n_clientes,
+        # Com o resumo cheio, o nº de cidades distintas não é mais conhecido
+        "n_cidades": len(cidades) if not descartado else None,
+        "aproximado": bool(descartado),
+    }
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core import dados
+
+# Esquema estrela em memória: VENDAS (e os cubos de core/agregados.py) é o fato, FILIAIS e
+# CLIENTES são as dimensões.
+# Os atributos das dimensões (NOME_*, CIDADE, UF) ficam como categóricos, ou seja, códigos
+# inteiros pequenos mais um dicionário de valores (veja dados._compactar). Para as junções
+# fato -> dimensão, cada atributo vira um array indexado pelo próprio ID (ID_FILIAL ou
+# ID_CLIENTE): buscar o atributo de N linhas é um ``codigos[ids]``, sem o hash merge que
+# copiava todas as colunas do fato.
+
+CHAVES = {"FILIAIS": "ID_FILIAL", "CLIENTES": "ID_CLIENTE"}
+
+_mapas = {}
+_chaves = {}
+_trava = threading.Lock()
+
+
+def posicoes(ids, tamanho=None):
+    """Array ``posicao[id] = linha`` (-1 para IDs ausentes) para IDs inteiros não negativos."""
+    ids = np.asarray(ids, dtype=np.int64)
+    tamanho = max(tamanho or 0, int(ids.max()) + 1 if len(ids) else 0)
+    posicao = np.full(tamanho, -1, dtype=np.int32 if len(ids) < 2**31 else np.int64)
+    posicao[ids] = np.arange(len(ids))
+    return posicao
+
+
+def _no_intervalo(posicao, ids):
+    # Linha de cada ID (-1 para IDs fora do array ou ausentes da dimensão)
+    ids = np.asarray(ids, dtype=np.int64)
+    dentro = (ids >= 0) & (ids < len(posicao))
+    linhas = np.full(len(ids), -1, dtype=posicao.dtype)
+    linhas[dentro] = posicao[ids[dentro]]
+    return linhas
+
+
+def mapa(tabela, coluna):
+    """(códigos por ID, categorias) de um atributo de dimensão, por versão dos dados."""
+    versao = dados.versao_tabela(tabela)
+    chave = (tabela, coluna)
+    with _trava:
+        if chave in _mapas and _mapas[chave][0] == versao:
+            return _mapas[chave][1]
+
+    dimensao = dados.carregar_tabela(tabela, colunas=[CHAVES[tabela], coluna])
+    valores = dimensao[coluna]
+    if not isinstance(valores.dtype, pd.CategoricalDtype):
+        valores = valores.astype("category")
+    linhas = posicoes(dimensao[CHAVES[tabela]].to_numpy())
+    codigos = valores.cat.codes.to_numpy()
+    # Mesmo array de posições, mas guardando o código do atributo (-1 para IDs ausentes)
+    por_id = np.where(linhas >= 0, codigos[np.maximum(linhas, 0)], -1).astype(codigos.dtype)
+    with _trava:
+        _mapas[chave] = (versao, (por_id, valores.cat.categories))
+    return por_id, valores.cat.categories
+
+
+def chaves(tabela):
+    """Array ``posicao[id] = linha`` da dimensão (-1 para IDs sem cadastro), por versão dos dados."""
+    versao = dados.versao_tabela(tabela)
+    with _trava:
+        if tabela in _chaves and _chaves[tabela][0] == versao:
+            return _chaves[tabela][1]
+
+    posicao = posicoes(dados.carregar_tabela(tabela, colunas=[CHAVES[tabela]])[CHAVES[tabela]].to_numpy())
+    with _trava:
+        _chaves[tabela] = (versao, posicao)
+    return posicao
+
+
+def buscar(tabela, coluna, ids):
+    """Atributo ``coluna`` da dimensão para cada ID (categórico; NaN para IDs sem cadastro)."""
+    por_id, categorias = mapa(tabela, coluna)
+    return pd.Categorical.from_codes(_no_intervalo(por_id, ids).astype(por_id.dtype), categories=categorias)
+
+
+def com_atributos(fato, tabela, colunas):
+    """Fato com os atributos da dimensão, como um merge interno por ``CHAVES[tabela]``.
+
+    As linhas do fato não são copiadas além das novas colunas; linhas cujo ID não existe na
+    dimensão são descartadas, como no merge.
+    """
+    ids = fato[CHAVES[tabela]].to_numpy()
+    novas = {coluna: buscar(tabela, coluna, ids) for coluna in colunas}
+    # A presença vem da chave, e não do atributo: um cadastro com o atributo vazio (NaN)
+    # continua na junção, como no merge
+    presentes = _no_intervalo(chaves(tabela), ids) >= 0
+    resultado = fato.assign(**novas)
+    return resultado if presentes.all() else resultado[presentes]
+
+
+def alinhar(ids_destino, ids_origem, valores, preencher=0):
+    """Valores (de uma tabela com chave ``ids_origem``) na ordem de ``ids_destino``.
+
+    Equivale a um merge à esquerda de uma única coluna seguido de ``fillna(preencher)``
+    (para datas, ``preencher=np.datetime64("NaT")``).
+    """
+    valores = np.asarray(valores)
+    linhas = _no_intervalo(posicoes(ids_origem), ids_destino)
+    if not len(valores):
+        return np.full(len(linhas), preencher, dtype=valores.dtype)
+    # A indexação por array já devolve uma cópia
+    resultado = valores[np.maximum(linhas, 0)]
+    resultado[linhas < 0] = preencher
+    return resultado
@@ -0,0 +1,60 @@
+import streamlit as st
+
+from core import dados, indice
+from core.indice import filtros_ativos, filtros_vazios  # noqa: F401  (sem Streamlit, para os cálculos)
+
+# Filtros globais de período, filial e UF, exibidos na barra lateral e válidos para todas
+# as páginas. A seleção fica em st.session_state["filtros"] no formato usado por core.indice:
+# {"inicio", "fim", "filiais", "ufs"}, onde None significa "sem filtro".
+
+
+def resolver_filtros(inicio=None, fim=None, nomes_filiais=None, ufs=None):
+    # Converte nomes de filial e UFs nos IDs de filial usados pelo índice
+    filiais = dados.carregar_filiais(colunas=["ID_FILIAL", "NOME_FILIAL", "UF"])
+    selecionadas = filiais
+    if nomes_filiais:
+        selecionadas = selecionadas[selecionadas["NOME_FILIAL"].isin(nomes_filiais)]
+    if ufs:
+        selecionadas = selecionadas[selecionadas["UF"].isin(ufs)]
+
+    ids = None
+    if len(selecionadas) < len(filiais):
+        ids = tuple(sorted(int(i) for i in selecionadas["ID_FILIAL"]))
+
+    primeiro, ultimo = indice.periodo()
+    return {
+        "inicio": inicio if inicio is not None and primeiro is not None and inicio > primeiro.date() else None,
+        "fim": fim if fim is not None and ultimo is not None and fim < ultimo.date() else None,
+        "filiais": ids,
+        "ufs": tuple(ufs) if ufs else None,
+    }
+
+
+def barra_lateral():
+    st.sidebar.subheader("Filtros")
+    primeiro, ultimo = indice.periodo()
+    inicio = fim = None
+    if primeiro is not None:
+        datas = st.sidebar.date_input(
+            "Período",
+            value=(primeiro.date(), ultimo.date()),
+            min_value=primeiro.date(),
+            max_value=ultimo.date(),
+            format="DD/MM/YYYY",
+        )
+        # Enquanto o usuário escolhe o intervalo, o widget devolve só a data inicial
+        if len(datas) > 0:
+            inicio = datas[0]
+        if len(datas) > 1:
+            fim = datas[1]
+
+    filiais = dados.carregar_filiais(colunas=["NOME_FILIAL", "UF"])
+    nomes = st.sidebar.multiselect("Filiais", sorted(filiais["NOME_FILIAL"].unique()), placeholder="Todas")
+    ufs = st.sidebar.multiselect("UF", sorted(filiais["UF"].unique()), placeholder="Todas")
+
+    st.session_state["filtros"] = resolver_filtros(inicio, fim, nomes, ufs)
+    return st.session_state["filtros"]
+
+
+def filtros_atuais():
+    return st.session_state.get("filtros", filtros_vazios())
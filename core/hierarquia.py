@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core import agregados, dados, indice, instrumentacao
+
+# Previsão hierárquica de vendas: total -> UF -> filial, em granularidade diária ou semanal.
+# Cada série (total, cada UF e cada filial) tem seu próprio modelo Ridge com tendência e
+# sazonalidade. Como todas as séries compartilham a mesma matriz de variáveis, os modelos
+# são ajustados em lote (Ridge multi-saída, que equivale a um ajuste por série); com muitas
+# séries, os lotes são divididos entre processos.
+# As previsões de cada nível são reconciliadas (OLS) para que filiais somem as UFs e as UFs
+# somem o total. Com as mesmas variáveis em todos os níveis as previsões base já quase
+# somam; a reconciliação garante a coerência após zerar valores negativos.
+
+FREQUENCIAS = {"D": "Diária", "W": "Semanal"}
+PROCESSOS = int(os.environ.get("DRIVATECH_PROCESSOS", str(os.cpu_count() or 1)))
+# Abaixo deste número de séries, criar processos custa mais que ajustar tudo de uma vez
+LIMITE_PARALELO = 256
+LIMITE_RESULTADOS = 16
+
+_resultados = OrderedDict()
+_trava = threading.Lock()
+_pool = None
+
+
+def series_por_filial(diario, frequencia="W"):
+    """Matriz períodos x filiais com as vendas em reais (períodos sem venda valem 0)."""
+    periodos = diario["DATA_VENDA"].dt.to_period(frequencia)
+    tabela = (diario.assign(PERIODO=periodos)
+              .pivot_table(index="PERIODO", columns="ID_FILIAL", values="SOMA_CENTAVOS", aggfunc="sum", fill_value=0))
+    if tabela.empty:
+        return tabela
+    tabela = tabela.reindex(pd.period_range(tabela.index.min(), tabela.index.max(), freq=frequencia), fill_value=0)
+    # O último período ainda incompleto puxaria a previsão para baixo
+    if len(tabela) > 2 and diario["DATA_VENDA"].max() < tabela.index[-1].end_time.normalize():
+        tabela = tabela.iloc[:-1]
+    return tabela / 100
+
+
+def matriz_soma(filiais, uf_por_filial):
+    """Matriz de agregação S (séries x filiais) e os rótulos (NIVEL, SERIE) das linhas."""
+    ufs = sorted({uf_por_filial[f] for f in filiais})
+    linhas = [np.ones(len(filiais))]
+    rotulos = [("Total", "Total")]
+    for uf in ufs:
+        linhas.append(np.array([uf_por_filial[f] == uf for f in filiais], dtype=np.float64))
+        rotulos.append(("UF", uf))
+    linhas.extend(np.eye(len(filiais)))
+    rotulos.extend(("Filial", str(f)) for f in filiais)
+    return np.vstack(linhas), rotulos
+
+
+def reconciliar(base, S):
+    """Reconciliação OLS: projeta as previsões base (períodos x séries) no espaço coerente.
+
+    Previsões negativas das filiais são zeradas antes de reagregar, mantendo a coerência.
+    """
+    inferior, *_ = np.linalg.lstsq(S, base.T, rcond=None)
+    return (S @ np.maximum(inferior, 0)).T
+
+
+def _caracteristicas(periodos, frequencia, origem):
+    # Tendência + dummies de sazonalidade (dia da semana no diário, mês no semanal)
+    tendencia = (periodos - origem).map(lambda d: d.n).to_numpy(dtype=np.float64)
+    if frequencia == "D":
+        sazonal, categorias = periodos.dayofweek, range(1, 7)
+    else:
+        sazonal, categorias = periodos.month, range(2, 13)
+    dummies = [(sazonal == c).astype(np.float64) for c in categorias]
+    return np.column_stack([tendencia, *dummies])
+
+
+def _ajustar_lote(X, Y, X_futuro, alpha):
+    # Uma saída por série: o mesmo resultado de ajustar cada série separadamente
+    from sklearn.linear_model import Ridge
+
+    return Ridge(alpha=alpha).fit(X, Y).predict(X_futuro)
+
+
+def _ajustar(X, Y, X_futuro, alpha):
+    global _pool
+    if Y.shape[1] < LIMITE_PARALELO or PROCESSOS <= 1:
+        return _ajustar_lote(X, Y, X_futuro, alpha)
+    with _trava:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS)
+    lotes = np.array_split(np.arange(Y.shape[1]), PROCESSOS)
+    partes = _pool.map(_ajustar_lote, *zip(*[(X, Y[:, lote], X_futuro, alpha) for lote in lotes]))
+    return np.hstack(list(partes))
+
+
+def prever_hierarquia(diario, uf_por_filial, frequencia="W", horizonte=12, alpha=1.0):
+    """Previsões reconciliadas para o total, cada UF e cada filial.
+
+    ``diario`` segue o formato de ``agregados["diario"]`` e ``uf_por_filial`` mapeia
+    ID_FILIAL -> UF. Retorna um dict com ``previsoes`` (tabela longa com histórico e
+    previsão: NIVEL, SERIE, PERIODO, TIPO, VALOR, VALOR_BASE), ``metricas`` (RMSE por série
+    no período de teste, antes e depois da reconciliação) e ``tempo_s``.
+    """
+    inicio = time.perf_counter()
+    tabela = series_por_filial(diario, frequencia)
+    # Pelo menos dois períodos de treino e um de teste (as métricas exigem o teste)
+    if len(tabela) < 3:
+        return None
+    filiais = list(tabela.columns)
+    S, rotulos = matriz_soma(filiais, uf_por_filial)
+    historico = tabela.to_numpy() @ S.T
+
+    periodos = tabela.index
+    futuros = pd.period_range(periodos[-1] + 1, periods=horizonte, freq=frequencia)
+    X = _caracteristicas(periodos, frequencia, periodos[0])
+    X_futuro = _caracteristicas(futuros, frequencia, periodos[0])
+
+    # Últimos ~20% dos períodos como teste (fora do treino) para as métricas de cada série
+    n_teste = min(max(1, round(0.2 * len(periodos))), len(periodos) - 2)
+    teste_base = _ajustar(X[:-n_teste], historico[:-n_teste], X[-n_teste:], alpha)
+    teste_reconciliado = reconciliar(teste_base, S)
+    reais = historico[-n_teste:]
+    metricas = pd.DataFrame(rotulos, columns=["NIVEL", "SERIE"]).assign(
+        RMSE_BASE=np.sqrt(((teste_base - reais) ** 2).mean(axis=0)),
+        RMSE_RECONCILIADO=np.sqrt(((teste_reconciliado - reais) ** 2).mean(axis=0)),
+    )
+
+    base = _ajustar(X, historico, X_futuro, alpha)
+    reconciliada = reconciliar(base, S)
+
+    def longa(valores, valores_base, indice_periodos, tipo):
+        n, m = valores.shape
+        return pd.DataFrame({
+            "NIVEL": np.tile([r[0] for r in rotulos], n),
+            "SERIE": np.tile([r[1] for r in rotulos], n),
+            "PERIODO": np.repeat(indice_periodos.start_time, m),
+            "TIPO": tipo,
+            "VALOR": valores.ravel(),
+            "VALOR_BASE": valores_base.ravel(),
+        })
+
+    previsoes = pd.concat(
+        [longa(historico, historico, periodos, "Histórico"), longa(reconciliada, base, futuros, "Previsão")],
+        ignore_index=True,
+    )
+    return {"previsoes": previsoes, "metricas": metricas, "tempo_s": time.perf_counter() - inicio}
+
+
+@instrumentacao.medido("previsão hierárquica")
+def obter_previsao_hierarquica(filtros, frequencia="W", horizonte=12):
+    """Previsão hierárquica para os filtros atuais, em cache pela versão de VENDAS."""
+    chave = (dados.versao_tabela("VENDAS"), tuple(filtros.items()), frequencia, horizonte)
+    with _trava:
+        if chave in _resultados:
+            _resultados.move_to_end(chave)
+            return _resultados[chave]
+
+    if indice.filtros_ativos(filtros):
+        diario = indice.serie_diaria(filtros)
+    else:
+        diario = agregados.obter_agregados()["diario"]
+    filiais = dados.carregar_filiais(colunas=["ID_FILIAL", "UF"])
+    resultado = prever_hierarquia(diario, dict(zip(filiais["ID_FILIAL"], filiais["UF"])), frequencia, horizonte)
+
+    with _trava:
+        _resultados[chave] = resultado
+        while len(_resultados) > LIMITE_RESULTADOS:
+            _resultados.popitem(last=False)
+    return resultado
@@ -0,0 +1,203 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import agregados, dados, instrumentacao
+
+# Índice temporal de VENDAS para os filtros de período, filial e UF.
+# As vendas ficam ordenadas por (ID_FILIAL, DATA_VENDA); para cada filial guardamos os dias
+# com venda e as somas acumuladas de valor (centavos) e de quantidade. Assim:
+#   - o total de um período é uma busca binária nas datas + diferença de somas acumuladas;
+#   - a série diária de um período é só uma fatia dos arrays, sem groupby.
+# A quantidade acumulada também serve de deslocamento para as linhas (ID_CLIENTE e valor)
+# guardadas na mesma ordem, usadas pelos totais por cliente dentro de um período.
+# Quando VENDAS é processada em fluxo (grande demais para a memória), o índice é montado só a
+# partir do cubo diário dos agregados, sem as linhas.
+
+_memoria = OrderedDict()  # versão de VENDAS -> índice (como em core/agregados.py)
+_trava = threading.Lock()
+_trava_calculo = threading.Lock()
+
+
+def construir_indice(vendas=None, diario=None):
+    """Monta o índice a partir das vendas (nível de linha) ou do cubo diário por filial."""
+    if vendas is not None:
+        ordem = np.lexsort((vendas["DATA_VENDA"].to_numpy(), vendas["ID_FILIAL"].to_numpy()))
+        filiais_linha = vendas["ID_FILIAL"].to_numpy()[ordem]
+        dias_linha = vendas["DATA_VENDA"].to_numpy()[ordem].astype("datetime64[D]")
+        valores = vendas["VALOR_VENDA_CENTAVOS"].to_numpy()[ordem]
+        clientes = vendas["ID_CLIENTE"].to_numpy()[ordem]
+
+        # Um registro por (filial, dia): início de cada sequência de linhas iguais
+        if len(ordem):
+            novo = np.r_[True, (filiais_linha[1:] != filiais_linha[:-1]) | (dias_linha[1:] != dias_linha[:-1])]
+        else:
+            novo = np.zeros(0, dtype=bool)
+        inicios = np.flatnonzero(novo)
+        filiais_dia = filiais_linha[inicios]
+        dias = dias_linha[inicios]
+        soma = np.add.reduceat(valores, inicios) if len(inicios) else np.zeros(0, dtype=np.int64)
+        contagem = np.diff(np.r_[inicios, len(ordem)])
+    else:
+        diario = diario.sort_values(["ID_FILIAL", "DATA_VENDA"])
+        filiais_dia = diario["ID_FILIAL"].to_numpy()
+        dias = diario["DATA_VENDA"].to_numpy().astype("datetime64[D]")
+        soma = diario["SOMA_CENTAVOS"].to_numpy()
+        contagem = diario["N_VENDAS"].to_numpy()
+        clientes = valores = None
+
+    filiais, limites = np.unique(filiais_dia, return_index=True)
+    return {
+        "filiais": filiais,
+        "limites": np.r_[limites, len(filiais_dia)],
+        "dias": dias,
+        "soma": np.r_[0, np.cumsum(soma, dtype=np.int64)],
+        "vendas": np.r_[0, np.cumsum(contagem, dtype=np.int64)],
+        "clientes": clientes,
+        "valores": valores,
+    }
+
+
+def obter_indice():
+    fonte = dados.versao_tabela("VENDAS")
+    with _trava:
+        if fonte in _memoria:
+            return _memoria[fonte]
+
+    with _trava_calculo:
+        with _trava:
+            if fonte in _memoria:
+                return _memoria[fonte]
+        if dados.usar_fluxo("VENDAS"):
+            indice = construir_indice(diario=agregados.obter_agregados()["diario"])
+        else:
+            colunas = ["DATA_VENDA", "ID_FILIAL", "ID_CLIENTE", "VALOR_VENDA_CENTAVOS"]
+            indice = construir_indice(vendas=dados.carregar_vendas(colunas=colunas))
+        with _trava:
+            _memoria[fonte] = indice
+            while len(_memoria) > agregados.VERSOES_EM_MEMORIA:
+                _memoria.popitem(last=False)
+        return indice
+
+
+def periodo(indice=None):
+    # Primeiro e último dia com vendas, para os limites dos filtros
+    indice = indice or obter_indice()
+    if not len(indice["dias"]):
+        return None, None
+    return pd.Timestamp(indice["dias"].min()), pd.Timestamp(indice["dias"].max())
+
+
+def _fatias(indice, filtros):
+    # (filial, início, fim) das faixas de dias que atendem aos filtros: O(F log n)
+    inicio = filtros.get("inicio")
+    fim = filtros.get("fim")
+    filiais = filtros.get("filiais")
+    for posicao, filial in enumerate(indice["filiais"]):
+        if filiais is not None and filial not in filiais:
+            continue
+        a, b = indice["limites"][posicao], indice["limites"][posicao + 1]
+        dias = indice["dias"][a:b]
+        if inicio is not None:
+            a += np.searchsorted(dias, np.datetime64(pd.Timestamp(inicio).date(), "D"), side="left")
+        if fim is not None:
+            b = indice["limites"][posicao] + np.searchsorted(dias, np.datetime64(pd.Timestamp(fim).date(), "D"), side="right")
+        if b > a:
+            yield filial, a, b
+
+
+def totais_por_filial(filtros, indice=None):
+    indice = indice or obter_indice()
+    linhas = [
+        (filial, indice["soma"][b] - indice["soma"][a], indice["vendas"][b] - indice["vendas"][a])
+        for filial, a, b in _fatias(indice, filtros)
+    ]
+    return pd.DataFrame(linhas, columns=["ID_FILIAL", "SOMA_CENTAVOS", "N_VENDAS"]).astype(
+        {"ID_FILIAL": "int32", "SOMA_CENTAVOS": "int64", "N_VENDAS": "int64"}
+    )
+
+
+def serie_diaria(filtros, indice=None):
+    # Mesmo formato do cubo agregados["diario"], restrito aos filtros
+    indice = indice or obter_indice()
+    partes = [
+        pd.DataFrame({
+            "DATA_VENDA": indice["dias"][a:b].astype("datetime64[ns]"),
+            "ID_FILIAL": np.full(b - a, filial, dtype="int32"),
+            "SOMA_CENTAVOS": np.diff(indice["soma"][a:b + 1]),
+            "N_VENDAS": np.diff(indice["vendas"][a:b + 1]),
+        })
+        for filial, a, b in _fatias(indice, filtros)
+    ]
+    if not partes:
+        return agregados.agregados_vazios()["diario"]
+    return pd.concat(partes, ignore_index=True)
+
+
+def _linhas_vazias():
+    return pd.DataFrame({
+        "ID_FILIAL": pd.Series(dtype="int32"),
+        "ID_CLIENTE": pd.Series(dtype="int32"),
+        "DATA_VENDA": pd.Series(dtype="datetime64[ns]"),
+        "VALOR_VENDA_CENTAVOS": pd.Series(dtype="int64"),
+    })
+
+
+def vendas_filtradas(filtros, indice=None):
+    # Linhas de venda (ID_FILIAL, ID_CLIENTE, DATA_VENDA, centavos) dentro dos filtros
+    indice = indice or obter_indice()
+    if indice["clientes"] is None:
+        # Índice só com o cubo diário (VENDAS em fluxo): as linhas vêm da camada de dados. No
+        # armazém Parquet, os filtros são empurrados para a leitura; no CSV, ele é lido em
+        # lotes e filtrado lote a lote, sem carregar (nem guardar no cache) a tabela inteira
+        colunas = ["ID_FILIAL", "ID_CLIENTE", "DATA_VENDA", "VALOR_VENDA_CENTAVOS"]
+        selecao = dict(inicio=filtros.get("inicio"), fim=filtros.get("fim"), filiais=filtros.get("filiais"))
+        if dados.versao_tabela("VENDAS")[0] == "parquet":
+            return dados.carregar_vendas(colunas=colunas, **selecao)
+        partes = list(dados.filtrar_em_lotes("VENDAS", colunas, **selecao))
+        return pd.concat(partes, ignore_index=True) if partes else _linhas_vazias()
+
+    partes = []
+    for filial, a, b in _fatias(indice, filtros):
+        linha_a, linha_b = indice["vendas"][a], indice["vendas"][b]
+        partes.append(pd.DataFrame({
+            "ID_FILIAL": np.full(linha_b - linha_a, filial, dtype="int32"),
+            "ID_CLIENTE": indice["clientes"][linha_a:linha_b],
+            "DATA_VENDA": np.repeat(indice["dias"][a:b], np.diff(indice["vendas"][a:b + 1])).astype("datetime64[ns]"),
+            "VALOR_VENDA_CENTAVOS": indice["valores"][linha_a:linha_b],
+        }))
+    if not partes:
+        return _linhas_vazias()
+    return pd.concat(partes, ignore_index=True)
+
+
+@instrumentacao.medido("filtros (índice)")
+def agregados_filtrados(filtros, por_cliente=False):
+    """Agregados no formato de ``agregados.obter_agregados`` restritos aos filtros.
+
+    Sem filtros ativos, devolve os próprios agregados persistidos. Com filtros, os agregados
+    por cliente (``clientes`` e ``pares``) só são calculados se ``por_cliente`` for verdadeiro,
+    pois exigem percorrer as linhas do período; caso contrário ficam como None.
+    """
+    if not filtros_ativos(filtros):
+        return agregados.obter_agregados()
+    resultado = dict(agregados.agregados_vazios(), diario=serie_diaria(filtros), clientes=None, pares=None)
+    if por_cliente:
+        vendas = vendas_filtradas(filtros)
+        resultado.update(
+            clientes=agregados.agregar_clientes(vendas) if len(vendas) else agregados.agregados_vazios()["clientes"],
+            pares=vendas[["ID_FILIAL", "ID_CLIENTE"]].drop_duplicates(ignore_index=True),
+            linhas=len(vendas),
+        )
+    return resultado
+
+
+def filtros_vazios():
+    # Filtros no formato {"inicio", "fim", "filiais", "ufs"}; None significa "sem filtro"
+    return {"inicio": None, "fim": None, "filiais": None, "ufs": None}
+
+
+def filtros_ativos(filtros):
+    return any(filtros.get(chave) is not None for chave in ("inicio", "fim", "filiais"))
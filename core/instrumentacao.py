@@ -0,0 +1,300 @@
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import pandas as pd
+import psutil
+
+# Medição leve de cada etapa das páginas (leitura, limpeza, filtros, groupby, merge,
+# modelos, figuras): tempo de relógio, tempo de CPU, linhas de entrada e saída e memória.
+# Uma execução (um rerun de uma página) é aberta em main.py com ``execucao``; dentro dela,
+# ``etapa`` (context manager) e ``medido`` (decorador) registram as etapas, aninhadas.
+# Fragmentos das páginas (``fragmento``) que rodam sozinhos abrem a sua própria execução.
+# Fora de uma execução (benchmarks, precomputar.py) as etapas não custam nada.
+# A memória é o delta de RSS do processo ou, com o tracemalloc ligado, o pico alocado na
+# etapa, mais preciso e bem mais lento. As execuções recentes ficam em memória e podem ser
+# exportadas como logs JSON ou no formato texto do Prometheus.
+
+LIMITE_EXECUCOES = int(os.environ.get("DRIVATECH_EXECUCOES_MEDIDAS", "500"))
+# Se definido, o texto Prometheus é regravado a cada execução (coletor "textfile")
+ARQUIVO_METRICAS = os.environ.get("DRIVATECH_METRICAS_ARQUIVO")
+# Limites (em segundos) dos buckets do histograma de tempo por etapa
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger(__name__)
+
+_processo = psutil.Process()
+_local = threading.local()
+_historico = deque(maxlen=LIMITE_EXECUCOES)
+# (pagina, etapa) -> contagem, somas e buckets acumulados desde o início do processo
+_totais = {}
+# Métricas do processo registradas por outros módulos: nome -> (tipo, ajuda, função)
+_metricas = {}
+_trava = threading.Lock()
+
+if os.environ.get("DRIVATECH_TRACEMALLOC") == "1":
+    tracemalloc.start()
+
+
+def linhas(valor):
+    # Linhas de um DataFrame, Series ou array; None para o resto
+    if hasattr(valor, "shape") and len(getattr(valor, "shape")) > 0:
+        return int(valor.shape[0])
+    return None
+
+
+def _abrir(nome, linhas_entrada):
+    pilha = _local.pilha
+    registro = {
+        "etapa": nome,
+        "nivel": len(pilha) - 1,
+        "segundos": None,
+        "cpu_s": None,
+        "linhas_entrada": linhas_entrada,
+        "linhas_saida": None,
+        "memoria_mb": None,
+    }
+    inicio = {"relogio": time.perf_counter(), "cpu": time.thread_time(), "pico": 0}
+    if tracemalloc.is_tracing():
+        # O pico do tracemalloc é global: o da etapa de fora é guardado antes de zerá-lo
+        atual, pico = tracemalloc.get_traced_memory()
+        pilha[-1][1]["pico"] = max(pilha[-1][1]["pico"], pico)
+        tracemalloc.reset_peak()
+        inicio["alocado"] = atual
+    else:
+        inicio["rss"] = _processo.memory_info().rss
+    # Lista plana, em ordem de início; o aninhamento fica em "nivel"
+    pilha[0][0]["etapas"].append(registro)
+    pilha.append((registro, inicio))
+    return registro
+
+
+def _fechar():
+    registro, inicio = _local.pilha.pop()
+    registro["segundos"] = time.perf_counter() - inicio["relogio"]
+    registro["cpu_s"] = time.thread_time() - inicio["cpu"]
+    if "alocado" in inicio and tracemalloc.is_tracing():
+        pico = max(inicio["pico"], tracemalloc.get_traced_memory()[1])
+        registro["memoria_mb"] = (pico - inicio["alocado"]) / 2**20
+        externo = _local.pilha[-1][1]
+        externo["pico"] = max(externo["pico"], pico)
+    elif "rss" in inicio:
+        registro["memoria_mb"] = (_processo.memory_info().rss - inicio["rss"]) / 2**20
+
+
+@contextlib.contextmanager
+def etapa(nome, linhas_entrada=None):
+    """Mede o bloco como uma etapa da execução atual; ``linhas_saida`` pode ser preenchido.
+
+        with instrumentacao.etapa("merge clientes", linhas_entrada=len(clientes)) as registro:
+            df = clientes.merge(...)
+            registro["linhas_saida"] = len(df)
+    """
+    if not getattr(_local, "pilha", None):
+        # Sem execução aberta, um registro descartável
+        yield {}
+        return
+    registro = _abrir(nome, linhas_entrada)
+    try:
+        yield registro
+    finally:
+        _fechar()
+
+
+def medido(nome):
+    """Decorador: mede a função como etapa; as linhas vêm do 1º argumento e do retorno."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not getattr(_local, "pilha", None):
+                return funcao(*args, **kwargs)
+            with etapa(nome, linhas(args[0]) if args else None) as registro:
+                retorno = funcao(*args, **kwargs)
+                registro["linhas_saida"] = linhas(retorno)
+            return retorno
+        return medida
+    return decorador
+
+
+def fragmento(nome):
+    """Decorador: transforma a função em um ``st.fragment`` medido.
+
+    Dentro do rerun completo da página, o fragmento é uma etapa da execução; quando só ele
+    roda de novo (interação com um widget dele), vira uma execução própria chamada ``nome``.
+    """
+    import streamlit as st
+
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if getattr(_local, "pilha", None):
+                with etapa(nome):
+                    return funcao(*args, **kwargs)
+            with execucao(nome):
+                return funcao(*args, **kwargs)
+        return st.fragment(medida)
+    return decorador
+
+
+@contextlib.contextmanager
+def execucao(pagina):
+    """Abre a medição de um rerun de ``pagina``; ao sair, ela vai para o histórico."""
+    registro = {
+        "pagina": pagina,
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tracemalloc": tracemalloc.is_tracing(),
+        "etapas": [],
+        "erro": None,
+    }
+    # A raiz da pilha é a própria execução; a etapa "total" engloba todo o rerun
+    _local.pilha = [(registro, {"pico": 0})]
+    _abrir("total", None)
+    try:
+        yield registro
+    except BaseException as erro:
+        registro["erro"] = type(erro).__name__
+        raise
+    finally:
+        _fechar()
+        _local.pilha = None
+        _registrar(registro)
+
+
+def _registrar(execucao):
+    with _trava:
+        _historico.append(execucao)
+        for registro in execucao["etapas"]:
+            total = _totais.setdefault((execucao["pagina"], registro["etapa"]), {
+                "contagem": 0, "segundos": 0.0, "cpu_s": 0.0, "linhas_saida": 0,
+                "buckets": [0] * len(BUCKETS_SEGUNDOS), "memoria_mb": None,
+            })
+            total["contagem"] += 1
+            total["segundos"] += registro["segundos"]
+            total["cpu_s"] += registro["cpu_s"]
+            total["linhas_saida"] += registro["linhas_saida"] or 0
+            total["memoria_mb"] = registro["memoria_mb"]
+            for i, limite in enumerate(BUCKETS_SEGUNDOS):
+                if registro["segundos"] <= limite:
+                    total["buckets"][i] += 1
+    logger.info(json.dumps(execucao, ensure_ascii=False))
+    if ARQUIVO_METRICAS:
+        _gravar_metricas(ARQUIVO_METRICAS)
+
+
+def registrar_metrica(nome, tipo, ajuda, funcao):
+    """Inclui no export (e no painel) uma métrica do processo lida de ``funcao()``."""
+    _metricas[nome] = (tipo, ajuda, funcao)
+
+
+def metricas():
+    return {nome: funcao() for nome, (_, _, funcao) in sorted(_metricas.items())}
+
+
+def execucoes(pagina=None):
+    # Execuções recentes (mais antigas primeiro), opcionalmente só de uma página
+    with _trava:
+        return [e for e in _historico if pagina is None or e["pagina"] == pagina]
+
+
+def exportar_json():
+    """Execuções recentes como logs estruturados (uma linha JSON por execução)."""
+    return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in execucoes())
+
+
+def _rotulos(pagina, nome):
+    def escapar(texto):
+        return str(texto).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'pagina="{escapar(pagina)}",etapa="{escapar(nome)}"'
+
+
+def exportar_prometheus():
+    """Totais por página e etapa no formato texto de exposição do Prometheus."""
+    with _trava:
+        totais = {chave: dict(total, buckets=list(total["buckets"])) for chave, total in _totais.items()}
+    linhas_texto = [
+        "# HELP drivatech_etapa_segundos Tempo de relógio por etapa das páginas.",
+        "# TYPE drivatech_etapa_segundos histogram",
+    ]
+    for (pagina, nome), total in sorted(totais.items()):
+        rotulos = _rotulos(pagina, nome)
+        for limite, contagem in zip(BUCKETS_SEGUNDOS, total["buckets"]):
+            linhas_texto.append(f'drivatech_etapa_segundos_bucket{{{rotulos},le="{limite}"}} {contagem}')
+        linhas_texto.append(f'drivatech_etapa_segundos_bucket{{{rotulos},le="+Inf"}} {total["contagem"]}')
+        linhas_texto.append(f"drivatech_etapa_segundos_sum{{{rotulos}}} {total['segundos']:.6f}")
+        linhas_texto.append(f"drivatech_etapa_segundos_count{{{rotulos}}} {total['contagem']}")
+
+    for metrica, tipo, ajuda, campo in [
+        ("drivatech_etapa_cpu_segundos_total", "counter", "Tempo de CPU (da thread) por etapa.", "cpu_s"),
+        ("drivatech_etapa_linhas_saida_total", "counter", "Linhas produzidas por etapa.", "linhas_saida"),
+        ("drivatech_etapa_memoria_mb", "gauge", "Memória da última execução da etapa (MB).", "memoria_mb"),
+    ]:
+        linhas_texto += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} {tipo}"]
+        for (pagina, nome), total in sorted(totais.items()):
+            if total[campo] is not None:
+                linhas_texto.append(f"{metrica}{{{_rotulos(pagina, nome)}}} {total[campo]:.6f}")
+
+    for metrica, valor in metricas().items():
+        if valor is None:  # ainda sem medida (por exemplo, antes do primeiro render)
+            continue
+        tipo, ajuda, _ = _metricas[metrica]
+        linhas_texto += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} {tipo}", f"{metrica} {valor}"]
+    return "\n".join(linhas_texto) + "\n"
+
+
+def _gravar_metricas(caminho):
+    # Gravação atômica: o coletor nunca lê um arquivo pela metade
+    temporario = f"{caminho}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(exportar_prometheus())
+    os.replace(temporario, caminho)
+
+
+def tabela_etapas(execucao):
+    return pd.DataFrame([{
+        "Etapa": "   " * registro["nivel"] + registro["etapa"],
+        "Tempo (ms)": registro["segundos"] * 1000,
+        "CPU (ms)": registro["cpu_s"] * 1000,
+        "Linhas (entrada)": registro["linhas_entrada"],
+        "Linhas (saída)": registro["linhas_saida"],
+        "Memória (MB)": registro["memoria_mb"],
+    } for registro in execucao["etapas"]])
+
+
+def painel(execucao):
+    """Painel de desempenho na barra lateral para a execução (rerun) que acabou de rodar."""
+    # Streamlit só é importado aqui: o resto do módulo é usado também fora do dashboard
+    import streamlit as st
+
+    if not st.sidebar.toggle("Painel de desempenho", key="painel_desempenho"):
+        return
+    with st.sidebar.expander("⏱️ Desempenho da página", expanded=True):
+        # O tracemalloc vale para todo o processo (todas as sessões), a partir do próximo rerun
+        if tracemalloc.is_tracing():
+            if st.button("Desligar o tracemalloc"):
+                tracemalloc.stop()
+        elif st.button("Medir memória alocada (tracemalloc, mais lento)"):
+            tracemalloc.start()
+
+        total = execucao["etapas"][0]
+        st.caption(f"{execucao['pagina']}: {total['segundos'] * 1000:.0f} ms "
+                   f"({total['cpu_s'] * 1000:.0f} ms de CPU) neste rerun. "
+                   f"Memória: {'pico alocado' if execucao['tracemalloc'] else 'delta de RSS'}.")
+        st.dataframe(tabela_etapas(execucao), hide_index=True,
+                     column_config={"Tempo (ms)": st.column_config.NumberColumn(format="%.1f"),
+                                    "CPU (ms)": st.column_config.NumberColumn(format="%.1f"),
+                                    "Memória (MB)": st.column_config.NumberColumn(format="%.2f")})
+
+        anteriores = [e["etapas"][0]["segundos"] * 1000 for e in execucoes(execucao["pagina"])]
+        if len(anteriores) > 1:
+            st.caption(f"Últimos {len(anteriores)} reruns desta página: mediana "
+                       f"{sorted(anteriores)[len(anteriores) // 2]:.0f} ms, máximo {max(anteriores):.0f} ms.")
+        if _metricas:
+            st.dataframe(pd.Series(metricas(), name="Valor").to_frame(), column_config={"_index": "Métrica"})
+        st.download_button("Exportar (Prometheus)", exportar_prometheus(), "metricas.prom", "text/plain")
+        st.download_button("Exportar (logs JSON)", exportar_json(), "execucoes.jsonl", "application/x-ndjson")
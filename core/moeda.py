@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Conversão vetorizada de valores monetários no formato brasileiro ("1.234,56").
+# Os bytes das strings são decodificados direto dos buffers Arrow para centavos em int64,
+# sem criar as colunas intermediárias de texto do encadeamento
+# .astype(str).str.replace('.', '').str.replace(',', '.').astype(float).
+
+_ZERO, _NOVE = ord("0"), ord("9")
+_PONTO, _VIRGULA, _MENOS, _ESPACO = ord("."), ord(","), ord("-"), ord(" ")
+
+# Acima de 18 dígitos o acumulador int64 pode estourar
+_MAX_DIGITOS = 18
+_TAMANHO_BLOCO = 65_536
+
+
+def _para_arrow(valores):
+    if isinstance(valores, pd.Series):
+        valores = valores.array
+    if hasattr(valores, "__arrow_array__"):
+        # Colunas string[pyarrow] já guardam os bytes no layout Arrow: sem cópia
+        valores = valores.__arrow_array__()
+    if isinstance(valores, pa.ChunkedArray):
+        valores = valores.combine_chunks()
+    if not isinstance(valores, pa.Array):
+        valores = pa.array(np.asarray(valores, dtype=object), type=pa.string(), from_pandas=True)
+    if pa.types.is_large_string(valores.type) or pa.types.is_large_binary(valores.type):
+        valores = valores.cast(pa.large_binary())
+    else:
+        valores = valores.cast(pa.binary())
+    return valores
+
+
+def _buffers(array):
+    # Layout Arrow de strings: bitmap de validade, offsets e bytes contíguos
+    _, offsets, dados = array.buffers()
+    tipo_offset = np.int64 if pa.types.is_large_binary(array.type) else np.int32
+    n = len(array)
+    offsets = np.frombuffer(offsets, dtype=tipo_offset)[array.offset:array.offset + n + 1].astype(np.int64)
+    dados = np.frombuffer(dados, dtype=np.uint8) if dados is not None else np.zeros(0, dtype=np.uint8)
+    nulos = array.is_null().to_numpy(zero_copy_only=False) if array.null_count else np.zeros(n, dtype=bool)
+    return dados, offsets, nulos
+
+
+def _converter_bloco(dados, inicios, tamanhos):
+    n = len(inicios)
+    largura = int(tamanhos.max()) if n else 0
+
+    acumulado = np.zeros(n, dtype=np.int64)
+    digitos = np.zeros(n, dtype=np.int16)
+    casas = np.zeros(n, dtype=np.int8)
+    virgula = np.zeros(n, dtype=bool)
+    negativo = np.zeros(n, dtype=bool)
+    invalido = np.zeros(n, dtype=bool)
+    # Ponto só como separador de milhar: depois de um dígito e seguido de exatamente 3 dígitos
+    ponto = np.zeros(n, dtype=bool)
+    desde_ponto = np.zeros(n, dtype=np.int16)
+    anterior_digito = np.zeros(n, dtype=bool)
+    ultimo = max(len(dados) - 1, 0)
+
+    # Um passo por coluna de caracteres: O(n * largura), com largura tipicamente <= 12
+    for j in range(largura):
+        ativo = j < tamanhos
+        byte = np.where(ativo, dados[np.minimum(inicios + j, ultimo)], 0)
+
+        eh_digito = (byte >= _ZERO) & (byte <= _NOVE)
+        decimal = eh_digito & virgula
+        invalido |= decimal & (casas >= 2)
+        acumulado = np.where(eh_digito, acumulado * 10 + (byte - _ZERO), acumulado)
+        digitos += eh_digito
+        casas += decimal
+
+        eh_virgula = byte == _VIRGULA
+        invalido |= eh_virgula & virgula
+        invalido |= eh_virgula & ponto & (desde_ponto != 3)
+        virgula |= eh_virgula
+
+        eh_ponto = byte == _PONTO
+        invalido |= eh_ponto & (virgula | ~anterior_digito | (ponto & (desde_ponto != 3)))
+        desde_ponto = np.where(eh_ponto, 0, desde_ponto + (eh_digito & ~virgula))
+        ponto |= eh_ponto
+        anterior_digito = np.where(ativo, eh_digito, anterior_digito)
+
+        eh_menos = byte == _MENOS
+        invalido |= eh_menos & ((digitos > 0) | negativo)
+        negativo |= eh_menos
+
+        conhecido = eh_digito | eh_virgula | eh_menos | (byte == _PONTO) | (byte == _ESPACO) | ~ativo
+        invalido |= ~conhecido
+
+    # O último grupo de milhar termina no fim do texto quando não há vírgula
+    invalido |= ponto & ~virgula & (desde_ponto != 3)
+    invalido |= digitos > _MAX_DIGITOS
+    # Mais de duas casas já é inválido; o limite só evita a potência negativa antes do erro
+    centavos = acumulado * (10 ** (2 - np.minimum(casas, 2).astype(np.int64)))
+    return np.where(negativo, -centavos, centavos), digitos == 0, invalido
+
+
+def brl_para_centavos(valores):
+    """Converte valores no formato "1.234,56" para centavos (int64).
+
+    Aceita Series, arrays Arrow ou qualquer sequência de strings. Valores ausentes ou vazios
+    resultam em ``pd.NA`` (dtype ``Int64``); caso contrário o retorno é ``int64``.
+    """
+    indice = valores.index if isinstance(valores, pd.Series) else None
+    nome = valores.name if isinstance(valores, pd.Series) else None
+    dados, offsets, nulos = _buffers(_para_arrow(valores))
+
+    inicios = offsets[:-1]
+    tamanhos = offsets[1:] - inicios
+    n = len(inicios)
+    centavos = np.empty(n, dtype=np.int64)
+    sem_digitos = np.empty(n, dtype=bool)
+
+    # Blocos pequenos mantêm os arrays temporários no cache da CPU
+    for inicio in range(0, n, _TAMANHO_BLOCO):
+        fim = min(inicio + _TAMANHO_BLOCO, n)
+        bloco, vazio, invalido = _converter_bloco(dados, inicios[inicio:fim], tamanhos[inicio:fim])
+        if invalido.any():
+            posicao = inicio + int(np.flatnonzero(invalido)[0])
+            texto = bytes(dados[inicios[posicao]:inicios[posicao] + tamanhos[posicao]]).decode("utf-8", "replace")
+            raise ValueError(f"Valor monetário inválido na posição {posicao}: {texto!r}")
+        centavos[inicio:fim] = bloco
+        sem_digitos[inicio:fim] = vazio
+
+    # Strings sem nenhum dígito (vazias, só espaços) são tratadas como ausentes
+    ausente = nulos | sem_digitos
+    if ausente.any():
+        resultado = pd.array(centavos, dtype="Int64")
+        resultado[ausente] = pd.NA
+        return pd.Series(resultado, index=indice, name=nome)
+    return pd.Series(centavos, index=indice, name=nome)
+
+
+def centavos_para_float(centavos):
+    # A divisão por 100 é corretamente arredondada: o resultado é idêntico a float("1234.56")
+    if isinstance(centavos, pd.Series):
+        return centavos.astype("float64") / 100
+    return np.asarray(centavos, dtype=np.float64) / 100
+
+
+def brl_para_float(valores):
+    return centavos_para_float(brl_para_centavos(valores))
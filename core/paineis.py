@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from core import (agregados, amostragem, artefatos, dados, distribuicao, esquema, hierarquia, indice, instrumentacao,
+                  previsao, resultados, segmentacao)
+from core.dados import carregar_clientes
+from core.indice import filtros_vazios
+
+# Cálculos das páginas do dashboard, sem Streamlit.
+# Cada função recebe os filtros (e as opções da página) e devolve um dict com:
+#   - "tabelas": DataFrames exibidos ou usados pela página;
+#   - "figuras": figuras Plotly prontas;
+#   - "valores": números e indicadores soltos (serializáveis em JSON).
+# As páginas só desenham esse resultado. Sem filtros e com as opções padrão, ele pode vir
+# dos artefatos pré-calculados por precomputar.py; nos demais casos, do cache de resultados
+# compartilhado entre as sessões (core/resultados.py). Veja ``obter``.
+# O plotly.express (e, nos módulos de modelos, o scikit-learn) é importado só nas funções que
+# o usam: abrir a Home não paga por ele (veja core/aquecimento.py).
+
+
+def vendas_regiao(filtros):
+    import plotly.express as px
+
+    base = indice.agregados_filtrados(filtros)
+    vendas_por_uf = agregados.vendas_por_uf(base)[['UF', 'VALOR_VENDA']]
+    vendas_por_data_uf = agregados.vendas_por_data_uf(base)[['DATA_VENDA', 'UF', 'VALOR_VENDA']]
+
+    with instrumentacao.etapa("figura UF"):
+        fig_uf = px.bar(vendas_por_uf, x='UF', y='VALOR_VENDA',
+                        labels={'VALOR_VENDA': 'Valor das Vendas (R$)', 'UF': 'UF'},
+                        color='VALOR_VENDA',
+                        color_continuous_scale=px.colors.qualitative.Plotly)
+
+    # Períodos longos são reduzidos com LTTB, preservando picos e vales de cada UF
+    with instrumentacao.etapa("LTTB", linhas_entrada=len(vendas_por_data_uf)) as registro:
+        serie = amostragem.reduzir_serie(vendas_por_data_uf, 'DATA_VENDA', 'VALOR_VENDA', grupo='UF')
+        registro["linhas_saida"] = len(serie)
+    with instrumentacao.etapa("figura tempo", linhas_entrada=len(serie)):
+        fig_tempo = px.line(serie, x='DATA_VENDA', y='VALOR_VENDA', color='UF',
+                            labels={'VALOR_VENDA': 'Valor Total das Vendas (R$)', 'DATA_VENDA': 'Data da Venda'},
+                            markers=True)
+    return {
+        "tabelas": {"vendas_por_uf": vendas_por_uf},
+        "figuras": {"uf": fig_uf, "tempo": fig_tempo},
+        "valores": {"pontos_exibidos": len(serie), "pontos_total": len(vendas_por_data_uf)},
+    }
+
+
+def desempenho_produtos(filtros):
+    import plotly.express as px
+
+    base = indice.agregados_filtrados(filtros)
+    vendas_por_filial = agregados.vendas_por_filial(base)[['ID_FILIAL', 'VALOR_VENDA']]
+    with instrumentacao.etapa("junção filiais", linhas_entrada=len(vendas_por_filial)) as registro:
+        vendas_por_filial = esquema.com_atributos(vendas_por_filial, "FILIAIS", ['NOME_FILIAL'])
+        registro["linhas_saida"] = len(vendas_por_filial)
+
+    with instrumentacao.etapa("figura filiais"):
+        fig = px.bar(vendas_por_filial, x='NOME_FILIAL', y='VALOR_VENDA',
+                     title='Total de Vendas por Filial',
+                     labels={'VALOR_VENDA': 'Valor Total das Vendas (R$)', 'NOME_FILIAL': 'Filial'},
+                     color='VALOR_VENDA',
+                     color_continuous_scale=px.colors.sequential.Plasma)
+    return {"tabelas": {"vendas_por_filial": vendas_por_filial}, "figuras": {"filiais": fig}, "valores": {}}
+
+
+def segmentacao_clientes(filtros, modo="gasto", intervalo=None):
+    """Clientes segmentados; ``intervalo`` (ID inicial, ID final) é o zoom da dispersão."""
+    import plotly.express as px
+
+    clientes = carregar_clientes()
+
+    # Total gasto por cliente, a partir dos agregados mantidos de forma incremental e dos filtros
+    base = indice.agregados_filtrados(filtros, por_cliente=True)
+    total_gasto = agregados.vendas_por_cliente(base)
+    # Junção à esquerda por ID_CLIENTE feita com um array indexado pelo ID (sem merge)
+    with instrumentacao.etapa("junção clientes", linhas_entrada=len(clientes)) as registro:
+        ids, origem = clientes['ID_CLIENTE'].to_numpy(), total_gasto['ID_CLIENTE'].to_numpy()
+        clientes_completo = clientes.assign(
+            total_gasto=esquema.alinhar(ids, origem, total_gasto['VALOR_VENDA'].to_numpy(), 0.0),
+            N_VENDAS=esquema.alinhar(ids, origem, total_gasto['N_VENDAS'].to_numpy(), 0),
+            ULTIMA_COMPRA=esquema.alinhar(ids, origem, total_gasto['ULTIMA_COMPRA'].to_numpy(), np.datetime64("NaT")),
+        )
+        registro["linhas_saida"] = len(clientes_completo)
+
+    # Segmentação (modelo reaproveitado enquanto os dados e os filtros não mudam)
+    clientes_completo['cluster'] = segmentacao.segmentar(clientes_completo, modo=modo, k=3, chave=tuple(filtros.items()))
+
+    # Cores mais suaves para os clusters
+    color_map = {0: 'lightblue', 1: 'lightgreen', 2: 'lightcoral'}
+    clientes_completo['cluster_color'] = clientes_completo['cluster'].map(color_map)
+
+    # Muitos clientes: um intervalo de IDs funciona como zoom, e dentro dele a dispersão
+    # só é agrupada em células se ainda passar do orçamento de pontos do gráfico
+    pontos = clientes_completo[['ID_CLIENTE', 'total_gasto', 'cluster']]
+    zoom = len(pontos) > amostragem.PONTOS_GRAFICO
+    ids = (int(pontos['ID_CLIENTE'].min()), int(pontos['ID_CLIENTE'].max())) if len(pontos) else (0, 0)
+    if zoom and intervalo is not None:
+        pontos = pontos[pontos['ID_CLIENTE'].between(*intervalo)]
+    with instrumentacao.etapa("redução da dispersão", linhas_entrada=len(pontos)) as registro:
+        pontos, agrupado = amostragem.reduzir_dispersao(pontos, 'ID_CLIENTE', 'total_gasto', 'cluster')
+        registro["linhas_saida"] = len(pontos)
+
+    with instrumentacao.etapa("figura dispersão", linhas_entrada=len(pontos)):
+        fig = px.scatter(
+            pontos,
+            x='ID_CLIENTE',
+            y='total_gasto',
+            color='cluster',
+            color_discrete_map=color_map,
+            size='N_PONTOS' if agrupado else None,
+            hover_data=['N_PONTOS'] if agrupado else None,
+            render_mode='webgl' if agrupado else 'auto',
+            title='Segmentação de Clientes por Total Gasto',
+            labels={'ID_CLIENTE': 'ID do Cliente', 'total_gasto': 'Total Gasto (R$)', 'N_PONTOS': 'Clientes'},
+            template='plotly_dark'
+        )
+    return {
+        "tabelas": {"clientes": clientes_completo},
+        "figuras": {"dispersao": fig},
+        "valores": {"zoom": zoom, "ids": list(ids), "agrupado": bool(agrupado)},
+    }
+
+
+def analise_dados(filtros):
+    # Esta página filtra os clientes só por UF; período e filial restringem as vendas (e
+    # portanto os clientes com vendas e a receita)
+    ufs = filtros['ufs']
+    por_venda = indice.agregados_filtrados(filtros, por_cliente=True)["clientes"]
+    contadores = None
+    if distribuicao.aproximar():
+        # Tabela de clientes grande demais: lotes e resumo space-saving das cidades
+        contadores = distribuicao.CONTADORES_DISTRIBUICAO
+        lotes = dados.ler_em_lotes("CLIENTES", colunas=distribuicao.COLUNAS_CLIENTES)
+    else:
+        lotes = [carregar_clientes()]
+    if ufs:
+        lotes = (lote[lote['UF'].isin(ufs)] for lote in lotes)
+
+    with instrumentacao.etapa("distribuição cidade e UF") as registro:
+        resultado = distribuicao.distribuir(lotes, por_venda, contadores=contadores)
+        registro["linhas_entrada"] = resultado["n_clientes"]
+
+    def resumo(df):
+        return pd.DataFrame({
+            'Nº de Clientes': df['N_CLIENTES'],
+            'Clientes com Vendas': df['COM_VENDAS'],
+            'Receita (R$)': df['RECEITA_CENTAVOS'] / 100,
+        }, index=df.index)
+
+    resumo_cidade = resumo(resultado["cidade"])
+    if resultado["aproximado"]:
+        # Intervalo do nº real de clientes de cada cidade (e do balde "Outros (aprox.)")
+        resumo_cidade['Mínimo de Clientes'] = resultado["cidade"]['N_MINIMO']
+        resumo_cidade['Máximo de Clientes'] = resultado["cidade"]['N_MAXIMO']
+    amostra = resultado["amostra"]
+    return {
+        "tabelas": {
+            "amostra": amostra if amostra is not None else pd.DataFrame(columns=distribuicao.COLUNAS_CLIENTES),
+            "distribuicao_cidade": resumo_cidade[['Nº de Clientes']],
+            "distribuicao_uf": resumo(resultado["uf"])[['Nº de Clientes']],
+            "resumo_cidade": resumo_cidade,
+            "resumo_uf": resumo(resultado["uf"]),
+        },
+        "figuras": {},
+        "valores": {
+            "n_clientes": resultado["n_clientes"],
+            "n_cidades": resultado["n_cidades"],
+            "aproximado": resultado["aproximado"],
+            "topo": distribuicao.TOPO_DISTRIBUICAO,
+        },
+    }
+
+
+def previsao_vendas(filtros, espera=previsao.ESPERA_TREINO):
+    """Previsão mensal (Ridge); ``espera=None`` aguarda o treino em vez de usar a última versão."""
+    base = indice.agregados_filtrados(filtros)
+    vendas_por_mes = agregados.vendas_por_mes(base)[['MÊS', 'ANO', 'VALOR_VENDA']]
+    if len(vendas_por_mes) < 2:
+        return {"tabelas": {}, "figuras": {}, "valores": {"meses_insuficientes": True}}
+
+    # Modelo treinado em segundo plano e persistido por versão dos dados e hiperparâmetros;
+    # enquanto uma nova versão treina, fica a última previsão concluída
+    resultado, atual = previsao.obter_previsao(vendas_por_mes, chave=tuple(filtros.items()), espera=espera)
+    if resultado is None:
+        return {"tabelas": {}, "figuras": {}, "valores": {"treinando": True}}
+
+    teste = resultado['teste']
+    fig_teste = go.Figure()
+    fig_teste.add_trace(go.Scatter(x=teste['INDICE'], y=teste['REAL'], mode='lines+markers', name='Vendas Reais', line=dict(color='blue')))
+    fig_teste.add_trace(go.Scatter(x=teste['INDICE'], y=teste['PREVISTO'], mode='lines+markers', name='Vendas Previstas', line=dict(color='red')))
+    fig_teste.update_layout(title="Comparação entre Vendas Reais e Previstas", xaxis_title="Índice", yaxis_title="Valor das Vendas (R$)")
+
+    futuro = resultado['futuro']
+    fig_futuro = go.Figure()
+    fig_futuro.add_trace(go.Scatter(x=futuro.index, y=futuro['VALOR_VENDA_PREVISTA'], mode='lines+markers', name='Previsões Futuras', line=dict(color='green')))
+    fig_futuro.update_layout(title="Previsões de Vendas até 2029", xaxis_title="Índice", yaxis_title="Valor das Vendas (R$)")
+
+    metadados = resultado['metadados']
+    return {
+        "tabelas": {"futuro": futuro, "versoes": previsao.historico(metadados['serie']).drop(columns='serie')},
+        "figuras": {"teste": fig_teste, "futuro": fig_futuro},
+        "valores": {
+            "atual": atual,
+            "rmse": metadados['metricas']['rmse'],
+            "versao": metadados['versao'],
+            "treino_s": metadados['treino_s'],
+        },
+    }
+
+
+def previsao_hierarquica(filtros, frequencia="W", horizonte=12):
+    import plotly.express as px
+
+    resultado = hierarquia.obter_previsao_hierarquica(filtros, frequencia, horizonte)
+    if resultado is None:
+        return {"tabelas": {}, "figuras": {}, "valores": {"periodos_insuficientes": True}}
+
+    tabela = resultado['previsoes']
+    figuras = {}
+    for nivel in ['Total', 'UF', 'Filial']:
+        with instrumentacao.etapa(f"figura {nivel}"):
+            figuras[nivel] = px.line(tabela[tabela['NIVEL'] == nivel], x='PERIODO', y='VALOR', color='SERIE', line_dash='TIPO',
+                                     labels={'PERIODO': 'Período', 'VALOR': 'Valor das Vendas (R$)', 'SERIE': nivel, 'TIPO': ''})
+    return {
+        "tabelas": {"previsoes": tabela[tabela['TIPO'] == 'Previsão'].drop(columns='TIPO'), "metricas": resultado['metricas']},
+        "figuras": figuras,
+        "valores": {"series": len(resultado['metricas']), "tempo_s": resultado['tempo_s']},
+    }
+
+
+CALCULOS = {
+    "vendas_regiao": vendas_regiao,
+    "desempenho_produtos": desempenho_produtos,
+    "segmentacao_clientes": segmentacao_clientes,
+    "analise_dados": analise_dados,
+    "previsao_vendas": previsao_vendas,
+    "previsao_hierarquica": previsao_hierarquica,
+}
+
+# Combinações de página e opções pré-calculadas em lote (sempre sem filtros)
+PRECALCULADOS = [
+    ("vendas_regiao", {}),
+    ("desempenho_produtos", {}),
+    ("segmentacao_clientes", {"modo": "gasto"}),
+    ("segmentacao_clientes", {"modo": "rfm"}),
+    ("analise_dados", {}),
+    ("previsao_vendas", {}),
+    ("previsao_hierarquica", {"frequencia": "W", "horizonte": 12}),
+    ("previsao_hierarquica", {"frequencia": "D", "horizonte": 12}),
+]
+
+
+def _definitivo(resultado):
+    # Previsões provisórias (modelo ainda treinando) não entram no cache de resultados
+    valores = resultado["valores"]
+    return not valores.get("treinando") and valores.get("atual", True)
+
+
+def obter(pagina, filtros, **opcoes):
+    """Resultado da página: do artefato pré-calculado, se houver um em dia, do cache de
+    resultados compartilhado entre as sessões ou calculado agora (e guardado no cache)."""
+    opcoes = {chave: valor for chave, valor in opcoes.items() if valor is not None}
+    if filtros == filtros_vazios() and (pagina, opcoes) in PRECALCULADOS:
+        with instrumentacao.etapa("artefato pré-calculado"):
+            resultado = artefatos.carregar_artefato(artefatos.nome_artefato(pagina, opcoes))
+        if resultado is not None:
+            return resultado
+
+    def calcular():
+        with instrumentacao.etapa(f"cálculo {pagina}"):
+            return CALCULOS[pagina](filtros, **opcoes)
+
+    with instrumentacao.etapa("cache de resultados"):
+        return resultados.obter(pagina, filtros, opcoes, calcular, guardar=_definitivo)
+
+
+def aquecer():
+    """Deixa no cache de resultados as visões sem filtros de PRECALCULADOS para a versão
+    atual dos dados (a fixada na thread, durante a atualização em segundo plano).
+
+    Visões com artefato pré-calculado em dia são puladas; o treino das previsões é aguardado.
+    """
+    for pagina, opcoes in PRECALCULADOS:
+        if artefatos.carregar_artefato(artefatos.nome_artefato(pagina, opcoes)) is not None:
+            continue
+        extras = {"espera": None} if pagina == "previsao_vendas" else {}
+        resultados.obter(
+            pagina, filtros_vazios(), opcoes,
+            lambda pagina=pagina, opcoes=opcoes, extras=extras: CALCULOS[pagina](filtros_vazios(), **opcoes, **extras),
+            guardar=_definitivo,
+        )
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core import instrumentacao
+
+# Modelos de previsão de vendas persistidos em disco, um diretório por versão.
+# A versão é o hash da série mensal de treino (valores incluídos) com os hiperparâmetros:
+# a mesma série nunca é treinada duas vezes, nem entre reinícios do app.
+# O treino roda em um worker em segundo plano; a página recebe na hora a última previsão
+# concluída da mesma série (mesmos filtros e hiperparâmetros) enquanto a nova é calculada.
+
+DIRETORIO_MODELOS = os.environ.get("DRIVATECH_MODEL_DIR", os.path.join("data", "modelos"))
+METADADOS = "metadados.json"
+LIMITE_VERSOES = 32
+
+# Tempo máximo que uma página espera por um treino antes de seguir com a última previsão
+ESPERA_TREINO = 0.5
+
+PARAMETROS = {
+    "alpha": 1.0,
+    "test_size": 0.2,
+    "random_state": 42,
+    "anos": [2023, 2029],
+}
+
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="previsao")
+_em_treino = {}
+_memoria = {}
+_trava = threading.Lock()
+
+
+def _hash(objeto):
+    return hashlib.sha1(json.dumps(objeto, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def versao_modelo(vendas_por_mes, parametros):
+    dados = pd.util.hash_pandas_object(vendas_por_mes[["MÊS", "ANO", "VALOR_VENDA"]], index=False)
+    return _hash([hashlib.sha1(dados.to_numpy().tobytes()).hexdigest(), parametros])
+
+
+def _matriz(vendas_por_mes):
+    # Variáveis dummy para os meses (o primeiro mês presente fica como referência)
+    vendas_por_mes = pd.get_dummies(vendas_por_mes[["MÊS", "ANO", "VALOR_VENDA"]], columns=["MÊS"], drop_first=True)
+    return vendas_por_mes.drop(columns=["VALOR_VENDA"]), vendas_por_mes["VALOR_VENDA"]
+
+
+def _grade_futura(colunas, anos):
+    anos = np.arange(anos[0], anos[1] + 1)
+    futuro = pd.DataFrame({"MÊS": np.tile(np.arange(1, 13), len(anos)), "ANO": np.repeat(anos, 12)})
+    futuro = pd.get_dummies(futuro, columns=["MÊS"], drop_first=True)
+    # Mesma estrutura de colunas do treino
+    for coluna in colunas:
+        if coluna not in futuro.columns:
+            futuro[coluna] = 0
+    return futuro
+
+
+def treinar(vendas_por_mes, parametros=None):
+    """Treina o modelo e calcula as previsões, sem tocar no disco."""
+    # O scikit-learn só é importado por quem treina (veja core/aquecimento.py)
+    from sklearn.linear_model import Ridge
+    from sklearn.model_selection import train_test_split
+
+    parametros = dict(PARAMETROS, **(parametros or {}))
+    inicio = time.perf_counter()
+
+    X, y = _matriz(vendas_por_mes)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=parametros["test_size"], random_state=parametros["random_state"]
+    )
+    modelo = Ridge(alpha=parametros["alpha"]).fit(X_train, y_train)
+    y_pred = modelo.predict(X_test)
+
+    futuro = _grade_futura(X.columns, parametros["anos"])
+    # Ajuste para evitar valores negativos
+    futuro["VALOR_VENDA_PREVISTA"] = np.maximum(modelo.predict(futuro[X.columns]), 0)
+
+    erro = y_pred - y_test.to_numpy()
+    reais = y_test.to_numpy()
+    metricas = {
+        "rmse": float(np.sqrt(np.mean(erro ** 2))),
+        "mae": float(np.mean(np.abs(erro))),
+        "mape": float(np.mean(np.abs(erro[reais != 0] / reais[reais != 0]))) if (reais != 0).any() else None,
+    }
+    return {
+        "modelo": modelo,
+        "colunas": list(X.columns),
+        "teste": pd.DataFrame({"INDICE": y_test.index, "REAL": reais, "PREVISTO": y_pred}),
+        "futuro": futuro,
+        "metadados": {
+            "parametros": parametros,
+            "metricas": metricas,
+            "treino_s": time.perf_counter() - inicio,
+            "meses": len(vendas_por_mes),
+        },
+    }
+
+
+def salvar(resultado, diretorio=None):
+    diretorio = diretorio or DIRETORIO_MODELOS
+    destino = os.path.join(diretorio, resultado["metadados"]["versao"])
+    temporario = f"{destino}.tmp-{os.getpid()}-{threading.get_ident()}"
+    import joblib
+
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    joblib.dump({"modelo": resultado["modelo"], "colunas": resultado["colunas"]}, os.path.join(temporario, "modelo.joblib"))
+    resultado["teste"].to_parquet(os.path.join(temporario, "teste.parquet"), index=False)
+    resultado["futuro"].to_parquet(os.path.join(temporario, "futuro.parquet"), index=False)
+    with open(os.path.join(temporario, METADADOS), "w", encoding="utf-8") as f:
+        json.dump(resultado["metadados"], f, indent=2)
+    # A versão é imutável: se outro processo gravou a mesma primeiro, a dele vale
+    try:
+        os.rename(temporario, destino)
+    except OSError:
+        shutil.rmtree(temporario, ignore_errors=True)
+    _limpar_antigas(diretorio)
+
+
+def carregar(versao, diretorio=None):
+    caminho = os.path.join(diretorio or DIRETORIO_MODELOS, versao)
+    try:
+        with open(os.path.join(caminho, METADADOS), encoding="utf-8") as f:
+            metadados = json.load(f)
+    except FileNotFoundError:
+        return None
+    import joblib
+
+    salvo = joblib.load(os.path.join(caminho, "modelo.joblib"))
+    return {
+        "modelo": salvo["modelo"],
+        "colunas": salvo["colunas"],
+        "teste": pd.read_parquet(os.path.join(caminho, "teste.parquet")),
+        "futuro": pd.read_parquet(os.path.join(caminho, "futuro.parquet")),
+        "metadados": metadados,
+    }
+
+
+def historico(serie=None, diretorio=None):
+    """Versões gravadas (da ``serie``, se informada), da mais recente para a mais antiga."""
+    diretorio = diretorio or DIRETORIO_MODELOS
+    linhas = []
+    if os.path.isdir(diretorio):
+        for versao in os.listdir(diretorio):
+            try:
+                with open(os.path.join(diretorio, versao, METADADOS), encoding="utf-8") as f:
+                    metadados = json.load(f)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            if serie is None or metadados["serie"] == serie:
+                linhas.append({
+                    "versao": metadados["versao"],
+                    "serie": metadados["serie"],
+                    "criado_em": metadados["criado_em"],
+                    "meses": metadados["meses"],
+                    "treino_s": metadados["treino_s"],
+                    **metadados["metricas"],
+                })
+    colunas = ["versao", "serie", "criado_em", "meses", "treino_s", "rmse", "mae", "mape"]
+    return pd.DataFrame(linhas, columns=colunas).sort_values("criado_em", ascending=False, ignore_index=True)
+
+
+def _limpar_antigas(diretorio):
+    antigas = historico(diretorio=diretorio).iloc[LIMITE_VERSOES:]
+    for versao in antigas["versao"]:
+        shutil.rmtree(os.path.join(diretorio, versao), ignore_errors=True)
+
+
+def _treinar_e_salvar(vendas_por_mes, parametros, versao, serie):
+    try:
+        resultado = treinar(vendas_por_mes, parametros)
+        resultado["metadados"].update(versao=versao, serie=serie, criado_em=datetime.now().isoformat(timespec="milliseconds"))
+        salvar(resultado)
+        _lembrar(versao, resultado)
+        return resultado
+    finally:
+        with _trava:
+            _em_treino.pop(versao, None)
+
+
+def _lembrar(versao, resultado):
+    with _trava:
+        _memoria[versao] = resultado
+        while len(_memoria) > LIMITE_VERSOES:
+            _memoria.pop(next(iter(_memoria)))
+
+
+def _obter(versao):
+    with _trava:
+        resultado = _memoria.get(versao)
+    if resultado is None:
+        resultado = carregar(versao)
+        if resultado is not None:
+            _lembrar(versao, resultado)
+    return resultado
+
+
+@instrumentacao.medido("previsão (modelo)")
+def obter_previsao(vendas_por_mes, parametros=None, chave=None, espera=ESPERA_TREINO):
+    """Previsão para a série mensal, sem bloquear a página no treino.
+
+    Retorna ``(resultado, atual)``. Se o modelo desta versão já existe (em memória ou em
+    disco), ele é devolvido com ``atual=True``. Senão, o treino é enviado ao worker (uma vez
+    por versão) e, se não terminar em ``espera`` segundos, volta a última previsão
+    concluída da mesma série (``chave`` + hiperparâmetros) com ``atual=False``, ou None se
+    ainda não houver nenhuma. ``espera=None`` aguarda o treino (uso em lote).
+    """
+    parametros = dict(PARAMETROS, **(parametros or {}))
+    versao = versao_modelo(vendas_por_mes, parametros)
+    serie = _hash([chave, parametros])
+
+    resultado = _obter(versao)
+    if resultado is not None:
+        return resultado, True
+
+    with _trava:
+        futuro = _em_treino.get(versao)
+        if futuro is None:
+            futuro = _worker.submit(_treinar_e_salvar, vendas_por_mes.copy(), parametros, versao, serie)
+            _em_treino[versao] = futuro
+    try:
+        return futuro.result(timeout=espera), True
+    except TimeoutError:
+        pass
+
+    anteriores = historico(serie)
+    if anteriores.empty:
+        return None, False
+    return _obter(anteriores["versao"].iloc[0]), False
+
+
+def treinando():
+    with _trava:
+        return len(_em_treino)
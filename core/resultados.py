@@ -0,0 +1,156 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+import plotly.io as pio
+
+from core import dados, instrumentacao
+
+# Cache, por processo, dos resultados calculados das páginas (tabelas, figuras Plotly e
+# valores de core/paineis.py), compartilhado por todas as sessões.
+# A chave é a versão dos dados + página + filtros + opções: o segundo usuário que abre a
+# mesma visão recebe o resultado pronto, sem refazer groupbys, modelos e figuras.
+#   - LRU limitado por bytes (DRIVATECH_RESULTADOS_MB): tabelas pelo memory_usage e figuras
+#     pelo tamanho do JSON que seria enviado ao navegador;
+#   - single-flight: sessões que pedem a mesma chave ao mesmo tempo esperam o único cálculo
+#     em andamento em vez de repeti-lo;
+#   - estatísticas de acertos, faltas, esperas e evicções.
+# Os resultados são compartilhados: as páginas só os desenham, não os modificam.
+
+LIMITE_BYTES = int(os.environ.get("DRIVATECH_RESULTADOS_MB", "256")) * 1024 * 1024
+
+_cache = OrderedDict()  # chave -> (resultado, bytes)
+_em_andamento = {}  # chave -> Future do cálculo
+_bytes = 0
+_estatisticas = {"acertos": 0, "faltas": 0, "esperas": 0, "evicoes": 0, "nao_guardados": 0}
+_trava = threading.Lock()
+
+
+def tamanho(resultado):
+    """Bytes aproximados de um resultado de página."""
+    total = 0
+    for df in resultado.get("tabelas", {}).values():
+        total += int(df.memory_usage(deep=True).sum()) if isinstance(df, (pd.DataFrame, pd.Series)) else 0
+    for fig in resultado.get("figuras", {}).values():
+        total += len(pio.to_json(fig, validate=False))
+    return total
+
+
+def _normalizar(valor):
+    # Filtros e opções viram tuplas ordenadas (hashable e independentes da ordem)
+    if isinstance(valor, dict):
+        return tuple(sorted((chave, _normalizar(v)) for chave, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(_normalizar(v) for v in valor)
+    return valor
+
+
+def chave(pagina, filtros, opcoes):
+    return (dados.versao_dados(), pagina, _normalizar(filtros), _normalizar(opcoes))
+
+
+def _remover(chave_antiga):
+    global _bytes
+    _, tamanho_antigo = _cache.pop(chave_antiga)
+    _bytes -= tamanho_antigo
+
+
+def _guardar(chave_nova, resultado):
+    global _bytes
+    tamanho_novo = tamanho(resultado)
+    if tamanho_novo > LIMITE_BYTES:
+        return
+    with _trava:
+        # Entradas de versões anteriores dos dados não serão mais pedidas (exceto as da versão
+        # publicada, enquanto a atualização em segundo plano aquece a próxima)
+        vigentes = (chave_nova[0], dados.versao_dados_publicada())
+        for antiga in [c for c in _cache if c[0] not in vigentes]:
+            _remover(antiga)
+        _cache[chave_nova] = (resultado, tamanho_novo)
+        _bytes += tamanho_novo
+        while _bytes > LIMITE_BYTES:
+            _remover(next(iter(_cache)))
+            _estatisticas["evicoes"] += 1
+
+
+def obter(pagina, filtros, opcoes, calcular, guardar=None):
+    """Resultado em cache para a chave, ou ``calcular()`` uma única vez entre as sessões.
+
+    ``guardar(resultado)`` pode recusar resultados provisórios (por exemplo, enquanto um
+    modelo ainda treina): eles são devolvidos, mas não entram no cache.
+    """
+    chave_atual = chave(pagina, filtros, opcoes)
+    with _trava:
+        if chave_atual in _cache:
+            _cache.move_to_end(chave_atual)
+            _estatisticas["acertos"] += 1
+            return _cache[chave_atual][0]
+        futuro = _em_andamento.get(chave_atual)
+        if futuro is None:
+            futuro = _em_andamento[chave_atual] = Future()
+            _estatisticas["faltas"] += 1
+            calculando = True
+        else:
+            _estatisticas["esperas"] += 1
+            calculando = False
+
+    if not calculando:
+        resultado = futuro.result()
+        if resultado is None:
+            # O cálculo foi interrompido (por exemplo, a sessão que calculava saiu da página)
+            return obter(pagina, filtros, opcoes, calcular, guardar)
+        return resultado
+
+    try:
+        resultado = calcular()
+        if guardar is None or guardar(resultado):
+            _guardar(chave_atual, resultado)
+        else:
+            with _trava:
+                _estatisticas["nao_guardados"] += 1
+    except Exception as erro:
+        futuro.set_exception(erro)
+        raise
+    except BaseException:
+        futuro.set_result(None)
+        raise
+    else:
+        futuro.set_result(resultado)
+        return resultado
+    finally:
+        with _trava:
+            _em_andamento.pop(chave_atual, None)
+
+
+def estatisticas():
+    with _trava:
+        consultas = _estatisticas["acertos"] + _estatisticas["faltas"] + _estatisticas["esperas"]
+        return dict(
+            _estatisticas,
+            entradas=len(_cache),
+            bytes=_bytes,
+            limite_bytes=LIMITE_BYTES,
+            taxa_acerto=(_estatisticas["acertos"] + _estatisticas["esperas"]) / consultas if consultas else None,
+        )
+
+
+def limpar():
+    global _bytes
+    with _trava:
+        _cache.clear()
+        _bytes = 0
+
+
+for _nome, _tipo, _ajuda in [
+    ("acertos", "counter", "Resultados de página servidos do cache."),
+    ("faltas", "counter", "Resultados de página calculados (não estavam no cache)."),
+    ("esperas", "counter", "Pedidos que aguardaram um cálculo idêntico em andamento."),
+    ("evicoes", "counter", "Entradas removidas pelo limite de bytes."),
+    ("bytes", "gauge", "Bytes ocupados pelo cache de resultados."),
+    ("entradas", "gauge", "Entradas no cache de resultados."),
+]:
+    # Contadores levam o sufixo _total, como pede a convenção do Prometheus
+    _metrica = f"drivatech_cache_resultados_{_nome}" + ("_total" if _tipo == "counter" else "")
+    instrumentacao.registrar_metrica(_metrica, _tipo, _ajuda, lambda nome=_nome: estatisticas()[nome])
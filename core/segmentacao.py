@@ -0,0 +1,205 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import dados, instrumentacao
+
+# Motor de segmentação de clientes.
+#   - "gasto": agrupamento ótimo em 1-D (Jenks / Ckmeans.1d.dp) sobre o total gasto. Para uma
+#     única variável a solução exata sai de uma programação dinâmica sobre os valores
+#     ordenados, mais rápida e determinística que o K-Means iterativo. Os grupos saem
+#     numerados do menor para o maior gasto.
+#   - "rfm": recência, frequência e valor monetário com MiniBatchKMeans, que escala para
+#     milhões de clientes.
+# Os modelos ajustados ficam em cache pela versão dos dados: num rerun só os rótulos são
+# atribuídos de novo.
+
+MODOS = ("gasto", "rfm")
+LIMITE_MODELOS = 16
+
+_modelos = OrderedDict()
+_trava = threading.Lock()
+
+
+def _custos(prefixos, inicio, fim, repeticoes=None):
+    # Soma dos quadrados dos desvios (ponderada) dos valores ordenados em [inicio, fim].
+    # Com ``repeticoes``, cada ``fim`` vale para um bloco de ``inicio``s consecutivos.
+    somas = []
+    for prefixo in prefixos:
+        ate_fim = prefixo[fim + 1]
+        if repeticoes is not None:
+            ate_fim = np.repeat(ate_fim, repeticoes)
+        somas.append(ate_fim - prefixo[inicio])
+    w, wx, wx2 = somas
+    return np.maximum(wx2 - wx * wx / w, 0.0)
+
+
+def _argmin_por_segmento(valores, inicios, tamanhos):
+    # Posição (relativa ao segmento) do primeiro mínimo de cada segmento concatenado
+    minimos = np.minimum.reduceat(valores, inicios)
+    segmento = np.repeat(np.arange(len(inicios)), tamanhos)
+    posicoes = np.flatnonzero(valores == np.repeat(minimos, tamanhos))
+    # As posições vêm em ordem crescente: a primeira de cada segmento é onde o segmento muda
+    segmento = segmento[posicoes]
+    primeiro = np.r_[True, segmento[1:] != segmento[:-1]]
+    return posicoes[primeiro] - inicios, minimos
+
+
+def limites_otimos_1d(valores, k, pesos=None):
+    """Cortes ótimos que dividem ``valores`` em ``k`` grupos contíguos com SSE mínima.
+
+    Implementa a programação dinâmica do Ckmeans.1d.dp com a otimização de dividir e
+    conquistar (o corte ótimo é monótono), vetorizada por nível da recursão: O(k n log n).
+    Devolve os limites superiores de cada grupo, exceto o último, para uso com searchsorted.
+    """
+    x = np.asarray(valores, dtype=np.float64)
+    w = np.ones_like(x) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    ordem = np.argsort(x, kind="stable")
+    x, w = x[ordem], w[ordem]
+    n = len(x)
+    # Mais grupos que valores distintos deixariam cortes repetidos (grupos vazios)
+    k = min(k, int(np.count_nonzero(np.diff(x))) + 1 if n else 0)
+    if k <= 1:
+        return np.zeros(0)
+
+    # Centralizar reduz o erro numérico das somas de quadrados
+    xc = x - np.average(x, weights=w)
+    prefixos = (
+        np.r_[0.0, np.cumsum(w)],
+        np.r_[0.0, np.cumsum(w * xc)],
+        np.r_[0.0, np.cumsum(w * xc * xc)],
+    )
+
+    custo = _custos(prefixos, np.zeros(n, dtype=np.int64), np.arange(n))
+    cortes = np.zeros((k, n), dtype=np.int64)
+
+    for q in range(1, k):
+        anterior = custo
+        custo = np.full(n, np.inf)
+        # Cada tarefa: linhas i em [i0, i1] com corte ótimo j procurado em [j0, j1]
+        tarefas = np.array([[q, n - 1, q, n - 1]], dtype=np.int64)
+        while len(tarefas):
+            i0, i1, j0, j1 = tarefas.T
+            meio = (i0 + i1) // 2
+            fim_j = np.minimum(j1, meio)
+            tamanhos = fim_j - j0 + 1
+            inicios = np.r_[0, np.cumsum(tamanhos)[:-1]]
+            j = np.arange(tamanhos.sum()) - np.repeat(inicios - j0, tamanhos)
+            valores_dp = anterior[j - 1] + _custos(prefixos, j, meio, tamanhos)
+
+            relativo, minimos = _argmin_por_segmento(valores_dp, inicios, tamanhos)
+            melhor = j0 + relativo
+            custo[meio] = minimos
+            cortes[q, meio] = melhor
+
+            esquerda = np.column_stack([i0, meio - 1, j0, melhor])
+            direita = np.column_stack([meio + 1, i1, melhor, j1])
+            tarefas = np.concatenate([esquerda, direita])
+            tarefas = tarefas[tarefas[:, 0] <= tarefas[:, 1]]
+
+    # Reconstrução dos cortes a partir do último elemento
+    limites = []
+    fim = n - 1
+    for q in range(k - 1, 0, -1):
+        inicio = cortes[q, fim]
+        limites.append(x[inicio - 1])
+        fim = inicio - 1
+    return np.array(limites[::-1])
+
+
+def _rotulos_1d(limites, valores):
+    return np.searchsorted(limites, np.asarray(valores, dtype=np.float64), side="left")
+
+
+def _ajustar_gasto(clientes, k):
+    # Clientes com o mesmo gasto entram uma vez, com peso: o DP roda sobre os valores únicos
+    unicos, contagem = np.unique(clientes["total_gasto"].to_numpy(dtype=np.float64), return_counts=True)
+    return {"modo": "gasto", "limites": limites_otimos_1d(unicos, k, pesos=contagem)}
+
+
+def caracteristicas_rfm(clientes, referencia):
+    recencia = (pd.Timestamp(referencia) - clientes["ULTIMA_COMPRA"]).dt.days.to_numpy(dtype=np.float64)
+    frequencia = np.log1p(clientes["N_VENDAS"].to_numpy(dtype=np.float64))
+    monetario = np.log1p(clientes["total_gasto"].to_numpy(dtype=np.float64))
+    return np.column_stack([recencia, frequencia, monetario])
+
+
+def _ajustar_rfm(clientes, k, referencia):
+    from sklearn.cluster import MiniBatchKMeans
+
+    compradores = clientes[clientes["N_VENDAS"] > 0]
+    if compradores.empty:
+        return {"modo": "rfm", "modelo": None}
+    x = caracteristicas_rfm(compradores, referencia)
+    media, desvio = x.mean(axis=0), x.std(axis=0)
+    desvio[desvio == 0] = 1.0
+    modelo = MiniBatchKMeans(
+        n_clusters=min(k, len(compradores)),
+        batch_size=4096,
+        n_init=3,
+        random_state=42,
+    ).fit((x - media) / desvio)
+
+    # Renumera os grupos pelo valor monetário médio, como no modo de gasto
+    ordem = np.argsort(modelo.cluster_centers_[:, 2])
+    renumeracao = np.empty_like(ordem)
+    renumeracao[ordem] = np.arange(len(ordem))
+    return {
+        "modo": "rfm",
+        "modelo": modelo,
+        "media": media,
+        "desvio": desvio,
+        "renumeracao": renumeracao,
+        "referencia": pd.Timestamp(referencia),
+    }
+
+
+def atribuir(modelo, clientes):
+    """Rótulos dos clientes segundo um modelo já ajustado (-1 = sem compras no modo RFM)."""
+    if modelo["modo"] == "gasto":
+        return _rotulos_1d(modelo["limites"], clientes["total_gasto"])
+    rotulos = np.full(len(clientes), -1, dtype=np.int64)
+    compradores = (clientes["N_VENDAS"] > 0).to_numpy()
+    if compradores.any() and modelo["modelo"] is not None:
+        x = caracteristicas_rfm(clientes[compradores], modelo["referencia"])
+        previstos = modelo["modelo"].predict((x - modelo["media"]) / modelo["desvio"])
+        rotulos[compradores] = modelo["renumeracao"][previstos]
+    return rotulos
+
+
+def ajustar(clientes, modo="gasto", k=3, referencia=None):
+    """Ajusta o modelo de segmentação.
+
+    ``clientes`` precisa de ``total_gasto`` e, no modo RFM, de ``N_VENDAS`` e
+    ``ULTIMA_COMPRA``. ``referencia`` é a data usada para a recência (padrão: a última compra).
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de segmentação desconhecido: {modo!r}")
+    if modo == "gasto":
+        return _ajustar_gasto(clientes, k)
+    if referencia is None:
+        referencia = clientes["ULTIMA_COMPRA"].max()
+    return _ajustar_rfm(clientes, k, referencia)
+
+
+@instrumentacao.medido("segmentação")
+def segmentar(clientes, modo="gasto", k=3, chave=None):
+    """Rótulos dos clientes, reaproveitando o modelo ajustado para a mesma ``chave``.
+
+    A chave deve identificar os dados de entrada (versão dos dados e filtros); a versão de
+    VENDAS é acrescentada automaticamente.
+    """
+    chave = (dados.versao_tabela("VENDAS"), chave, modo, k)
+    with _trava:
+        modelo = _modelos.get(chave)
+        if modelo is not None:
+            _modelos.move_to_end(chave)
+    if modelo is None:
+        modelo = ajustar(clientes, modo, k)
+        with _trava:
+            _modelos[chave] = modelo
+            while len(_modelos) > LIMITE_MODELOS:
+                _modelos.popitem(last=False)
+    return atribuir(modelo, clientes)
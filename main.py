@@ -1,16 +1,23 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 
+from core import aquecimento, atualizacao, instrumentacao
+from core.filtros import barra_lateral
+
 # Configuração da página
 st.set_page_config(page_title="DrivaTech Dashboard", layout="wide", page_icon="📊")
 
+# Dados novos em data/ são preparados em segundo plano (veja core/atualizacao.py) e, num
+# processo novo, dados, modelos e arquivos estáticos são carregados antes de serem pedidos
+atualizacao.iniciar()
+aquecimento.iniciar()
+
 # Cabeçalho
 st.sidebar.image("assets/images/logo2.jpg", width=250)
 
-# Aplicar estilos de CSS à página (se houver)
+# Aplicar estilos de CSS à página (se houver); o arquivo só é relido quando muda
 try:
-    with open("static/styles.css") as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(f'<style>{aquecimento.estatico("static/styles.css")}</style>', unsafe_allow_html=True)
 except FileNotFoundError:
     st.warning("Arquivo de estilo CSS não encontrado!")
 
@@ -27,22 +34,38 @@ with st.sidebar:
         orientation="vertical",
     )
 
-# Navegação entre as páginas
-if selected == "Home":
-    from pages.nav.home import run
-    run()
-elif selected == "Vendas por Região":
-    from pages.nav.vendas_regiao import run
-    run()
-elif selected == "Desempenho de Vendas por Filial":
-    from pages.nav.desempenho_produtos import run
-    run()
-elif selected == "Segmentação de Clientes":
-    from pages.nav.segmentacao_clientes import run
-    run()
-elif selected == "Análise de Dados de Clientes":
-    from pages.nav.analise_dados import run
-    run()
-elif selected == "Previsão das vendas" :
-    from pages.nav.previsao import run
-    run()
+# Aviso de dados novos publicados depois deste rerun
+with st.sidebar:
+    atualizacao.aviso()
+
+# Cada rerun é medido por etapa (veja core/instrumentacao.py)
+with instrumentacao.execucao(selected) as execucao:
+    # Filtros de período, filial e UF válidos para todas as páginas
+    with instrumentacao.etapa("filtros (barra lateral)"):
+        barra_lateral()
+
+    # Navegação entre as páginas
+    if selected == "Home":
+        from pages.nav.home import run
+        run()
+    elif selected == "Vendas por Região":
+        from pages.nav.vendas_regiao import run
+        run()
+    elif selected == "Desempenho de Vendas por Filial":
+        from pages.nav.desempenho_produtos import run
+        run()
+    elif selected == "Segmentação de Clientes":
+        from pages.nav.segmentacao_clientes import run
+        run()
+    elif selected == "Análise de Dados de Clientes":
+        from pages.nav.analise_dados import run
+        run()
+    elif selected == "Previsão das vendas" :
+        from pages.nav.previsao import run
+        run()
+
+# Painel opcional com o tempo, a CPU e a memória de cada etapa deste rerun
+instrumentacao.painel(execucao)
+
+# Tempo até o primeiro render do processo, comparado com a meta (veja core/aquecimento.py)
+aquecimento.registrar_render()
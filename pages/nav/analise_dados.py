@@ -1,33 +1,44 @@
 import streamlit as st
-import pandas as pd
+
+from core import paineis
+from core.filtros import filtros_atuais
 
 def run():
     st.title("🔍 Processamento e Análise de Dados de Clientes")
 
     # Carregando os dados
     st.header("Carregando os Dados")
-    clientes = pd.read_csv('data/CLIENTES.csv', delimiter=';')
+    resultado = paineis.obter("analise_dados", filtros_atuais())
+    tabelas = resultado['tabelas']
+    valores = resultado['valores']
     st.write("Dados brutos carregados:")
-    st.dataframe(clientes.head())
+    st.dataframe(tabelas['amostra'])
 
     # Não há tratamento de idade e renda, então ajustamos a análise com base em cidade e estado (UF)
     st.header("Análise Exploratória")
 
-    # Exibindo a contagem de clientes por cidade
+    # Exibindo a contagem de clientes por cidade (as maiores e o restante em "Outros")
     st.subheader("Distribuição de Clientes por Cidade")
-    distribuicao_cidade = clientes['CIDADE'].value_counts()
-    st.bar_chart(distribuicao_cidade)
+    st.bar_chart(tabelas['distribuicao_cidade'])
+    if valores.get('aproximado'):
+        st.caption(f"Top {valores['topo']} cidades com contagem aproximada (space-saving) entre "
+                   f"{valores['n_clientes']:,} clientes. O resumo abaixo traz o mínimo e o máximo de clientes "
+                   "de cada cidade e de \"Outros (aprox.)\"; clientes com vendas e receita das cidades são "
+                   "valores mínimos.")
+    elif valores.get('n_cidades'):
+        st.caption(f"Top {min(valores['topo'], valores['n_cidades'])} de {valores['n_cidades']} cidades.")
+
+    # Clientes, clientes com vendas e receita por cidade
+    st.subheader("Resumo por Cidade")
+    st.dataframe(tabelas['resumo_cidade'])
 
     # Exibindo a contagem de clientes por estado (UF)
     st.subheader("Distribuição de Clientes por Estado (UF)")
-    distribuicao_uf = clientes['UF'].value_counts()
-    st.bar_chart(distribuicao_uf)
+    st.bar_chart(tabelas['distribuicao_uf'])
 
     # Agrupamento e resumo dos dados por UF
     st.subheader("Resumo por Estado (UF)")
-    resumo_uf = clientes.groupby('UF').agg({'ID_CLIENTE': 'count'})
-    resumo_uf.columns = ['Nº de Clientes']
-    st.dataframe(resumo_uf)
+    st.dataframe(tabelas['resumo_uf'])
 
     # Conclusão
     st.header("📊 Conclusão")
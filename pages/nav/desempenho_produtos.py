@@ -1,34 +1,19 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+
+from core import paineis
+from core.filtros import filtros_atuais
 
 def run():
     st.title("📦 Desempenho de Vendas por Filial")
 
-    # Carregando os dados
-    vendas = pd.read_csv('data/VENDAS.csv', delimiter=';')
-    filiais = pd.read_csv('data/FILIAIS.csv', delimiter=';')
-
-    # Limpeza dos dados
-    vendas['VALOR_VENDA'] = vendas['VALOR_VENDA'].astype(str).str.replace('.', '').str.replace(',', '.').astype(float)
-    vendas = vendas.drop_duplicates()
-
-    # Agrupando vendas por filial
-    vendas_por_filial = vendas.groupby('ID_FILIAL')['VALOR_VENDA'].sum().reset_index()
-    vendas_por_filial = vendas_por_filial.merge(filiais[['ID_FILIAL', 'NOME_FILIAL']], on='ID_FILIAL')
+    # Vendas por filial calculadas fora da página (ou pré-calculadas por precomputar.py)
+    resultado = paineis.obter("desempenho_produtos", filtros_atuais())
 
     # ---- Gráfico: Vendas por Filial ----
     st.subheader("Total de Vendas por Filial")
     st.markdown("""O gráfico abaixo mostra o total de vendas por filial. Ele é útil para visualizar rapidamente quais filiais estão se destacando.""")
 
-    # Criando o gráfico de barras com Plotly
-    fig = px.bar(vendas_por_filial, x='NOME_FILIAL', y='VALOR_VENDA',
-                 title='Total de Vendas por Filial',
-                 labels={'VALOR_VENDA': 'Valor Total das Vendas (R$)', 'NOME_FILIAL': 'Filial'},
-                 color='VALOR_VENDA',
-                 color_continuous_scale=px.colors.sequential.Plasma)  # Usando uma paleta de cores
-
-    st.plotly_chart(fig)
+    st.plotly_chart(resultado['figuras']['filiais'])
 
     # Análise do desempenho de produtos por filial
     st.markdown(
@@ -1,7 +1,8 @@
 import streamlit as st
-import json
 from streamlit_lottie import st_lottie
 
+from core import aquecimento
+
 def run():
     st.title("📊 Análise de Dados - DrivaTech")
 
@@ -9,12 +10,9 @@ def run():
     # Colunas que organizam a página
     col1, col2 = st.columns(2)
 
-    # Carregando animações
-    with open("assets/pagina_inicial1.json") as source:
-        animacao_1 = json.load(source)
-
-    with open("assets/animation1.json") as source:
-        animacao_2 = json.load(source)
+    # Carregando animações (lidas do disco só na primeira vez ou quando mudam)
+    animacao_1 = aquecimento.estatico("assets/pagina_inicial1.json", "json")
+    animacao_2 = aquecimento.estatico("assets/animation1.json", "json")
 
     # Conteúdo a ser exibido na coluna 1
     with col1:
@@ -1,88 +1,73 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import Ridge
-import plotly.graph_objs as go
 
-def run():
-    st.title("📊 Previsão de Vendas")
-
-    # Carregando os dados
-    vendas = pd.read_csv('data/VENDAS.csv', delimiter=';')
-    filiais = pd.read_csv('data/FILIAIS.csv', delimiter=';')
-
-    # Limpeza dos dados
-    vendas['VALOR_VENDA'] = vendas['VALOR_VENDA'].astype(str).str.replace('.', '').str.replace(',', '.').astype(float)
-    vendas['DATA_VENDA'] = pd.to_datetime(vendas['DATA_VENDA'], format='%d/%m/%Y')
+from core import hierarquia, instrumentacao, paineis
+from core.filtros import filtros_atuais
 
-    # Extraindo características (features)
-    vendas['MÊS'] = vendas['DATA_VENDA'].dt.month
-    vendas['ANO'] = vendas['DATA_VENDA'].dt.year
-    vendas_filiais = vendas.merge(filiais, on='ID_FILIAL')
+@instrumentacao.fragmento("Previsão das vendas: nível")
+def grafico_nivel(hierarquico):
+    nivel = st.selectbox("Nível", options=['Total', 'UF', 'Filial'])
+    st.plotly_chart(hierarquico['figuras'][nivel])
 
-    # Agrupando os dados para treinamento
-    vendas_por_mes = vendas_filiais.groupby(['MÊS', 'ANO'])['VALOR_VENDA'].sum().reset_index()
 
-    # Criação de variáveis dummy para os meses
-    vendas_por_mes = pd.get_dummies(vendas_por_mes, columns=['MÊS'], drop_first=True)
+@instrumentacao.fragmento("Previsão das vendas: hierárquica")
+def previsao_hierarquica(filtros):
+    coluna1, coluna2 = st.columns(2)
+    frequencia = coluna1.radio("Granularidade", options=list(hierarquia.FREQUENCIAS),
+                               format_func=hierarquia.FREQUENCIAS.get, index=1, horizontal=True)
+    horizonte = coluna2.slider("Períodos à frente", 4, 52, 12)
 
-    # Preparação dos dados para o modelo
-    X = vendas_por_mes.drop(columns=['VALOR_VENDA'])
-    y = vendas_por_mes['VALOR_VENDA']
+    hierarquico = paineis.obter("previsao_hierarquica", filtros, frequencia=frequencia, horizonte=horizonte)
+    if hierarquico['valores'].get('periodos_insuficientes'):
+        st.warning("Não há períodos suficientes para a previsão por filial e UF.")
+    else:
+        # Trocar o nível só redesenha o gráfico (figuras já calculadas para os três níveis)
+        grafico_nivel(hierarquico)
+        st.caption(f"{hierarquico['valores']['series']} séries ajustadas e reconciliadas em {hierarquico['valores']['tempo_s']:.2f} s.")
+        with st.expander("Tabela de previsões e erro por série"):
+            st.dataframe(hierarquico['tabelas']['previsoes'])
+            st.dataframe(hierarquico['tabelas']['metricas'])
 
-    # Divisão dos dados
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Criação e treinamento do modelo com regularização
-    model = Ridge(alpha=1.0)
-    model.fit(X_train, y_train)
-
-    # Previsões para os dados de teste
-    y_pred = model.predict(X_test)
+def run():
+    st.title("📊 Previsão de Vendas")
 
-    # Avaliação
-    rmse = np.sqrt(np.mean((y_pred - y_test) ** 2))
+    # Modelo treinado em segundo plano e persistido por versão dos dados e hiperparâmetros;
+    # enquanto uma nova versão treina, a página mostra a última previsão concluída
+    filtros = filtros_atuais()
+    resultado = paineis.obter("previsao_vendas", filtros)
+    valores = resultado['valores']
+    if valores.get('meses_insuficientes'):
+        st.warning("Não há meses suficientes no período selecionado para treinar o modelo.")
+        return
+    if valores.get('treinando'):
+        st.info("O modelo de previsão está sendo treinado. Atualize a página em instantes.")
+        st.button("Atualizar")
+        return
+    if not valores['atual']:
+        st.info("Os dados mudaram: o modelo está sendo retreinado e esta é a última previsão concluída.")
+
+    rmse = valores['rmse']
     st.write(f"RMSE: {rmse:.2f}")
 
     # Gráfico interativo para dados de teste
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=y_test.index, y=y_test, mode='lines+markers', name='Vendas Reais', line=dict(color='blue')))
-    fig.add_trace(go.Scatter(x=y_test.index, y=y_pred, mode='lines+markers', name='Vendas Previstas', line=dict(color='red')))
-    fig.update_layout(title="Comparação entre Vendas Reais e Previstas", xaxis_title="Índice", yaxis_title="Valor das Vendas (R$)")
-    st.plotly_chart(fig)
-
-    # Previsão para os próximos anos até 2029
-    future_years = np.arange(2023, 2030)  # de 2023 a 2029
-    future_months = np.tile(np.arange(1, 13), len(future_years))
-    future_years_expanded = np.repeat(future_years, 12)
+    st.plotly_chart(resultado['figuras']['teste'])
 
-    future_data = pd.DataFrame({'MÊS': future_months, 'ANO': future_years_expanded})
-
-    # Criação de variáveis dummy para os meses futuros
-    future_data = pd.get_dummies(future_data, columns=['MÊS'], drop_first=True)
-
-    # Adicionando colunas faltantes para garantir que o DataFrame futuro tenha a mesma estrutura que o DataFrame de treinamento
-    for col in X.columns:
-        if col not in future_data.columns:
-            future_data[col] = 0  # Adiciona coluna com zero se não estiver presente
-
-    # Realizando previsões futuras
-    future_predictions = model.predict(future_data[X.columns])  # Alinhando com as colunas do modelo
-
-    # Ajuste para evitar valores negativos
-    future_predictions = np.maximum(future_predictions, 0)  # garante que não haja valores negativos
-
-    # Gráfico interativo para previsões futuras
-    future_fig = go.Figure()
-    future_fig.add_trace(go.Scatter(x=future_data.index, y=future_predictions, mode='lines+markers', name='Previsões Futuras', line=dict(color='green')))
-    future_fig.update_layout(title="Previsões de Vendas até 2029", xaxis_title="Índice", yaxis_title="Valor das Vendas (R$)")
-    st.plotly_chart(future_fig)
+    # Gráfico interativo para previsões futuras (até 2029)
+    st.plotly_chart(resultado['figuras']['futuro'])
 
     # Exibir previsões em tabela
-    future_data['VALOR_VENDA_PREVISTA'] = future_predictions
     st.subheader("📈 Tabela de Previsões de Vendas para os próximos 6 anos")
-    st.dataframe(future_data)
+    st.dataframe(resultado['tabelas']['futuro'])
+
+    # Tempo de treino e métricas de cada versão do modelo desta série
+    with st.expander("Versões do modelo"):
+        st.caption(f"Versão exibida: {valores['versao']} (treinada em {valores['treino_s'] * 1000:.1f} ms)")
+        st.dataframe(resultado['tabelas']['versoes'])
+
+    # ---- Previsão hierárquica: total, UF e filial ----
+    # Em fragmentos: granularidade, horizonte e nível não refazem a previsão mensal acima
+    st.subheader("🏬 Previsão por Filial e UF")
+    previsao_hierarquica(filtros)
 
     # Comentários e Análise
 
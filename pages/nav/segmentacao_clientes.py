@@ -1,50 +1,43 @@
-import pandas as pd
-from sklearn.cluster import KMeans
 import streamlit as st
-import plotly.express as px
 
-def run():
-    st.title("👥 Segmentação de Clientes")
-
-    # Carregando os dados
-    vendas = pd.read_csv('data/VENDAS.csv', delimiter=';')
-    clientes = pd.read_csv('data/CLIENTES.csv', delimiter=';')
+from core import instrumentacao, paineis, segmentacao
+from core.filtros import filtros_atuais
+
+@instrumentacao.fragmento("Segmentação de Clientes: dispersão")
+def dispersao(filtros, modo, resultado):
+    # Muitos clientes: um intervalo de IDs funciona como zoom da dispersão
+    valores = resultado['valores']
+    if valores['zoom']:
+        menor, maior = valores['ids']
+        intervalo = st.slider("Intervalo de clientes (zoom)", menor, maior, (menor, maior))
+        if tuple(intervalo) != (menor, maior):
+            resultado = paineis.obter("segmentacao_clientes", filtros, modo=modo, intervalo=intervalo)
+    if resultado['valores']['agrupado']:
+        st.caption("Clientes agrupados por proximidade (o tamanho indica a quantidade). Reduza o intervalo para ver cada cliente.")
 
-    # Convertendo o valor das vendas
-    vendas['VALOR_VENDA'] = vendas['VALOR_VENDA'].str.replace('.', '').str.replace(',', '.').astype(float)
-
-    # Agrupando vendas por cliente
-    total_gasto = vendas.groupby('ID_CLIENTE')['VALOR_VENDA'].sum().reset_index()
-    total_gasto.columns = ['ID_CLIENTE', 'total_gasto']
+    # Exibindo o gráfico
+    st.plotly_chart(resultado['figuras']['dispersao'])
 
-    # Juntando dados de clientes com o total gasto
-    clientes_completo = clientes.merge(total_gasto, on='ID_CLIENTE', how='left').fillna(0)
 
-    # Exibindo os dados
-    st.write(clientes_completo)
+def run():
+    st.title("👥 Segmentação de Clientes")
 
-    # Segmentação com K-Means
-    kmeans = KMeans(n_clusters=3, random_state=42)
-    clientes_completo['cluster'] = kmeans.fit_predict(clientes_completo[['total_gasto']])
+    modo = st.radio(
+        "Critério de segmentação",
+        options=segmentacao.MODOS,
+        format_func={'gasto': 'Total gasto (agrupamento ótimo)', 'rfm': 'RFM (recência, frequência e valor)'}.get,
+        horizontal=True,
+    )
 
-    # Cores mais suaves para os clusters
-    color_map = {0: 'lightblue', 1: 'lightgreen', 2: 'lightcoral'}
-    clientes_completo['cluster_color'] = clientes_completo['cluster'].map(color_map)
+    # Clientes segmentados e gráfico calculados fora da página (ou pré-calculados por precomputar.py)
+    filtros = filtros_atuais()
+    resultado = paineis.obter("segmentacao_clientes", filtros, modo=modo)
 
-    # Plotando os clusters com Plotly para gráficos mais interativos
-    fig = px.scatter(
-        clientes_completo, 
-        x='ID_CLIENTE', 
-        y='total_gasto', 
-        color='cluster', 
-        color_discrete_map=color_map,
-        title='Segmentação de Clientes por Total Gasto',
-        labels={'ID_CLIENTE': 'ID do Cliente', 'total_gasto': 'Total Gasto (R$)'},
-        template='plotly_dark'
-    )
+    # Exibindo os dados
+    st.write(resultado['tabelas']['clientes'])
 
-    # Exibindo o gráfico
-    st.plotly_chart(fig)
+    # Dispersão em um fragmento: o zoom não refaz a tabela nem o resto da página
+    dispersao(filtros, modo, resultado)
 
     # Adicionando a legenda personalizada abaixo do gráfico com quadrados coloridos
     st.markdown(
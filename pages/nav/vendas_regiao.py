@@ -1,35 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+
+from core import paineis
+from core.filtros import filtros_atuais
 
 def run():
     st.title("📍 Vendas por Região")
 
-    # Carregando os dados
-    vendas = pd.read_csv('data/VENDAS.csv', delimiter=';')
-    filiais = pd.read_csv('data/FILIAIS.csv', delimiter=';')
-
-    # Limpeza dos dados
-    vendas['VALOR_VENDA'] = vendas['VALOR_VENDA'].astype(str).str.replace('.', '').str.replace(',', '.').astype(float)
-    vendas = vendas.drop_duplicates()
-    vendas['DATA_VENDA'] = pd.to_datetime(vendas['DATA_VENDA'], format='%d/%m/%Y')
-
-    # Mesclando vendas com filiais
-    vendas_filiais = vendas.merge(filiais, on='ID_FILIAL')
-
-    # Agrupando vendas por UF
-    vendas_por_uf = vendas_filiais.groupby('UF')['VALOR_VENDA'].sum().reset_index()
-
-  
+    # Tabelas e gráficos calculados fora da página (ou pré-calculados por precomputar.py)
+    resultado = paineis.obter("vendas_regiao", filtros_atuais())
 
     # Criando o gráfico de barras
     st.subheader('Vendas por UF')
-    fig1 = px.bar(vendas_por_uf, x='UF', y='VALOR_VENDA',
-                  labels={'VALOR_VENDA': 'Valor das Vendas (R$)', 'UF': 'UF'},
-                  color='VALOR_VENDA',
-                  color_continuous_scale=px.colors.qualitative.Plotly)  # Usando a paleta Plotly
-
-    st.plotly_chart(fig1)
+    st.plotly_chart(resultado['figuras']['uf'])
 
         # ---- Gráfico 1: Vendas por UF ----
     st.title("Vendas por Unidade Federativa (UF)")
@@ -56,15 +38,12 @@ def run():
 
     # ---- Gráfico 2: Vendas ao Longo do Tempo por UF ----
 
-    vendas_por_data_uf = vendas_filiais.groupby(['DATA_VENDA', 'UF'])['VALOR_VENDA'].sum().reset_index()
-
     # Criando o gráfico de linha
     st.title("Vendas ao Longo do Tempo por UF")
-    fig2 = px.line(vendas_por_data_uf, x='DATA_VENDA', y='VALOR_VENDA', color='UF',
-                   labels={'VALOR_VENDA': 'Valor Total das Vendas (R$)', 'DATA_VENDA': 'Data da Venda'},
-                   markers=True)
-
-    st.plotly_chart(fig2)
+    st.plotly_chart(resultado['figuras']['tempo'])
+    valores = resultado['valores']
+    if valores['pontos_exibidos'] < valores['pontos_total']:
+        st.caption(f"Exibindo {valores['pontos_exibidos']} de {valores['pontos_total']} pontos. Restrinja o período na barra lateral para ver a resolução completa.")
 
         # ---- Análise do desempenho de vendas por UF ----
     st.markdown(
@@ -0,0 +1,62 @@
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core import agregados, artefatos, dados, indice, paineis
+from core.indice import filtros_vazios
+
+# Pré-calcula as tabelas e as figuras de todas as páginas (sem filtros) para a versão atual
+# dos dados, em paralelo, e publica os artefatos de uma vez em data/artefatos/.
+# Feito em lote (por exemplo, todas as noites), o primeiro acesso ao dashboard não precisa
+# calcular nada.
+# Uso: python precomputar.py [--processos N]
+
+
+def _calcular(pagina, opcoes, temporario):
+    inicio = time.perf_counter()
+    nome = artefatos.nome_artefato(pagina, opcoes)
+    if pagina == "previsao_vendas":
+        # Em lote, o treino do modelo é aguardado em vez de cair na última versão concluída
+        opcoes = dict(opcoes, espera=None)
+    artefatos.gravar_artefato(temporario, nome, paineis.CALCULOS[pagina](filtros_vazios(), **opcoes))
+    return nome, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula os artefatos das páginas do dashboard")
+    parser.add_argument("--destino", default=artefatos.DIRETORIO_ARTEFATOS)
+    parser.add_argument("--processos", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    versao = dados.versao_dados()
+    # Agregados e índice ficam em dia antes de criar os processos, que os herdam prontos
+    # (e não disputam a gravação de data/agregados)
+    agregados.obter_agregados()
+    indice.obter_indice()
+
+    temporario = f"{args.destino}.tmp-{os.getpid()}"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    with ProcessPoolExecutor(max_workers=args.processos) as pool:
+        tarefas = [pool.submit(_calcular, pagina, opcoes, temporario) for pagina, opcoes in paineis.PRECALCULADOS]
+        tempos = dict(tarefa.result() for tarefa in tarefas)
+
+    if dados.versao_dados() != versao:
+        # Os dados mudaram durante o cálculo: os artefatos já nasceriam desatualizados
+        raise SystemExit("Os dados mudaram durante o pré-cálculo; execute novamente.")
+    artefatos.publicar(temporario, {
+        "versao_dados": versao,
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "artefatos": tempos,
+    }, args.destino)
+
+    for nome, segundos in tempos.items():
+        print(f"{nome:45} {segundos:7.2f} s")
+    print(f"{len(tempos)} artefatos publicados em {args.destino} ({time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
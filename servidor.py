@@ -0,0 +1,21 @@
+import sys
+
+from streamlit.web import cli
+
+from core import aquecimento, atualizacao
+
+# Sobe o dashboard com o aquecimento (core/aquecimento.py) já em andamento no mesmo
+# processo: enquanto o servidor do Streamlit inicia e o pod fica pronto, dados, modelos e
+# arquivos estáticos são carregados, e o primeiro usuário não paga a partida a frio.
+# Uso: python servidor.py [opções do "streamlit run", por exemplo --server.port 8501]
+
+
+def main():
+    atualizacao.iniciar()
+    aquecimento.iniciar()
+    sys.argv = ["streamlit", "run", "main.py", *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do dashboard são importados a partir da raiz do repositório (core/, pages/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import agregados
+
+
+def _vendas(ids, semente=0):
+    rng = np.random.default_rng(semente)
+    ids = np.asarray(ids, dtype=np.int64)
+    return pd.DataFrame({
+        "ID_VENDA": ids,
+        "DATA_VENDA": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, len(ids)), unit="D"),
+        "ID_FILIAL": rng.integers(1, 6, len(ids)).astype(np.int32),
+        "ID_CLIENTE": rng.integers(1, 200, len(ids)).astype(np.int32),
+        "VALOR_VENDA_CENTAVOS": rng.integers(100, 100_000, len(ids)).astype(np.int64),
+    })
+
+
+def _completo(vendas, fonte):
+    return agregados.sincronizar(agregados.agregados_vazios(), vendas, fonte)
+
+
+def _iguais(a, b):
+    for nome, chaves in (("diario", ["DATA_VENDA", "ID_FILIAL"]), ("clientes", ["ID_CLIENTE"]),
+                         ("pares", ["ID_FILIAL", "ID_CLIENTE"])):
+        pd.testing.assert_frame_equal(
+            a[nome].sort_values(chaves, ignore_index=True), b[nome].sort_values(chaves, ignore_index=True),
+            check_dtype=False,
+        )
+    for chave in ("marca_dagua", "linhas", "assinatura", "rejeitadas", "fonte"):
+        assert a[chave] == b[chave], chave
+
+
+@pytest.fixture
+def contar_assinaturas(monkeypatch):
+    linhas = []
+    original = agregados.assinatura
+
+    def contada(vendas):
+        linhas.append(len(vendas))
+        return original(vendas)
+
+    monkeypatch.setattr(agregados, "assinatura", contada)
+    return linhas
+
+
+def test_assinatura_soma_das_partes_e_independe_da_ordem():
+    vendas = _vendas(range(1, 1001))
+    total = agregados.assinatura(vendas)
+    assert total == agregados._somar_assinaturas(agregados.assinatura(vendas[:300]), agregados.assinatura(vendas[300:]))
+    assert total == agregados.assinatura(vendas.sample(frac=1, random_state=1))
+    assert total == agregados.assinatura(vendas.astype({"ID_FILIAL": np.int8, "ID_CLIENTE": np.int16}))
+
+
+@pytest.mark.parametrize("acrescida", [False, True])
+def test_sincronizar_apos_acrescimo_igual_ao_completo(acrescida):
+    vendas = _vendas(range(1, 2001))
+    inicial = _completo(vendas[:1500], ["csv", 1, 100])
+    incremental = agregados.sincronizar(inicial, vendas, ["csv", 2, 200], acrescida=acrescida)
+    _iguais(incremental, _completo(vendas, ["csv", 2, 200]))
+
+
+def test_acrescimo_nao_reconfere_o_historico(contar_assinaturas):
+    vendas = _vendas(range(1, 2001))
+    inicial = _completo(vendas[:1500], None)
+    contar_assinaturas.clear()
+    agregados.sincronizar(inicial, vendas, ["csv", 2, 200], acrescida=True)
+    # Só as 500 vendas novas são hasheadas, e não as 1500 já processadas
+    assert contar_assinaturas == [500]
+
+    contar_assinaturas.clear()
+    agregados.sincronizar(inicial, vendas, ["csv", 2, 200], acrescida=False)
+    assert sorted(contar_assinaturas) == [500, 1500]
+
+
+def test_rejeita_duplicatas():
+    vendas = _vendas(range(1, 1001))
+    repetidas = _vendas([10, 20, 20, 1001], semente=1)
+    fonte = pd.concat([vendas, repetidas], ignore_index=True)
+    resultado = agregados.sincronizar(agregados.agregados_vazios(), fonte, None, descartadas=5)
+    # 10 e os dois 20 repetem IDs já vistos; 1001 é novo
+    assert resultado["linhas"] == 1001
+    assert resultado["rejeitadas"] == 5 + 3
+    # A primeira ocorrência de cada ID é a que conta
+    esperado = _completo(pd.concat([vendas, repetidas.tail(1)], ignore_index=True), None)
+    _iguais(dict(resultado, rejeitadas=0), esperado)
+
+
+def test_rejeita_duplicatas_em_fluxo_como_em_memoria():
+    vendas = pd.concat([_vendas(range(1, 1001)), _vendas([5, 999, 1001, 1001], semente=2)], ignore_index=True)
+    em_memoria = agregados.sincronizar(agregados.agregados_vazios(), vendas, None)
+    em_fluxo = agregados.sincronizar_em_fluxo(
+        agregados.agregados_vazios(), lambda: (vendas[i:i + 300] for i in range(0, len(vendas), 300)), None
+    )
+    assert em_fluxo["rejeitadas"] == em_memoria["rejeitadas"] == 3
+    _iguais(em_fluxo, em_memoria)
+
+
+def test_refaz_apos_edicao_de_venda_antiga():
+    vendas = _vendas(range(1, 2001))
+    inicial = _completo(vendas, ["csv", 1, 100])
+    editadas = vendas.copy()
+    editadas.loc[10, "VALOR_VENDA_CENTAVOS"] += 1
+    editadas = pd.concat([editadas, _vendas(range(2001, 2101), semente=3)], ignore_index=True)
+    _iguais(agregados.sincronizar(inicial, editadas, ["csv", 2, 200]), _completo(editadas, ["csv", 2, 200]))
+
+
+def test_refaz_apos_remocao_de_venda_antiga():
+    vendas = _vendas(range(1, 2001))
+    inicial = _completo(vendas, ["csv", 1, 100])
+    # A contagem muda, então a remoção é vista mesmo com a fonte marcada como acréscimo
+    removidas = vendas.drop(index=10)
+    _iguais(agregados.sincronizar(inicial, removidas, ["csv", 2, 200], acrescida=True),
+            _completo(removidas, ["csv", 2, 200]))
+
+
+def test_refaz_apos_edicao_em_fluxo():
+    vendas = _vendas(range(1, 2001))
+    inicial = _completo(vendas, None)
+    editadas = vendas.copy()
+    editadas.loc[1999, "ID_CLIENTE"] = 7
+
+    def lotes():
+        return (editadas[i:i + 700] for i in range(0, len(editadas), 700))
+
+    _iguais(agregados.sincronizar_em_fluxo(inicial, lotes, ["csv", 2]), _completo(editadas, ["csv", 2]))
+
+
+def test_salvar_e_carregar(tmp_path):
+    resultado = _completo(_vendas(range(1, 501)), ["csv", 1, 100])
+    agregados.salvar(resultado, str(tmp_path / "agregados"))
+    _iguais(agregados.carregar(str(tmp_path / "agregados")), resultado)
+    assert agregados.carregar(str(tmp_path / "outro")) is None
+
+
+def test_so_acrescentou_segue_a_cadeia_de_acrescimos():
+    from core import dados
+
+    dados.registrar_acrescimo("VENDAS", ("csv", 1, 100), ("csv", 2, 150))
+    dados.registrar_acrescimo("VENDAS", ("csv", 2, 150), ("csv", 3, 180))
+    # O estado salvo em JSON traz a versão como lista
+    assert dados.so_acrescentou("VENDAS", ["csv", 1, 100], ("csv", 3, 180))
+    assert not dados.so_acrescentou("VENDAS", ("csv", 9, 100), ("csv", 3, 180))
+    assert not dados.so_acrescentou("CLIENTES", ("csv", 1, 100), ("csv", 2, 150))
+    assert not dados.so_acrescentou("VENDAS", None, ("csv", 2, 150))
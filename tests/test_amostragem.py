@@ -0,0 +1,81 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from core.amostragem import lttb, reduzir_serie
+
+
+def _serie(n, semente=0):
+    rng = np.random.default_rng(semente)
+    return np.arange(n, dtype=np.float64), rng.normal(size=n).cumsum()
+
+
+def test_lttb_orcamento_e_extremos():
+    x, y = _serie(10_000)
+    escolhidos = lttb(x, y, 500)
+    assert len(escolhidos) == 500
+    assert escolhidos[0] == 0 and escolhidos[-1] == len(x) - 1
+    # Um ponto por balde, em ordem
+    assert (np.diff(escolhidos) > 0).all()
+
+
+def test_lttb_abaixo_do_orcamento_mantem_tudo():
+    x, y = _serie(100)
+    assert (lttb(x, y, 100) == np.arange(100)).all()
+    assert (lttb(x, y, 2) == np.arange(100)).all()
+
+
+def test_lttb_preserva_pico():
+    x = np.arange(1_000, dtype=np.float64)
+    y = np.zeros(1_000)
+    y[637] = 100.0
+    assert 637 in lttb(x, y, 50)
+
+
+def test_lttb_aceita_datas():
+    datas = pd.date_range("2023-01-01", periods=1_000, freq="D").to_numpy()
+    escolhidos = lttb(datas, np.sin(np.arange(1_000) / 10), 100)
+    assert len(escolhidos) == 100 and escolhidos[0] == 0 and escolhidos[-1] == 999
+
+
+def _por_uf(tamanhos):
+    partes = []
+    for uf, n in tamanhos.items():
+        x, y = _serie(n, semente=len(partes))
+        partes.append(pd.DataFrame({"DATA": pd.date_range("2020-01-01", periods=n, freq="D"), "VALOR": y, "UF": uf}))
+    df = pd.concat(partes, ignore_index=True)
+    # Categórico com uma UF sem linhas (filtrada na barra lateral)
+    df["UF"] = pd.Categorical(df["UF"], categories=[*tamanhos, "RS"])
+    return df.sample(frac=1, random_state=0)
+
+
+def test_reduzir_serie_divide_orcamento_por_tamanho_do_grupo():
+    df = _por_uf({"PR": 6_000, "SC": 3_000, "SP": 1_000})
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        reduzido = reduzir_serie(df, "DATA", "VALOR", grupo="UF", pontos=1_000)
+
+    contagens = reduzido["UF"].value_counts()
+    assert contagens[["PR", "SC", "SP"]].tolist() == [600, 300, 100]
+    assert contagens.get("RS", 0) == 0
+    assert len(reduzido) <= 1_000
+    for uf, parte in df.groupby("UF", observed=True):
+        pontos = reduzido[reduzido["UF"] == uf]
+        # Primeiro e último ponto de cada grupo são mantidos, em ordem de data
+        assert pontos["DATA"].iloc[0] == parte["DATA"].min()
+        assert pontos["DATA"].iloc[-1] == parte["DATA"].max()
+        assert pontos["DATA"].is_monotonic_increasing
+
+
+def test_reduzir_serie_grupo_pequeno_recebe_minimo():
+    df = _por_uf({"PR": 9_990, "SC": 10})
+    reduzido = reduzir_serie(df, "DATA", "VALOR", grupo="UF", pontos=500)
+    assert (reduzido["UF"] == "SC").sum() == 3
+
+
+def test_reduzir_serie_sem_grupo_e_abaixo_do_orcamento():
+    df = _por_uf({"PR": 2_000})
+    reduzido = reduzir_serie(df.drop(columns="UF"), "DATA", "VALOR", pontos=200)
+    assert len(reduzido) == 200 and reduzido["DATA"].is_monotonic_increasing
+    assert reduzir_serie(df, "DATA", "VALOR", grupo="UF", pontos=5_000) is df
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from core.moeda import brl_para_centavos, brl_para_float
+
+
+@pytest.mark.parametrize("texto, centavos", [
+    ("0,00", 0),
+    ("150,00", 15000),
+    ("1.234,56", 123456),
+    ("1.234.567,89", 123456789),
+    ("1.234", 123400),
+    ("-1.234,56", -123456),
+    ("-5", -500),
+    ("12", 1200),
+    ("12,5", 1250),
+    ("12,05", 1205),
+    (" 7,10 ", 710),
+])
+def test_formatos_aceitos(texto, centavos):
+    assert brl_para_centavos(pd.Series([texto])).tolist() == [centavos]
+
+
+@pytest.mark.parametrize("texto", [
+    "1,234",        # três casas decimais
+    "--5",          # dois sinais
+    "5-",           # sinal depois dos dígitos
+    "12.34.56,00",  # grupos de milhar com menos de 3 dígitos
+    "1.23,00",
+    "1.2345,00",
+    "1.234.5",
+    ".123,00",      # ponto sem dígito antes
+    "1,2.34",       # ponto depois da vírgula
+    "1,2,3",        # duas vírgulas
+    "R$ 5,00",      # caractere desconhecido
+    "1" * 19,       # estouraria o int64
+])
+def test_formatos_rejeitados_apontam_a_posicao(texto):
+    with pytest.raises(ValueError, match=r"Valor monetário inválido na posição 1: "):
+        brl_para_centavos(pd.Series(["1,00", texto, "2,00"]))
+
+
+def test_vazios_e_nulos_viram_na():
+    resultado = brl_para_centavos(pd.Series(["1,00", "", "  ", None, "-2,50"], index=list("abcde"), name="VALOR"))
+    assert str(resultado.dtype) == "Int64"
+    assert resultado.name == "VALOR" and list(resultado.index) == list("abcde")
+    assert resultado.isna().tolist() == [False, True, True, True, False]
+    assert resultado.dropna().tolist() == [100, -250]
+
+
+def test_sem_ausentes_devolve_int64():
+    assert brl_para_centavos(pd.Series(["1,00", "2,00"])).dtype == np.int64
+
+
+def test_entradas_arrow_e_blocos():
+    valores = [f"{i // 100}.{i % 1000:03d},{i % 100:02d}" if i >= 1000 else f"{i},{i % 100:02d}" for i in range(70_000)]
+    esperado = [int(v.replace(".", "").replace(",", "")) for v in valores]
+    assert brl_para_centavos(pa.chunked_array([valores[:10], valores[10:]])).tolist() == esperado
+    assert brl_para_centavos(pd.Series(valores, dtype="string[pyarrow]")).tolist() == esperado
+
+
+def test_float_igual_ao_parse_de_texto():
+    assert brl_para_float(pd.Series(["1.234,56", "0,10"])).tolist() == [1234.56, 0.1]
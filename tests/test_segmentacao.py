@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from core.segmentacao import _rotulos_1d, limites_otimos_1d
+
+
+def _sse(valores, rotulos, pesos=None):
+    valores = np.asarray(valores, dtype=np.float64)
+    pesos = np.ones_like(valores) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    total = 0.0
+    for rotulo in np.unique(rotulos):
+        grupo, w = valores[rotulos == rotulo], pesos[rotulos == rotulo]
+        total += float((w * (grupo - np.average(grupo, weights=w)) ** 2).sum())
+    return total
+
+
+def _sse_forca_bruta(valores, k, pesos=None):
+    # Menor SSE entre todas as divisões dos valores distintos ordenados em k grupos contíguos
+    valores = np.asarray(valores, dtype=np.float64)
+    pesos = np.ones_like(valores) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    distintos = np.unique(valores)
+    k = min(k, len(distintos))
+    melhor = np.inf
+    for cortes in itertools.combinations(range(1, len(distintos)), k - 1):
+        rotulos = np.searchsorted(distintos[np.array(cortes, dtype=np.int64) - 1], valores, side="left")
+        melhor = min(melhor, _sse(valores, rotulos, pesos))
+    return melhor, k
+
+
+def _conferir(valores, k, pesos=None):
+    limites = limites_otimos_1d(valores, k, pesos)
+    rotulos = _rotulos_1d(limites, valores)
+    esperado, grupos = _sse_forca_bruta(valores, k, pesos)
+    assert _sse(valores, rotulos, pesos) == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+    # Exatamente min(k, distintos) grupos, numerados 0..k-1 do menor para o maior valor
+    assert len(limites) == grupos - 1
+    assert np.unique(rotulos).tolist() == list(range(grupos))
+    ordem = np.argsort(valores, kind="stable")
+    assert (np.diff(rotulos[ordem]) >= 0).all()
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_igual_a_forca_bruta(semente):
+    rng = np.random.default_rng(semente)
+    n = int(rng.integers(1, 10))
+    valores = rng.lognormal(3, 1, n)
+    _conferir(valores, int(rng.integers(1, 6)))
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_igual_a_forca_bruta_com_repetidos_e_pesos(semente):
+    rng = np.random.default_rng(100 + semente)
+    n = int(rng.integers(1, 10))
+    valores = rng.integers(0, 6, n).astype(np.float64)
+    pesos = rng.integers(1, 5, n) if semente % 2 else None
+    _conferir(valores, int(rng.integers(1, 6)), pesos)
+
+
+def test_k_maior_ou_igual_aos_valores_distintos():
+    valores = np.array([30.0, 10.0, 20.0, 10.0, 30.0])
+    for k in (3, 4, 10):
+        limites = limites_otimos_1d(valores, k)
+        assert limites.tolist() == [10.0, 20.0]
+        assert _rotulos_1d(limites, valores).tolist() == [2, 0, 1, 0, 2]
+
+
+def test_todos_os_valores_iguais():
+    valores = np.full(8, 42.0)
+    for k in (1, 2, 5):
+        limites = limites_otimos_1d(valores, k)
+        assert len(limites) == 0
+        assert (_rotulos_1d(limites, valores) == 0).all()
+
+
+def test_menos_valores_que_grupos():
+    assert limites_otimos_1d([5.0, 1.0], 4).tolist() == [1.0]
+    assert len(limites_otimos_1d([7.0], 3)) == 0
+    assert len(limites_otimos_1d([], 3)) == 0
+
+
+def test_pesos_equivalem_a_repetir_valores():
+    rng = np.random.default_rng(7)
+    unicos = np.unique(rng.integers(0, 1000, 200)).astype(np.float64)
+    contagem = rng.integers(1, 20, len(unicos))
+    np.testing.assert_array_equal(
+        limites_otimos_1d(unicos, 5, pesos=contagem), limites_otimos_1d(np.repeat(unicos, contagem), 5)
+    )